@@ -25,14 +25,141 @@ MAIL_SENDER_PASSWORD=environ.get("MAIL_SENDER_PASSWORD")
 MAIL_SMTP_SERVER=environ.get("MAIL_SMTP_SERVER")
 MAIL_SMTP_PORT=environ.get("MAIL_SMTP_PORT")
 CONTACT_ADDR=environ.get("CONTACT_ADDR")
+# 0 para servidores sin STARTTLS (p.ej. tools/fake_smtp.py en local)
+MAIL_SMTP_STARTTLS = environ.get("MAIL_SMTP_STARTTLS", "1") == "1"
+MAIL_SMTP_TIMEOUT = int(environ.get("MAIL_SMTP_TIMEOUT", 30))
+# Conexiones SMTP autenticadas que se reutilizan (por worker). Paradas mas de MAIL_SMTP_MAX_IDLE
+# segundos se comprueban con NOOP; con mas de MAIL_SMTP_MAX_AGE se cierran
+MAIL_SMTP_POOL_SIZE = int(environ.get("MAIL_SMTP_POOL_SIZE", 2))
+MAIL_SMTP_MAX_IDLE = int(environ.get("MAIL_SMTP_MAX_IDLE", 30))
+MAIL_SMTP_MAX_AGE = int(environ.get("MAIL_SMTP_MAX_AGE", 300))
 
 
 UPLOAD_FOLDER = os.path.join(basedir, 'wannapop/static/uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
+# Subidas: tope de toda la peticion (Flask corta con 413 antes de leer el cuerpo) y de cada fichero
+# (se corta al pasarlo mientras se lee). Los ficheros se guardan en memoria hasta UPLOAD_SPOOL_MEMORY
+# y luego en UPLOAD_SPOOL_DIR (vacio = carpeta temporal del sistema)
+MAX_CONTENT_LENGTH = int(environ.get("MAX_CONTENT_LENGTH", 20 * 1024 * 1024))
+UPLOAD_MAX_FILE_SIZE = int(environ.get("UPLOAD_MAX_FILE_SIZE", 8 * 1024 * 1024))
+UPLOAD_SPOOL_MEMORY = int(environ.get("UPLOAD_SPOOL_MEMORY", 512 * 1024))
+UPLOAD_SPOOL_DIR = environ.get("UPLOAD_SPOOL_DIR") or None
+
 SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(os.path.dirname(__file__), "sqlite", "database.db")      
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 SQLALCHEMY_ECHO = True
 SQLALCHEMY_RECORD_QUERIES = True
 
+# Busqueda de productos: "auto" (FTS5 / tsvector / FULLTEXT segun el motor) o "like"
+SEARCH_BACKEND = environ.get("SEARCH_BACKEND", "auto")
+
+# Total del listado de productos: "exact" (COUNT(*) por filtros, cacheado dentro de cada version del
+# catalogo; PRODUCTS_TOTAL_CACHE=0 -> contar en cada peticion), "approximate" (el ultimo COUNT se
+# reutiliza PRODUCTS_TOTAL_APPROX_TTL segundos aunque cambie el catalogo, se muestra "~N") o "none"
+PRODUCTS_TOTAL_MODE = environ.get("PRODUCTS_TOTAL_MODE", "exact")
+PRODUCTS_TOTAL_CACHE = environ.get("PRODUCTS_TOTAL_CACHE", "1") == "1"
+PRODUCTS_TOTAL_APPROX_TTL = int(environ.get("PRODUCTS_TOTAL_APPROX_TTL", 300))
+LISTING_TOTALS_MAX_ENTRIES = int(environ.get("LISTING_TOTALS_MAX_ENTRIES", 1024))
+
+# Cache de categorias / roles (segundos). Con varios workers de gunicorn, REFCACHE_CHANNEL_DIR
+# apunta a una carpeta comun y los cambios se avisan entre workers
+REFCACHE_TTL = int(environ.get("REFCACHE_TTL", 300))
+REFCACHE_CHANNEL_DIR = environ.get("REFCACHE_CHANNEL_DIR")
+
+# Cache por worker del usuario de la sesion (segundos, 0 = una consulta por peticion).
+# Se invalida al cambiar el usuario o sus bloqueos; entre workers solo con REFCACHE_CHANNEL_DIR,
+# asi que sin el va apagada por defecto (con varios workers un bloqueo tardaria el TTL en aplicarse)
+IDENTITY_CACHE_TTL = int(environ.get("IDENTITY_CACHE_TTL", 30 if REFCACHE_CHANNEL_DIR else 0))
+IDENTITY_CACHE_MAX_ENTRIES = int(environ.get("IDENTITY_CACHE_MAX_ENTRIES", 10000))
+
+# Cache de tarjetas de producto ya renderizadas: "memory" (LRU), "redis" o "none"
+FRAGMENT_CACHE_BACKEND = environ.get("FRAGMENT_CACHE_BACKEND", "memory")
+FRAGMENT_CACHE_MAX_ENTRIES = int(environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 5000))
+FRAGMENT_CACHE_URL = environ.get("FRAGMENT_CACHE_URL", "redis://localhost:6379/0")
+FRAGMENT_CACHE_TTL = int(environ.get("FRAGMENT_CACHE_TTL", 3600))
+
+
+
+# Contadores de productos por categoria (por busqueda). Se vacia al cambiar el catalogo
+FACET_CACHE_MAX_ENTRIES = int(environ.get("FACET_CACHE_MAX_ENTRIES", 256))
+
+# Sugerencias del buscador (indice de prefijos en memoria). Tope de memoria por worker y
+# cada cuantos segundos se reconstruye para recoger cambios de otros workers
+SUGGEST_MAX_MEMORY_MB = int(environ.get("SUGGEST_MAX_MEMORY_MB", 64))
+SUGGEST_MAX_AGE = int(environ.get("SUGGEST_MAX_AGE", 600))
+
+# Exportaciones en segundo plano (POST a /exportar/csv o /exportar/excel): carpeta de ficheros,
+# cuanto duran (segundos) e hilos por worker. Un trabajo en marcha que lleva EXPORT_STALE_SECONDS
+# sin avanzar se da por muerto (su worker se cayo) y se lanza otro
+EXPORT_DIR = environ.get("EXPORT_DIR", os.path.join(basedir, "exports"))
+EXPORT_TTL = int(environ.get("EXPORT_TTL", 3600))
+EXPORT_WORKERS = int(environ.get("EXPORT_WORKERS", 2))
+EXPORT_STALE_SECONDS = int(environ.get("EXPORT_STALE_SECONDS", 300))
+
+# Exportacion delta (/exportar/delta): dias que se guardan borrados / bloqueos y margen (segundos)
+# que se resta a la marca para no perder transacciones que aun no habian hecho commit
+# (por defecto: cada llamada puede pedir otro con ?lag=)
+EXPORT_CHANGELOG_DAYS = int(environ.get("EXPORT_CHANGELOG_DAYS", 30))
+EXPORT_DELTA_LAG = int(environ.get("EXPORT_DELTA_LAG", 5))
+
+# Miniaturas de las subidas en un pool de procesos (por worker de gunicorn; 0 = en la peticion).
+# Como mucho IMAGE_QUEUE_MAX pendientes; lleno -> se espera IMAGE_QUEUE_WAIT segundos y si no, sin miniaturas
+IMAGE_WORKERS = int(environ.get("IMAGE_WORKERS", 2))
+IMAGE_QUEUE_MAX = int(environ.get("IMAGE_QUEUE_MAX", 32))
+IMAGE_QUEUE_WAIT = float(environ.get("IMAGE_QUEUE_WAIT", 2))
+# Segundos que se recuerda por worker que un original ya tiene miniaturas (0 = mirar el disco cada vez)
+IMAGE_READY_TTL = int(environ.get("IMAGE_READY_TTL", 300))
+IMAGE_READY_MAX_ENTRIES = int(environ.get("IMAGE_READY_MAX_ENTRIES", 20000))
+
+# bcrypt en un pool de procesos (por worker de gunicorn; 0 = en la peticion). Coste de los hashes
+# nuevos en BCRYPT_LOG_ROUNDS: al cambiarlo, cada usuario se rehace el hash en su siguiente login.
+# Como mucho BCRYPT_QUEUE_MAX en curso; lleno -> se espera BCRYPT_QUEUE_WAIT segundos y si no, 503
+BCRYPT_LOG_ROUNDS = int(environ.get("BCRYPT_LOG_ROUNDS", 12))
+BCRYPT_WORKERS = int(environ.get("BCRYPT_WORKERS", 2))
+BCRYPT_QUEUE_MAX = int(environ.get("BCRYPT_QUEUE_MAX", 16))
+BCRYPT_QUEUE_WAIT = float(environ.get("BCRYPT_QUEUE_WAIT", 5))
+
+# Limite de peticiones (token bucket) de login / registro / reenvio, por IP y por email del formulario.
+# Regla "rafaga/segundos": "5/60" = 5 seguidas, que se recuperan en 60 s. Los cubos van en RATELIMIT_STORAGE
+# (SQLite comun a todos los workers del host; vacio = en memoria, cada worker por su cuenta).
+# En el login el cubo del email solo cuenta los intentos fallidos
+RATELIMIT_ENABLED = environ.get("RATELIMIT_ENABLED", "1") == "1"
+RATELIMIT_STORAGE = environ.get("RATELIMIT_STORAGE", os.path.join(basedir, "sqlite", "ratelimit.db"))
+RATELIMIT_RULES = {
+    "login": {
+        "ip": environ.get("RATELIMIT_LOGIN_IP", "20/60"),
+        "email": environ.get("RATELIMIT_LOGIN_EMAIL", "5/60"),
+    },
+    "register": {
+        "ip": environ.get("RATELIMIT_REGISTER_IP", "5/600"),
+        "email": environ.get("RATELIMIT_REGISTER_EMAIL", "3/3600"),
+    },
+    "resend": {
+        "ip": environ.get("RATELIMIT_RESEND_IP", "5/600"),
+        "email": environ.get("RATELIMIT_RESEND_EMAIL", "3/3600"),
+    },
+}
+
+# Proxies de confianza delante de la app (nginx = 1). La IP del cliente (la del limite de peticiones)
+# se toma entonces de X-Forwarded-For; 0 = request.remote_addr tal cual, sin mirar cabeceras
+TRUSTED_PROXIES = int(environ.get("TRUSTED_PROXIES", 0))
+
+# Huellas (?v=sha256) de static/ que se recuerdan por worker (LRU) para no releer los ficheros
+STATIC_FINGERPRINT_MAX_ENTRIES = int(environ.get("STATIC_FINGERPRINT_MAX_ENTRIES", 10000))
+
+# Version del despliegue que entra en los ETag de las paginas (p.ej. el hash del commit).
+# Vacio -> se calcula al arrancar con el contenido de templates/ y static/
+APP_VERSION = environ.get("APP_VERSION")
 
+# Outbox de correo: las peticiones solo encolan. "thread" = un hilo de envio por worker,
+# "off" = nadie envia desde la web (entonces `flask outbox-send --loop` en otro proceso).
+# Reintentos: OUTBOX_RETRY_BASE * 2^(intento-1) segundos, como mucho OUTBOX_RETRY_MAX
+OUTBOX_SENDER = environ.get("OUTBOX_SENDER", "thread")
+OUTBOX_BATCH_SIZE = int(environ.get("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_POLL_INTERVAL = int(environ.get("OUTBOX_POLL_INTERVAL", 5))
+OUTBOX_MAX_ATTEMPTS = int(environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_RETRY_BASE = int(environ.get("OUTBOX_RETRY_BASE", 30))
+OUTBOX_RETRY_MAX = int(environ.get("OUTBOX_RETRY_MAX", 3600))
+OUTBOX_CLAIM_TIMEOUT = int(environ.get("OUTBOX_CLAIM_TIMEOUT", 300))
+OUTBOX_KEEP_DAYS = int(environ.get("OUTBOX_KEEP_DAYS", 7))
@@ -0,0 +1,156 @@
+"""
+Fixtures comunes: una app con su propia base de datos SQLite temporal (una por sesion de pytest:
+las caches de la app son globales por proceso) y fabricas de usuarios / categorias / productos.
+Cada test crea sus propios datos con nombres unicos, asi no dependen del orden.
+
+    python -m pytest
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="wannapop-tests-")
+PASSWORD = "test-password"
+
+# Antes de importar config: nada de pools de procesos, hilos de envio ni ficheros del repo
+os.environ.update({
+    "SALT": "tests",
+    "CONTACT_ADDR": "contact@example.com",
+    "MAIL_SENDER_ADDR": "noreply@example.com",
+    "LOG_LEVEL": "WARNING",
+    "OUTBOX_SENDER": "off",
+    "BCRYPT_WORKERS": "0",
+    "BCRYPT_LOG_ROUNDS": "4",
+    "IMAGE_WORKERS": "0",
+    "RATELIMIT_ENABLED": "0",
+    "RATELIMIT_STORAGE": "",
+    "EXPORT_DIR": os.path.join(WORKDIR, "exports"),
+})
+os.environ.pop("REFCACHE_CHANNEL_DIR", None)
+os.environ.pop("APP_VERSION", None)
+
+_counter = itertools.count(1)
+
+
+def unique(prefix):
+    return f"{prefix}{next(_counter)}"
+
+
+@pytest.fixture(scope="session")
+def app():
+    import config
+
+    config.SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(WORKDIR, "test.db")
+    config.SQLALCHEMY_ECHO = False
+    config.DEBUG_TB_ENABLED = False
+    config.WTF_CSRF_ENABLED = False
+    config.UPLOAD_FOLDER = os.path.join(WORKDIR, "uploads")
+
+    # setup_logging escribe app.log en el directorio actual
+    cwd = os.getcwd()
+    os.chdir(WORKDIR)
+    try:
+        from wannapop import create_app, db
+        from wannapop.models import Role
+
+        app = create_app()
+        app.config["TESTING"] = True
+        with app.app_context():
+            for role_id, name in enumerate(("wanner", "moderator", "admin"), start=1):
+                db.session.add(Role(id=role_id, name=name))
+            db.session.commit()
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def ctx(app):
+    """App context para usar db.session directamente en el test."""
+    from wannapop import db
+
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    from wannapop import db, password_hasher
+    from wannapop.models import User
+
+    def make_user(role="wanner", password=PASSWORD, verified=True, pw_hash=None):
+        role_id = {"wanner": 1, "moderator": 2, "admin": 3}[role]
+        name = unique("user")
+        with app.app_context():
+            user = User(
+                name=name,
+                email=f"{name}@example.com",
+                password=pw_hash or password_hasher.generate(password),
+                avatar="avatar.png",
+                role_id=role_id,
+                verified=verified,
+                email_token=unique("token"),
+            )
+            db.session.add(user)
+            db.session.commit()
+            return user.id, user.email
+
+    return make_user
+
+
+@pytest.fixture
+def make_category(app):
+    from wannapop import db
+    from wannapop.models import Category
+
+    def make_category(name=None):
+        with app.app_context():
+            category = Category(name=name or unique("Categoria "))
+            db.session.add(category)
+            db.session.commit()
+            return category.id, category.name
+
+    return make_category
+
+
+@pytest.fixture
+def make_product(app, make_category):
+    from wannapop import db
+    from wannapop.models import Product
+
+    def make_product(seller_id, category_id=None, title=None, description="Sin descripcion", price=10):
+        if category_id is None:
+            category_id, _ = make_category()
+        with app.app_context():
+            product = Product(
+                title=title or unique("Producto "),
+                description=description,
+                price=price,
+                category_id=category_id,
+                seller_id=seller_id,
+                photo=None,
+            )
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+
+    return make_product
+
+
+@pytest.fixture
+def login(app):
+    """login(email) -> test client con la sesion iniciada."""
+    def login(email, password=PASSWORD):
+        client = app.test_client()
+        response = client.post("/login", data={"email": email, "password": password})
+        assert response.status_code == 302, response.status_code
+        return client
+
+    return login
@@ -0,0 +1,68 @@
+import pytest
+from wannapop import db, static_assets
+from wannapop.hashid_utils import encode_id
+from wannapop.models import Product
+
+
+@pytest.fixture
+def viewer(make_user, login):
+    _, email = make_user()
+    return login(email)
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+def test_listing_answers_304_until_the_catalog_changes(app, viewer, make_user, make_product):
+    seller_id, _ = make_user()
+    make_product(seller_id)
+
+    first = viewer.get("/products")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert "no-cache" in first.headers["Cache-Control"] and "private" in first.headers["Cache-Control"]
+
+    not_modified = revalidate(viewer, "/products", etag)
+    assert not_modified.status_code == 304 and not_modified.get_data() == b""
+
+    make_product(seller_id)
+    assert revalidate(viewer, "/products", etag).status_code == 200
+
+
+def test_product_detail_etag_follows_the_product(app, viewer, make_user, make_product):
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id)
+    url = f"/products/{encode_id(product_id)}"
+
+    etag = viewer.get(url).headers["ETag"]
+    assert revalidate(viewer, url, etag).status_code == 304
+
+    with app.app_context():
+        db.session.get(Product, product_id).price = 99
+        db.session.commit()
+    assert revalidate(viewer, url, etag).status_code == 200
+
+
+def test_etag_depends_on_the_viewer(app, viewer, make_user, login):
+    etag = viewer.get("/products").headers["ETag"]
+    _, other_email = make_user()
+
+    assert revalidate(login(other_email), "/products", etag).status_code == 200
+
+
+def test_new_deploy_invalidates_etags(app, viewer, monkeypatch):
+    etag = viewer.get("/products").headers["ETag"]
+
+    monkeypatch.setattr(static_assets, "version", "otro-despliegue")
+    assert revalidate(viewer, "/products", etag).status_code == 200
+
+
+def test_pending_flash_messages_skip_the_304(app, viewer):
+    etag = viewer.get("/products").headers["ETag"]
+    with viewer.session_transaction() as session:
+        session["_flashes"] = [("info", "Aviso pendiente")]
+
+    response = revalidate(viewer, "/products", etag)
+    assert response.status_code == 200
+    assert "Aviso pendiente" in response.get_data(as_text=True)
@@ -0,0 +1,35 @@
+import csv
+import gzip
+import io
+from wannapop.helpers.helper_export import csv_chunks, gzip_chunks
+
+
+def test_csv_chunks_quotes_and_splits_by_block():
+    chunks = list(csv_chunks([[(1, 'Mesa, "vintage"', "linea 1\nlinea 2", 10)], [(2, "Silla", "", 5)]]))
+    assert len(chunks) == 2
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows == [
+        ["id", "title", "description", "price"],
+        ["1", 'Mesa, "vintage"', "linea 1\nlinea 2", "10"],
+        ["2", "Silla", "", "5"],
+    ]
+
+
+def test_gzip_chunks_round_trip():
+    data = [b"a" * 1000, b"b" * 1000, b""]
+    assert gzip.decompress(b"".join(gzip_chunks(iter(data)))) == b"".join(data)
+
+
+def test_csv_export_filters_by_category(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    product_id = make_product(seller_id, category_id, title="Reloj de pared")
+    make_product(seller_id)
+
+    response = login(email).get("/exportar/csv", query_string={"category": category_name},
+                                headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.get_data()).decode("utf-8"))))
+    assert rows[1:] == [[str(product_id), "Reloj de pared", "Sin descripcion", "10.00"]]
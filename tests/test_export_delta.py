@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from wannapop import db
+from wannapop.models import Product
+
+
+@pytest.fixture
+def client(make_user, login):
+    _, email = make_user()
+    return login(email)
+
+
+def delta(client, since, **args):
+    response = client.get("/exportar/delta", query_string={"since": since, "format": "ndjson", "lag": 0, **args},
+                          headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return lines[:-1], lines[-1]["watermark"], response.headers["X-Watermark"]
+
+
+def test_upserts_and_deletes_since_the_watermark(app, client, make_user, make_product):
+    seller_id, _ = make_user()
+    since = (datetime.utcnow() - timedelta(seconds=1)).isoformat() + "Z"
+    kept = make_product(seller_id, title="Jarron")
+    deleted = make_product(seller_id, title="Cuadro")
+    with app.app_context():
+        db.session.delete(db.session.get(Product, deleted))
+        db.session.commit()
+
+    rows, trailer, header = delta(client, since)
+    events = {(row["event"], row["id"]) for row in rows}
+    assert ("upsert", kept) in events and ("deleted", deleted) in events
+    assert trailer == header
+
+    # Con la marca nueva ya no vuelve a salir nada de esto
+    rows, _, _ = delta(client, header)
+    assert not {(row["event"], row["id"]) for row in rows} & events
+
+
+def test_watermark_lags_behind_now(client):
+    _, _, header = delta(client, "", lag=60)
+    watermark = datetime.fromisoformat(header.rstrip("Z"))
+    assert datetime.utcnow() - timedelta(seconds=62) < watermark < datetime.utcnow() - timedelta(seconds=59)
+
+
+@pytest.mark.parametrize("lag", ["-1", "abc", "3601", "1.5"])
+def test_invalid_lag(client, lag):
+    assert client.get("/exportar/delta", query_string={"lag": lag}).status_code == 400
+
+
+def test_since_older_than_retention_is_gone(app, client):
+    since = datetime.utcnow() - timedelta(days=app.config["EXPORT_CHANGELOG_DAYS"] + 1)
+    assert client.get("/exportar/delta", query_string={"since": since.isoformat()}).status_code == 410
+
+
+def test_invalid_since(client):
+    assert client.get("/exportar/delta", query_string={"since": "ayer"}).status_code == 400
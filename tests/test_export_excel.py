@@ -0,0 +1,29 @@
+import io
+from openpyxl import load_workbook
+from wannapop.helpers.helper_export import write_xlsx
+
+
+def test_write_xlsx_strips_illegal_characters():
+    output = io.BytesIO()
+    write_xlsx([[(1, "Lampara\x07 roja", "Con\x00 bombilla", 12.5)], [(2, "Mesa", "", 3)]], output)
+
+    sheet = load_workbook(output).active
+    assert sheet.title == "Productos"
+    assert [list(row) for row in sheet.iter_rows(values_only=True)] == [
+        ["ID", "Título", "Descripción", "Precio"],
+        [1, "Lampara roja", "Con bombilla", 12.5],
+        [2, "Mesa", None, 3],
+    ]
+
+
+def test_excel_export_download(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    product_id = make_product(seller_id, category_id, title="Espejo")
+
+    response = login(email).get("/exportar/excel", query_string={"category": category_name})
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    rows = list(load_workbook(io.BytesIO(response.get_data())).active.iter_rows(values_only=True))
+    assert rows[1][:2] == (product_id, "Espejo")
@@ -0,0 +1,76 @@
+import time
+import pytest
+from wannapop.models import ExportJob
+
+JSON = {"Accept": "application/json"}
+
+
+@pytest.fixture
+def owner(make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    make_product(seller_id, category_id, title="Cafetera")
+    return login(email), category_name
+
+
+def wait_done(client, status_url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        payload = client.get(status_url).get_json()
+        if payload["status"] in ("done", "failed"):
+            return payload
+        time.sleep(0.05)
+    raise AssertionError("la exportacion no ha terminado")
+
+
+def test_post_creates_a_job_and_download_works(owner):
+    client, category_name = owner
+    response = client.post("/exportar/csv", query_string={"category": category_name}, headers=JSON)
+    assert response.status_code == 202
+
+    payload = wait_done(client, response.headers["Location"])
+    assert payload["status"] == "done" and payload["rows_total"] == 1
+
+    download = client.get(payload["download_url"])
+    assert download.status_code == 200
+    assert "Cafetera" in download.get_data(as_text=True)
+
+
+def test_same_export_reuses_the_job(owner):
+    client, category_name = owner
+    first = client.post("/exportar/excel", query_string={"category": category_name}, headers=JSON).get_json()
+    second = client.post("/exportar/excel", query_string={"category": category_name}, headers=JSON).get_json()
+    assert first["id"] == second["id"]
+
+
+def test_get_never_creates_a_job(app, owner):
+    client, category_name = owner
+    with app.app_context():
+        before = ExportJob.query.count()
+
+    response = client.get("/exportar/csv", query_string={"category": category_name, "background": "1"})
+    assert response.mimetype == "text/csv"
+    with app.app_context():
+        assert ExportJob.query.count() == before
+
+
+def test_jobs_are_private_to_their_owner(owner, make_user, login):
+    client, category_name = owner
+    payload = client.post("/exportar/csv", query_string={"category": category_name}, headers=JSON).get_json()
+    wait_done(client, payload["status_url"])
+
+    _, other_email = make_user()
+    other = login(other_email)
+    job_id = payload["id"]
+    for url in (f"/exportar/jobs/{job_id}", f"/exportar/jobs/{job_id}/status", f"/exportar/jobs/{job_id}/download"):
+        assert other.get(url).status_code == 404
+
+    # Los mismos filtros de otro usuario son otro trabajo
+    assert other.post("/exportar/csv", query_string={"category": category_name}, headers=JSON).get_json()["id"] != job_id
+
+
+def test_post_requires_csrf_token(app, owner, monkeypatch):
+    client, category_name = owner
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+
+    assert client.post("/exportar/csv", query_string={"category": category_name}).status_code == 400
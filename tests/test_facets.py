@@ -0,0 +1,29 @@
+from wannapop import db, facet_counts
+from wannapop.models import BlockedProduct, ProductStatus, Product
+
+
+def test_counts_per_category_follow_the_catalog(ctx, make_user, make_category, make_product):
+    seller_id, _ = make_user()
+    category_id, _ = make_category()
+    first = make_product(seller_id, category_id, title="Guitarra acustica")
+    make_product(seller_id, category_id, title="Guitarra electrica")
+
+    assert facet_counts.counts()[category_id] == 2
+    assert facet_counts.counts("acustica").get(category_id) == 1
+
+    # Bloquear sube la version del catalogo: deja de contar
+    product = db.session.get(Product, first)
+    db.session.add(BlockedProduct(product_id=first, moderator_id=seller_id, reason="Prueba de bloqueo"))
+    product.status = ProductStatus.blocked.value
+    db.session.commit()
+    assert facet_counts.counts()[category_id] == 1
+
+
+def test_same_search_is_served_from_cache(ctx, make_user, make_product):
+    seller_id, _ = make_user()
+    make_product(seller_id)
+
+    facet_counts.counts("  Lampara ")
+    hits = facet_counts.hits
+    facet_counts.counts("lampara")
+    assert facet_counts.hits == hits + 1
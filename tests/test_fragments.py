@@ -0,0 +1,38 @@
+from wannapop import db, fragment_cache
+from wannapop.models import Product
+
+
+def get_listing(client, category_name):
+    response = client.get("/products", query_string={"category": category_name}, headers={"Cache-Control": "no-cache"})
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_cards_are_reused_until_the_product_changes(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    product_id = make_product(seller_id, category_id, title="Silla plegable")
+    client = login(email)
+
+    get_listing(client, category_name)
+    hits = fragment_cache.hits
+    assert "Silla plegable" in get_listing(client, category_name)
+    assert fragment_cache.hits == hits + 1
+
+    with app.app_context():
+        db.session.get(Product, product_id).title = "Silla de jardin"
+        db.session.commit()
+    html = get_listing(client, category_name)
+    assert "Silla de jardin" in html and "Silla plegable" not in html
+
+
+def test_staff_and_wanners_do_not_share_cards(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    _, moderator_email = make_user(role="moderator")
+    category_id, category_name = make_category()
+    make_product(seller_id, category_id)
+
+    get_listing(login(email), category_name)
+    misses = fragment_cache.misses
+    get_listing(login(moderator_email), category_name)
+    assert fragment_cache.misses == misses + 1
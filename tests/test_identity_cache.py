@@ -0,0 +1,158 @@
+import os
+import runpy
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from wannapop import db, encode_id, identity_cache, reference_cache
+from wannapop.helpers.helper_identity import CHANNEL_NAME, IdentityCache
+from wannapop.helpers.helper_refcache import FileChannel
+from wannapop.models import User, blocked_users
+
+
+@contextmanager
+def count_queries():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+
+def load(app, user_id, cache=identity_cache):
+    """Como el user_loader: en su propia peticion (app context)."""
+    with app.app_context():
+        with count_queries() as statements:
+            user = cache.load(user_id)
+            name, blocked, role = user.name, user.is_blocked, user.role_name
+        return name, blocked, role, len(statements)
+
+
+@pytest.fixture(autouse=True)
+def cache_on(monkeypatch):
+    # Sin REFCACHE_CHANNEL_DIR (como en los tests) va apagada por defecto
+    monkeypatch.setattr(identity_cache, "ttl", 30)
+
+
+@pytest.fixture
+def user_id(app, make_user):
+    user_id, _ = make_user()
+    with app.app_context():
+        identity_cache.invalidate([user_id], publish=False)
+        # Los roles salen de su propia cache: que no cuenten en las consultas del test
+        reference_cache.roles()
+    return user_id
+
+
+def test_second_load_is_a_hit_without_queries(app, user_id):
+    hits = identity_cache.hits
+    first = load(app, user_id)
+    second = load(app, user_id)
+
+    # Usuario + rol + bloqueo en una consulta; despues ninguna
+    assert first[3] == 1 and second[3] == 0
+    assert first[:3] == second[:3] == (first[0], False, "wanner")
+    assert identity_cache.hits == hits + 1
+
+
+def test_update_invalidates_after_commit(app, user_id):
+    load(app, user_id)
+    with app.app_context():
+        db.session.get(User, user_id).name = "Renombrado"
+        db.session.flush()
+        # Sin commit todavia: lo cacheado sigue valiendo
+        assert user_id in identity_cache._entries
+        db.session.commit()
+
+    name, _, _, queries = load(app, user_id)
+    assert name == "Renombrado" and queries == 1
+
+
+def test_rollback_keeps_the_entry(app, user_id):
+    load(app, user_id)
+    with app.app_context():
+        db.session.get(User, user_id).name = "Nunca"
+        db.session.flush()
+        db.session.rollback()
+
+    name, _, _, queries = load(app, user_id)
+    assert name != "Nunca" and queries == 0
+
+
+def test_block_and_unblock_invalidate(app, user_id, make_user):
+    moderator_id, _ = make_user(role="moderator")
+    load(app, user_id)
+    with app.app_context():
+        db.session.add(blocked_users(user_id=user_id, moderator_id=moderator_id, reason="spam"))
+        db.session.commit()
+    assert load(app, user_id)[1] is True
+
+    with app.app_context():
+        db.session.delete(db.session.get(blocked_users, user_id))
+        db.session.commit()
+    assert load(app, user_id)[1] is False
+
+
+def test_cached_user_can_be_modified(app, user_id):
+    load(app, user_id)
+    with app.app_context():
+        user = identity_cache.load(user_id)
+        user.name = "Desde la cache"
+        db.session.commit()
+    with app.app_context():
+        assert db.session.get(User, user_id).name == "Desde la cache"
+
+
+def test_other_workers_invalidate_through_the_channel(app, user_id, make_user, tmp_path, monkeypatch):
+    # Dos workers con la misma carpeta de canal: este proceso hace de B (el que escribe)
+    monkeypatch.setattr(identity_cache, "channel", FileChannel(str(tmp_path)))
+    worker_a = IdentityCache()
+    worker_a.ttl = 30
+    worker_a.channel = FileChannel(str(tmp_path))
+    moderator_id, _ = make_user(role="moderator")
+
+    load(app, user_id, worker_a)
+    assert load(app, user_id, worker_a)[3] == 0
+
+    # B bloquea al usuario: el commit invalida su cache y toca la marca del canal
+    with app.app_context():
+        db.session.add(blocked_users(user_id=user_id, moderator_id=moderator_id, reason="spam"))
+        db.session.commit()
+
+    _, blocked, _, queries = load(app, user_id, worker_a)
+    assert blocked is True and queries == 1
+
+    # Cualquier otro cambio publicado tambien vacia lo de A
+    FileChannel(str(tmp_path)).publish(CHANNEL_NAME)
+    assert load(app, user_id, worker_a)[3] == 1
+
+
+def test_off_by_default_without_a_channel(monkeypatch):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    monkeypatch.delenv("IDENTITY_CACHE_TTL", raising=False)
+
+    monkeypatch.delenv("REFCACHE_CHANNEL_DIR", raising=False)
+    assert runpy.run_path(os.path.join(root, "config.py"))["IDENTITY_CACHE_TTL"] == 0
+
+    monkeypatch.setenv("REFCACHE_CHANNEL_DIR", "/tmp/wannapop-channel")
+    assert runpy.run_path(os.path.join(root, "config.py"))["IDENTITY_CACHE_TTL"] == 30
+
+
+def test_without_ttl_every_request_queries(app, user_id, monkeypatch):
+    monkeypatch.setattr(identity_cache, "ttl", 0)
+    assert load(app, user_id)[3] == 1
+    assert load(app, user_id)[3] == 1
+
+
+def test_blocked_user_is_stopped_on_the_next_request(app, make_user, login):
+    user_id, email = make_user()
+    _, moderator_email = make_user(role="moderator")
+    client = login(email)
+    assert client.get("/products/create").status_code == 200
+
+    moderator = login(moderator_email)
+    assert moderator.post(f"/users/{encode_id(user_id)}/block", data={"reason": "spam"}).status_code == 302
+
+    response = client.get("/products/create")
+    assert response.status_code == 302 and response.headers["Location"].endswith("/products")
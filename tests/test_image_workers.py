@@ -0,0 +1,96 @@
+import io
+import os
+import time
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from wannapop import image_workers
+from wannapop.helpers.helper_files import save_image
+from wannapop.helpers.helper_images import ImageWorkers, thumb_name
+
+
+@pytest.fixture
+def workers(app, monkeypatch):
+    """ImageWorkers propio (no el de la app) con esa configuracion."""
+    def make(**config):
+        for key, value in config.items():
+            monkeypatch.setitem(app.config, key, value)
+        workers = ImageWorkers()
+        workers.init_app(app)
+        return workers
+    return make
+
+
+def write_image(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", (700, 700), "blue").save(path, format="JPEG")
+
+
+def test_inline_when_there_is_no_pool(app, workers, tmp_path):
+    pool = workers(IMAGE_WORKERS=0)
+    path = str(tmp_path / "foto.jpg")
+    write_image(path)
+
+    with app.app_context():
+        assert pool.submit(path, str(tmp_path), ("card",))
+    assert (tmp_path / thumb_name("foto.jpg", "card", 300)).exists()
+
+
+def test_pool_generates_in_another_process(workers, tmp_path):
+    pool = workers(IMAGE_WORKERS=1)
+    path = str(tmp_path / "foto.jpg")
+    write_image(path)
+    try:
+        assert pool.submit(path, str(tmp_path), ("card",))
+        deadline = time.monotonic() + 60
+        while pool.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["done"] == 1
+        assert (tmp_path / thumb_name("foto.jpg", "card", 300)).exists()
+    finally:
+        pool.executor.shutdown()
+
+
+def test_full_queue_skips_thumbnails(workers, tmp_path):
+    pool = workers(IMAGE_WORKERS=1, IMAGE_QUEUE_MAX=1, IMAGE_QUEUE_WAIT=0.01)
+    try:
+        # El unico hueco ya esta ocupado
+        pool._slots.acquire()
+        assert not pool.submit(str(tmp_path / "foto.jpg"), str(tmp_path), ("card",))
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.executor.shutdown()
+
+
+def gps_jpeg():
+    exif = Image.Exif()
+    exif[0x010F] = "Camara de prueba"
+    exif[0x8825] = {1: "N", 2: (41.0, 23.0, 0.0)}
+    output = io.BytesIO()
+    Image.new("RGB", (700, 700), "purple").save(output, format="JPEG", exif=exif)
+    return output.getvalue()
+
+
+def test_exif_is_gone_before_the_file_is_public(app, monkeypatch):
+    # Cola llena y pool que no llega a ejecutar nada: el original ya tiene que salir limpio
+    monkeypatch.setattr(image_workers, "submit", lambda *args: False)
+    with app.test_request_context():
+        name = save_image(FileStorage(io.BytesIO(gps_jpeg()), filename="gps.jpg"))
+        upload_folder = app.config["UPLOAD_FOLDER"]
+
+    with Image.open(os.path.join(upload_folder, name)) as image:
+        assert not image.getexif()
+    # submit no ha podido: las miniaturas se han hecho en la peticion
+    assert os.path.exists(os.path.join(upload_folder, thumb_name(name, "card", 300)))
+
+
+def test_backfill_strips_old_uploads_by_default(app, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    path = tmp_path / "ab" / "cd" / "antigua.jpg"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(gps_jpeg())
+
+    result = app.test_cli_runner().invoke(args=["thumbnails-backfill"])
+    assert result.exit_code == 0, result.output
+    with Image.open(path) as image:
+        assert not image.getexif()
@@ -0,0 +1,62 @@
+import os
+from PIL import Image
+from wannapop import image_workers
+from wannapop.helpers.helper_images import (
+    IMAGE_VARIANTS, PRODUCT_VARIANTS, image_attrs, make_thumbnails, strip_metadata, thumb_name,
+)
+
+
+def write_image(path, size=(1000, 500), exif_orientation=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image = Image.new("RGB", size, "red")
+    exif = Image.Exif()
+    if exif_orientation:
+        exif[0x0112] = exif_orientation
+    exif[0x010F] = "Camara de prueba"
+    image.save(path, format="JPEG", exif=exif)
+
+
+def test_thumb_name():
+    assert thumb_name("ab/cd/abcd.jpg", "card", 300) == "thumbs/ab/cd/abcd-card-300.webp"
+
+
+def test_make_thumbnails_writes_each_width_once(tmp_path):
+    path = str(tmp_path / "ab" / "cd" / "foto.jpg")
+    write_image(path)
+
+    assert make_thumbnails(path, str(tmp_path), PRODUCT_VARIANTS) == 4
+    for variant in PRODUCT_VARIANTS:
+        for width in IMAGE_VARIANTS[variant]["widths"]:
+            with Image.open(tmp_path / thumb_name("ab/cd/foto.jpg", variant, width)) as thumb:
+                assert thumb.format == "WEBP"
+                # Nunca mas grande que el original
+                assert thumb.width == min(width, 1000)
+                assert not thumb.getexif()
+    assert make_thumbnails(path, str(tmp_path), PRODUCT_VARIANTS) == 0
+
+
+def test_strip_metadata_applies_orientation(tmp_path):
+    path = str(tmp_path / "girada.jpg")
+    # 6 = girada 90 grados: al aplicarla el ancho y el alto se intercambian
+    write_image(path, size=(400, 200), exif_orientation=6)
+
+    strip_metadata(path)
+    with Image.open(path) as image:
+        assert image.size == (200, 400)
+        assert not image.getexif()
+
+
+def test_image_attrs_falls_back_to_the_original(app, tmp_path):
+    with app.test_request_context():
+        upload_folder = app.config["UPLOAD_FOLDER"]
+        name = "ef/gh/attrs.jpg"
+        write_image(os.path.join(upload_folder, name))
+        assert 'srcset' not in image_attrs(name, "card")
+
+        make_thumbnails(os.path.join(upload_folder, name), upload_folder, ("card",))
+        # Lo que sabia este worker de la foto (ahora mismo "sin miniaturas")
+        image_workers.forget(name)
+
+        attrs = image_attrs(name, "card")
+        assert "card-300.webp" in attrs and "card-600.webp 600w" in attrs
+        assert 'sizes="' in attrs
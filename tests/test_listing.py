@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from wannapop import db
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def listing_queries(app, client, category_name):
+    with count_queries(app) as statements:
+        # Sin cache del navegador ni tarjetas ya pintadas de otra peticion
+        response = client.get("/products", query_string={"category": category_name},
+                              headers={"Cache-Control": "no-cache"})
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_listing_queries_do_not_grow_with_cards(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    client = login(email)
+
+    few_id, few = make_category()
+    many_id, many = make_category()
+    for _ in range(2):
+        make_product(seller_id, few_id)
+    for _ in range(10):
+        make_product(seller_id, many_id)
+
+    # Calienta las caches de categorias / roles y la del usuario de la sesion
+    client.get("/products")
+    assert listing_queries(app, client, many) == listing_queries(app, client, few)
@@ -0,0 +1,96 @@
+from decimal import Decimal
+import pytest
+from wannapop.helpers.helper_listing import listing_query
+from wannapop.helpers.helper_pagination import CursorPagination
+
+
+@pytest.fixture
+def priced(ctx, make_user, make_category, make_product):
+    """Categoria con productos de 5, 15, 15 y 30 (ids en ese orden)."""
+    seller_id, _ = make_user()
+    category_id, category_name = make_category()
+    ids = [make_product(seller_id, category_id, price=price) for price in (5, 15, 15, 30)]
+    return category_name, ids
+
+
+def ids_of(query):
+    return [row.id for row in query.all()]
+
+
+def test_price_range_is_inclusive(priced):
+    category_name, ids = priced
+    query, _ = listing_query(category=category_name, min_price=Decimal("15"), max_price=Decimal("30"))
+    assert sorted(ids_of(query)) == ids[1:]
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("newest", [3, 2, 1, 0]),
+    ("price_asc", [0, 1, 2, 3]),
+    ("price_desc", [3, 2, 1, 0]),
+])
+def test_sorts(priced, sort, expected):
+    category_name, ids = priced
+    query, _ = listing_query(category=category_name, sort=sort)
+    assert ids_of(query) == [ids[i] for i in expected]
+
+
+def test_cursor_walks_price_ties_without_repeats(priced):
+    category_name, ids = priced
+    query, key_columns = listing_query(category=category_name, sort="price_asc")
+
+    seen, cursor = [], None
+    while True:
+        page = CursorPagination(query, per_page=1, cursor=cursor, key_columns=key_columns, secret_key="secret")
+        seen += [row.id for row in page.items]
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
+    assert seen == ids
+
+
+@pytest.mark.parametrize("value", ["", "abc", "-1", "NaN", "Infinity"])
+def test_invalid_price_args_are_ignored(app, value):
+    from wannapop.routes_products import price_arg
+
+    with app.test_request_context(query_string={"min_price": value}):
+        assert price_arg("min_price") is None
+
+
+def pages(category_name, sort, cursor=None):
+    query, key_columns = listing_query(category=category_name, sort=sort)
+    return CursorPagination(query, per_page=2, cursor=cursor, key_columns=key_columns, secret_key="secret")
+
+
+@pytest.mark.parametrize("sort", ["price_asc", "price_desc"])
+def test_cursor_from_another_sort_goes_to_first_page(priced, sort):
+    category_name, _ = priced
+    newest_cursor = pages(category_name, "newest").next_cursor
+
+    replayed = pages(category_name, sort, newest_cursor)
+    assert [row.id for row in replayed.items] == [row.id for row in pages(category_name, sort).items]
+    assert not replayed.has_prev
+
+
+def test_signed_cursor_with_wrong_values_goes_to_first_page(priced):
+    category_name, _ = priced
+    first = pages(category_name, "price_asc")
+    # Firmado y con el orden bueno, pero con una fecha donde va el precio
+    forged = first._serializer.dumps({"k": ["2024-01-01T00:00:00", 1], "s": first._order})
+
+    assert [row.id for row in pages(category_name, "price_asc", forged).items] == [row.id for row in first.items]
+
+
+def test_listing_with_a_cursor_from_another_sort(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    for price in (5, 15, 30):
+        make_product(seller_id, category_id, price=price)
+    client = login(email)
+
+    with app.test_request_context():
+        query, key_columns = listing_query(category=category_name, sort="newest")
+        cursor = CursorPagination(query, per_page=1, key_columns=key_columns,
+                                  secret_key=app.config["SECRET_KEY"]).next_cursor
+
+    response = client.get("/products", query_string={"category": category_name, "sort": "price_desc", "cursor": cursor})
+    assert response.status_code == 200
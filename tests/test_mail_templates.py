@@ -0,0 +1,62 @@
+from sqlalchemy import delete, select
+from wannapop import db, mail_manager
+from wannapop.models import OutboxMessage
+
+
+def parts(msg):
+    text, html = msg.get_payload()
+    return text.get_content(), html.get_content()
+
+
+def test_message_has_text_and_escaped_html(app):
+    with app.app_context():
+        msg = mail_manager.message(("Ana <b>", "ana@example.com"), "Verifica tu correo", "verify",
+                                   name="<script>alert(1)</script>", link="https://example.com/v?a=1&b=2")
+
+    assert msg["To"] == '"Ana <b>" <ana@example.com>'
+    assert msg["Subject"] == "Verifica tu correo"
+    assert msg.get_content_type() == "multipart/alternative"
+    text, html = parts(msg)
+    # El texto plano sale tal cual; el HTML, escapado
+    assert "<script>alert(1)</script>" in text and "https://example.com/v?a=1&b=2" in text
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert 'href="https://example.com/v?a=1&amp;b=2"' in html
+
+
+def test_render_many_shares_the_compiled_template(app, monkeypatch):
+    lookups = []
+    original = mail_manager.jinja_env.get_template
+    monkeypatch.setattr(mail_manager.jinja_env, "get_template", lambda name: lookups.append(name) or original(name))
+
+    with app.app_context():
+        messages = mail_manager.render_many("verify", "Verifica tu correo", [
+            (("Ana", "ana@example.com"), {"name": "Ana", "link": "https://example.com/ana"}),
+            (("Luis", "luis@example.com"), {"name": "Luis", "link": "https://example.com/luis"}),
+        ], email_change=True)
+
+    assert lookups == ["emails/verify.txt", "emails/verify.html"]
+    assert [msg["To"] for msg in messages] == ["Ana <ana@example.com>", "Luis <luis@example.com>"]
+    text, html = parts(messages[1])
+    assert "Luis" in text and "https://example.com/luis" in text and "Ana" not in text
+    # El contexto compartido llega a todos
+    assert "nuevo enlace" in text and "Has cambiado el correo" in html
+
+
+def test_verification_resend_enqueues_unverified_users(app, make_user):
+    with app.app_context():
+        db.session.execute(delete(OutboxMessage))
+        db.session.commit()
+    _, pending_email = make_user(verified=False)
+    _, verified_email = make_user(verified=True)
+
+    result = app.test_cli_runner().invoke(args=["verification-resend", "--base-url", "https://wannapop.example"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        recipients = db.session.execute(select(OutboxMessage.recipients)).scalars().all()
+        raw = db.session.execute(
+            select(OutboxMessage.raw).where(OutboxMessage.recipients == pending_email)
+        ).scalar_one()
+    assert pending_email in recipients and verified_email not in recipients
+    assert f"{len(recipients)} correos de verificacion encolados." in result.output
+    assert b"https://wannapop.example/" in raw
@@ -0,0 +1,192 @@
+import logging
+import smtplib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+import pytest
+from sqlalchemy import delete
+from wannapop import db, mail_manager, mail_outbox
+from wannapop.helper_mail import SMTPTransport
+from wannapop.helpers.helper_outbox import _permanent
+from wannapop.models import OutboxMessage, OutboxStatus
+
+
+@pytest.fixture
+def outbox(ctx, monkeypatch):
+    """Outbox vacio y un SMTP falso: outcomes[destinatario] = excepcion (o nada = enviado)."""
+    db.session.execute(delete(OutboxMessage))
+    db.session.commit()
+    outcomes = {}
+    sent = []
+
+    def deliver_many(messages):
+        results = []
+        for sender, recipients, raw in messages:
+            error = outcomes.get(recipients[0])
+            if error is None:
+                sent.append(recipients)
+            results.append(error)
+        return results
+
+    monkeypatch.setattr(mail_manager, "deliver_many", deliver_many)
+    monkeypatch.setattr(mail_outbox, "retry_base", 30)
+    monkeypatch.setattr(mail_outbox, "retry_max", 3600)
+    monkeypatch.setattr(mail_outbox, "max_attempts", 3)
+    return outcomes, sent
+
+
+def enqueue(to, bcc=None):
+    msg = EmailMessage()
+    msg["From"] = "Soporte <noreply@example.com>"
+    msg["To"] = to
+    if bcc:
+        msg["Bcc"] = bcc
+    msg["Subject"] = "Hola"
+    msg.set_content("cuerpo")
+    row = mail_outbox.enqueue(msg)
+    db.session.commit()
+    return row.id
+
+
+def make_due(message_id):
+    db.session.get(OutboxMessage, message_id).next_attempt = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_enqueue_only_sends_after_commit(outbox):
+    _, sent = outbox
+    msg = EmailMessage()
+    msg["From"] = "noreply@example.com"
+    msg["To"] = "nadie@example.com"
+    msg.set_content("x")
+    mail_outbox.enqueue(msg)
+    db.session.rollback()
+
+    assert mail_outbox.send_due() == 0
+    assert sent == []
+
+
+def test_sent_once_with_bcc_hidden(outbox):
+    _, sent = outbox
+    message_id = enqueue("ana@example.com", bcc="oculto@example.com")
+
+    assert mail_outbox.send_due() == 1
+    assert mail_outbox.send_due() == 0
+    assert sent == [["ana@example.com", "oculto@example.com"]]
+
+    row = db.session.get(OutboxMessage, message_id)
+    assert row.status == OutboxStatus.sent.value and row.attempts == 1
+    assert b"oculto@example.com" not in row.raw
+
+
+def test_temporary_failure_backs_off_exponentially(outbox):
+    outcomes, sent = outbox
+    outcomes["lento@example.com"] = smtplib.SMTPServerDisconnected("caido")
+    message_id = enqueue("lento@example.com")
+
+    delays = []
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        assert mail_outbox.send_due() == 1
+        row = db.session.get(OutboxMessage, message_id)
+        assert row.status == OutboxStatus.pending.value and row.attempts == attempt
+        assert "SMTPServerDisconnected" in row.last_error
+        delays.append((row.next_attempt - before).total_seconds())
+        # Hasta que llega su hora no se vuelve a intentar
+        assert mail_outbox.send_due() == 0
+        make_due(message_id)
+
+    # 30 s y luego 60 s, con +-20% de jitter
+    assert 24 <= delays[0] <= 36.5
+    assert 48 <= delays[1] <= 72.5
+
+    del outcomes["lento@example.com"]
+    assert mail_outbox.send_due() == 1
+    assert db.session.get(OutboxMessage, message_id).status == OutboxStatus.sent.value
+    assert sent == [["lento@example.com"]]
+
+
+def test_gives_up_after_max_attempts(outbox):
+    outcomes, _ = outbox
+    outcomes["lento@example.com"] = smtplib.SMTPServerDisconnected("caido")
+    message_id = enqueue("lento@example.com")
+
+    for _ in range(3):
+        make_due(message_id)
+        mail_outbox.send_due()
+    row = db.session.get(OutboxMessage, message_id)
+    assert row.status == OutboxStatus.failed.value and row.attempts == 3
+
+
+def test_permanent_refusal_is_not_retried(outbox):
+    outcomes, _ = outbox
+    outcomes["noexiste@example.com"] = smtplib.SMTPRecipientsRefused({"noexiste@example.com": (550, b"No such user")})
+    message_id = enqueue("noexiste@example.com")
+
+    mail_outbox.send_due()
+    row = db.session.get(OutboxMessage, message_id)
+    assert row.status == OutboxStatus.failed.value and row.attempts == 1
+
+
+def test_greylisting_is_retried(outbox):
+    outcomes, _ = outbox
+    outcomes["gris@example.com"] = smtplib.SMTPRecipientsRefused({"gris@example.com": (451, b"Greylisted")})
+    message_id = enqueue("gris@example.com")
+
+    mail_outbox.send_due()
+    assert db.session.get(OutboxMessage, message_id).status == OutboxStatus.pending.value
+
+
+def test_stale_claims_are_released(outbox):
+    _, sent = outbox
+    message_id = enqueue("ana@example.com")
+    row = db.session.get(OutboxMessage, message_id)
+    # Reclamado por un worker que murio a medio envio
+    row.status = OutboxStatus.sending.value
+    row.claimed_at = datetime.utcnow() - mail_outbox.claim_timeout - timedelta(seconds=1)
+    db.session.commit()
+
+    assert mail_outbox.send_due() == 1
+    assert sent == [["ana@example.com"]]
+
+
+@pytest.mark.parametrize("error, permanent", [
+    (smtplib.SMTPRecipientsRefused({"a@x": (550, b"No such user")}), True),
+    (smtplib.SMTPRecipientsRefused({"a@x": (451, b"Greylisted")}), False),
+    (smtplib.SMTPRecipientsRefused({"a@x": (550, b"No"), "b@x": (452, b"Full")}), False),
+    (smtplib.SMTPRecipientsRefused({}), False),
+    (smtplib.SMTPDataError(554, b"Rejected"), True),
+    (smtplib.SMTPDataError(421, b"Try later"), False),
+    (smtplib.SMTPAuthenticationError(535, b"Bad credentials"), False),
+    (smtplib.SMTPServerDisconnected("caido"), False),
+    (OSError("timeout"), False),
+])
+def test_permanent(error, permanent):
+    assert _permanent(error) is permanent
+
+
+class PartialServer:
+    def sendmail(self, sender, recipients, raw):
+        return {"b@example.com": (550, b"No such user")}
+
+    def close(self):
+        pass
+
+
+def test_partial_refusal_is_logged_not_retried(caplog):
+    transport = SMTPTransport("localhost", 25, starttls=False)
+    transport._connect = lambda: [PartialServer(), 0, 0]
+
+    with caplog.at_level(logging.WARNING, logger="wannapop.helper_mail"):
+        results = transport.send_many([("noreply@example.com", ["a@example.com", "b@example.com"], b"raw")])
+
+    assert results == [None]
+    assert transport.refused == 1
+    assert "b@example.com" in caplog.text and "550 No such user" in caplog.text
+
+
+def test_raw_fits_attachments_on_mysql():
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy.schema import CreateTable
+
+    ddl = str(CreateTable(OutboxMessage.__table__).compile(dialect=mysql.dialect()))
+    assert "raw LONGBLOB NOT NULL" in ddl
@@ -0,0 +1,132 @@
+from datetime import datetime
+from sqlalchemy import text
+from wannapop import db, listing_totals
+from wannapop.helpers.helper_pagination import CursorPagination
+from wannapop.models import Product, catalog_state
+
+KEY_COLUMNS = [(Product.created, True), (Product.id, True)]
+
+
+def category_query(category_id):
+    return Product.query.filter(Product.category_id == category_id)
+
+
+def page(category_id, cursor=None, secret_key="secret"):
+    return CursorPagination(category_query(category_id), per_page=2, cursor=cursor,
+                            key_columns=KEY_COLUMNS, secret_key=secret_key)
+
+
+def test_cursor_round_trip(ctx, make_user, make_category, make_product):
+    seller_id, _ = make_user()
+    category_id, _ = make_category()
+    ids = [make_product(seller_id, category_id) for _ in range(5)]
+    newest_first = ids[::-1]
+
+    first = page(category_id)
+    assert [p.id for p in first.items] == newest_first[:2]
+    assert first.has_next and not first.has_prev
+
+    second = page(category_id, first.next_cursor)
+    assert [p.id for p in second.items] == newest_first[2:4]
+    assert second.has_next and second.has_prev
+
+    third = page(category_id, second.next_cursor)
+    assert [p.id for p in third.items] == newest_first[4:]
+    assert not third.has_next and third.next_cursor is None
+
+    back = page(category_id, third.prev_cursor)
+    assert [p.id for p in back.items] == newest_first[2:4]
+
+
+def test_tampered_or_foreign_cursor_goes_to_first_page(ctx, make_user, make_category, make_product):
+    seller_id, _ = make_user()
+    category_id, _ = make_category()
+    ids = [make_product(seller_id, category_id) for _ in range(3)]
+    cursor = page(category_id).next_cursor
+
+    assert [p.id for p in page(category_id, cursor + "x").items] == ids[::-1][:2]
+    assert [p.id for p in page(category_id, cursor, secret_key="other").items] == ids[::-1][:2]
+
+
+def test_listing_total_is_cached_per_catalog_version(ctx, make_user, make_category, make_product):
+    seller_id, _ = make_user()
+    category_id, _ = make_category()
+    make_product(seller_id, category_id)
+    key = ("test", category_id)
+
+    version, _ = catalog_state()
+    assert listing_totals.total(category_query(category_id), key, version) == 1
+    hits = listing_totals.hits
+    assert listing_totals.total(category_query(category_id), key, version) == 1
+    assert listing_totals.hits == hits + 1
+
+    make_product(seller_id, category_id)
+    version, _ = catalog_state()
+    assert listing_totals.total(category_query(category_id), key, version) == 2
+
+
+def test_listing_shows_exact_total(app, make_user, make_category, make_product, login):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    for _ in range(3):
+        make_product(seller_id, category_id)
+
+    response = login(email).get("/products", query_string={"category": category_name})
+    assert "3 productos" in response.get_data(as_text=True)
+
+
+def test_approximate_total_survives_catalog_changes_until_ttl(ctx, make_user, make_category, make_product, monkeypatch):
+    monkeypatch.setattr(listing_totals, "mode", "approximate")
+    seller_id, _ = make_user()
+    category_id, _ = make_category()
+    make_product(seller_id, category_id)
+    key = ("approx", category_id)
+
+    version, _ = catalog_state()
+    assert listing_totals.total(category_query(category_id), key, version) == 1
+    # Otra escritura: el total orientativo no se recuenta
+    make_product(seller_id, category_id)
+    version, _ = catalog_state()
+    assert listing_totals.total(category_query(category_id), key, version) == 1
+
+    monkeypatch.setattr(listing_totals, "approx_ttl", -1)
+    listing_totals.cache.clear()
+    assert listing_totals.total(category_query(category_id), key, version) == 2
+    assert listing_totals.total(category_query(category_id), key, version) == 2
+    assert listing_totals.misses >= 2
+
+
+def test_listing_total_modes(app, make_user, make_category, make_product, login, monkeypatch):
+    seller_id, email = make_user()
+    category_id, category_name = make_category()
+    for _ in range(3):
+        make_product(seller_id, category_id)
+    client = login(email)
+
+    monkeypatch.setattr(listing_totals, "mode", "approximate")
+    assert "~3 productos" in client.get("/products", query_string={"category": category_name}).get_data(as_text=True)
+
+    monkeypatch.setattr(listing_totals, "mode", "none")
+    assert "3 productos" not in client.get("/products", query_string={"category": category_name}).get_data(as_text=True)
+
+
+def test_normalize_timestamps(app, make_user, make_product):
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id)
+    with app.app_context():
+        db.session.execute(text("UPDATE products SET created = '2020-01-02', updated = '2020-01-02 03:04:05' WHERE id = :id"),
+                           {"id": product_id})
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["normalize-timestamps"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        created, updated = db.session.execute(
+            text("SELECT created, updated FROM products WHERE id = :id"), {"id": product_id}
+        ).one()
+        assert (created, updated) == ("2020-01-02 00:00:00.000000", "2020-01-02 03:04:05.000000")
+        assert db.session.get(Product, product_id).created == datetime(2020, 1, 2)
+
+    again = app.test_cli_runner().invoke(args=["normalize-timestamps"])
+    assert again.output.strip().endswith("0 fechas normalizadas.")
@@ -0,0 +1,106 @@
+import threading
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.exceptions import ServiceUnavailable
+from wannapop import db, password_hasher
+from wannapop.helpers.helper_passwords import PasswordHasher, check_password, hash_password, hash_rounds
+from wannapop.models import User
+from conftest import PASSWORD
+
+
+def stored_hash(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).password
+
+
+def test_hash_helpers():
+    pw_hash = hash_password("secreto", 4)
+    assert hash_rounds(pw_hash) == 4
+    assert check_password(pw_hash, "secreto") and not check_password(pw_hash, "otro")
+    # Hashes que no son bcrypt (p.ej. de antes de la migracion) no coinciden con nada
+    assert not check_password("pbkdf2:sha256:1000$abc$def", "secreto")
+    assert hash_rounds("pbkdf2:sha256:1000$abc$def") is None
+
+
+def test_login_rehashes_with_the_configured_cost(app, make_user, login):
+    user_id, email = make_user(pw_hash=hash_password(PASSWORD, 5))
+    rehashed = password_hasher.rehashed
+
+    login(email)
+    new_hash = stored_hash(app, user_id)
+    assert hash_rounds(new_hash) == password_hasher.rounds == 4
+    assert check_password(new_hash, PASSWORD)
+    assert password_hasher.rehashed == rehashed + 1
+
+    # Con el coste ya al dia no se toca
+    login(email)
+    assert stored_hash(app, user_id) == new_hash
+
+
+def test_failed_login_does_not_rehash(app, make_user):
+    old_hash = hash_password(PASSWORD, 5)
+    user_id, email = make_user(pw_hash=old_hash)
+
+    response = app.test_client().post("/login", data={"email": email, "password": "mala"})
+    assert response.status_code == 302 and response.headers["Location"].endswith("/login")
+    assert stored_hash(app, user_id) == old_hash
+
+
+class InlineExecutor:
+    def __init__(self, broken=False):
+        self.broken = broken
+
+    def submit(self, function, *args):
+        if self.broken:
+            raise BrokenProcessPool()
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+@pytest.fixture
+def pooled(app):
+    hasher = PasswordHasher()
+    hasher._app = app
+    hasher.rounds = 4
+    hasher.wait = 0.01
+    hasher.workers = 1
+    hasher._slots = threading.BoundedSemaphore(1)
+    hasher.executor = InlineExecutor()
+    return hasher
+
+
+def test_full_queue_is_a_503(pooled):
+    pooled._slots.acquire()
+    with pytest.raises(ServiceUnavailable) as error:
+        pooled.generate("secreto")
+    assert error.value.retry_after == 1
+    assert pooled.stats()["rejected"] == 1
+
+    pooled._slots.release()
+    assert check_password(pooled.generate("secreto"), "secreto")
+
+
+def test_broken_pool_is_replaced(pooled, monkeypatch):
+    pooled.executor = InlineExecutor(broken=True)
+    replacement = InlineExecutor()
+    monkeypatch.setattr(pooled, "_new_executor", lambda: replacement)
+
+    assert check_password(pooled.generate("secreto"), "secreto")
+    assert pooled.executor is replacement
+    # El hueco de la cola se devuelve
+    assert pooled._slots.acquire(blocking=False)
+
+
+def test_login_answers_503_when_bcrypt_is_saturated(app, make_user, monkeypatch):
+    _, email = make_user()
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(password_hasher, "executor", InlineExecutor())
+    monkeypatch.setattr(password_hasher, "_slots", slots)
+    monkeypatch.setattr(password_hasher, "wait", 0.01)
+
+    response = app.test_client().post("/login", data={"email": email, "password": PASSWORD})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,92 @@
+import pytest
+from wannapop import db
+from wannapop.hashid_utils import encode_id
+from wannapop.models import Offer, Product, ProductStatus
+
+
+@pytest.fixture
+def market(make_user, make_product, login):
+    """Vendedor con un producto, comprador con una oferta y un moderador, ya con sesion."""
+    seller_id, seller_email = make_user()
+    _, buyer_email = make_user()
+    _, moderator_email = make_user(role="moderator")
+    product_id = make_product(seller_id, price=10)
+
+    buyer = login(buyer_email)
+    response = buyer.post(f"/purchases/create/{encode_id(product_id)}", data={"price": "12"})
+    assert response.status_code == 302
+
+    return {
+        "product_id": product_id,
+        "seller": login(seller_email),
+        "moderator": login(moderator_email),
+    }
+
+
+def status_of(app, product_id):
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        # La columna desnormalizada tiene que coincidir con lo que dicen ofertas / bloqueos
+        assert product.status == product.derive_status()
+        return product.status
+
+
+def offer_of(app, product_id):
+    with app.app_context():
+        return Offer.query.filter_by(product_id=product_id).one().id
+
+
+def accept(market, offer_id):
+    return market["seller"].post(f"/sales/accept/{encode_id(offer_id)}", data={"instructions": "Recoger en tienda"})
+
+
+def test_accept_and_cancel_offer(app, market):
+    product_id = market["product_id"]
+    offer_id = offer_of(app, product_id)
+    assert status_of(app, product_id) == ProductStatus.available.value
+
+    accept(market, offer_id)
+    assert status_of(app, product_id) == ProductStatus.sold.value
+
+    market["seller"].post(f"/sales/delete/{encode_id(offer_id)}")
+    assert status_of(app, product_id) == ProductStatus.available.value
+
+
+def test_block_and_unblock(app, market):
+    product_id = market["product_id"]
+    hashid = encode_id(product_id)
+
+    market["moderator"].post(f"/products/{hashid}/block", data={"reason": "Contenido no permitido"})
+    assert status_of(app, product_id) == ProductStatus.blocked.value
+
+    market["moderator"].post(f"/products/{hashid}/unblock")
+    assert status_of(app, product_id) == ProductStatus.available.value
+
+
+def test_blocked_product_cannot_be_sold(app, market):
+    product_id = market["product_id"]
+    market["moderator"].post(f"/products/{encode_id(product_id)}/block", data={"reason": "Contenido no permitido"})
+
+    response = accept(market, offer_of(app, product_id))
+    assert response.status_code == 302
+    assert status_of(app, product_id) == ProductStatus.blocked.value
+
+
+def test_sold_product_cannot_be_blocked(app, market):
+    product_id = market["product_id"]
+    accept(market, offer_of(app, product_id))
+
+    market["moderator"].post(f"/products/{encode_id(product_id)}/block", data={"reason": "Contenido no permitido"})
+    assert status_of(app, product_id) == ProductStatus.sold.value
+
+
+def test_backfill_matches_status(app, market):
+    product_id = market["product_id"]
+    accept(market, offer_of(app, product_id))
+    with app.app_context():
+        db.session.get(Product, product_id).status = ProductStatus.available.value
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["backfill-product-status"])
+    assert result.exit_code == 0, result.output
+    assert status_of(app, product_id) == ProductStatus.sold.value
@@ -0,0 +1,141 @@
+import sqlite3
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+from wannapop import rate_limiter
+from wannapop.helpers.helper_ratelimit import MemoryBuckets, SQLiteBuckets, parse_rule, refill, spend
+from conftest import PASSWORD
+
+
+def test_parse_rule_and_refill():
+    assert parse_rule("5/60") == (5, 60.0)
+    # 5 fichas cada 60 s: una cada 12 s, sin pasar de 5
+    assert refill(0, 100, 112, 5, 60) == pytest.approx(1)
+    assert refill(4, 100, 1000, 5, 60) == 5
+
+
+def test_spend_is_all_or_nothing():
+    entries = [("ip", 10, 60, 1), ("email", 2, 60, 1)]
+    tokens, empty = spend(entries, [None, (0.5, 100)], 100)
+    # El del email esta vacio: no se gasta nada y dice cuanto falta para su siguiente ficha
+    assert tokens == [10, 0.5]
+    assert empty == (1, pytest.approx(15))
+
+    tokens, empty = spend(entries, [None, (1.5, 100)], 100)
+    assert empty is None and tokens == [9, 0.5]
+
+    # cost 0: solo mira que quede ficha
+    tokens, empty = spend([("email", 2, 60, 0)], [(1, 100)], 100)
+    assert empty is None and tokens == [1]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    return MemoryBuckets() if request.param == "memory" else SQLiteBuckets(str(tmp_path / "ratelimit.db"))
+
+
+def test_backend_spends_and_refills(buckets):
+    entries = [("ip", 2, 60, 1)]
+    assert buckets.take(entries, 1000) is None
+    assert buckets.take(entries, 1000) is None
+    position, wait = buckets.take(entries, 1000)
+    assert position == 0 and wait == pytest.approx(30)
+    assert buckets.take(entries, 1030) is None
+
+
+def test_backend_empty_bucket_spends_nothing(buckets):
+    ip, email = ("ip", 5, 60, 1), ("email", 1, 60, 1)
+    assert buckets.take([ip, email], 1000) is None
+    assert buckets.take([ip, email], 1000)[0] == 1
+    assert buckets.take([ip, email], 1000)[0] == 1
+    # Los dos 429 por email no han gastado fichas de la IP: quedan 4
+    assert all(buckets.take([ip], 1000) is None for _ in range(4))
+    assert buckets.take([ip], 1000) is not None
+
+
+def test_sqlite_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    first, second = SQLiteBuckets(path), SQLiteBuckets(path)
+    entries = [("ip", 1, 60, 1)]
+    assert first.take(entries, 1000) is None
+    assert second.take(entries, 1000) is not None
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "backend", MemoryBuckets())
+    monkeypatch.setattr(rate_limiter, "rules", {
+        "login": {"ip": (20, 60), "email": (3, 60)},
+        "register": {"ip": (2, 600)},
+    })
+    return rate_limiter
+
+
+def post_login(client, email, password):
+    return client.post("/login", data={"email": email, "password": password})
+
+
+def test_good_logins_are_not_limited(app, make_user, limiter):
+    _, email = make_user()
+    client = app.test_client()
+    for _ in range(6):
+        assert post_login(client, email, PASSWORD).status_code == 302
+
+
+def test_failed_logins_limit_the_email(app, make_user, limiter):
+    _, email = make_user()
+    _, other_email = make_user()
+    client = app.test_client()
+    for _ in range(3):
+        assert post_login(client, email, "mala").status_code == 302
+
+    response = post_login(client, email, PASSWORD)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 20
+    # El email se compara sin mayusculas ni espacios
+    assert post_login(client, f" {email.upper()} ", PASSWORD).status_code == 429
+    # Otra cuenta desde la misma IP sigue entrando
+    assert post_login(client, other_email, PASSWORD).status_code == 302
+    assert limiter.stats()["limited"]["login:email"] >= 2
+
+
+def test_ip_limit_and_json_429(app, limiter):
+    client = app.test_client()
+    assert client.post("/register", data={}).status_code != 429
+    assert client.post("/register", data={}).status_code != 429
+
+    page = client.post("/register", data={})
+    assert page.status_code == 429 and page.mimetype == "text/html"
+    api = client.post("/register", data={}, headers={"Accept": "application/json"})
+    assert api.status_code == 429 and "Retry-After" in api.headers
+    # Solo cuentan los POST
+    assert client.get("/register").status_code == 200
+
+
+def test_forwarded_for_only_behind_trusted_proxies(app, limiter, monkeypatch):
+    client = app.test_client()
+    for ip in ("203.0.113.1", "203.0.113.2"):
+        client.post("/register", data={}, headers={"X-Forwarded-For": ip})
+    # Sin TRUSTED_PROXIES la cabecera no cuenta: es la misma IP
+    assert client.post("/register", data={}, headers={"X-Forwarded-For": "203.0.113.3"}).status_code == 429
+
+    # Lo que hace create_app con TRUSTED_PROXIES = 1
+    monkeypatch.setattr(app, "wsgi_app", ProxyFix(app.wsgi_app, x_for=1, x_proto=1))
+    assert client.post("/register", data={}, headers={"X-Forwarded-For": "203.0.113.4"}).status_code != 429
+
+
+class BrokenBuckets:
+    name = "broken"
+
+    def take(self, entries, now):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_storage_errors_let_requests_through(app, make_user, limiter, monkeypatch):
+    monkeypatch.setattr(limiter, "backend", BrokenBuckets())
+    errors = limiter.errors
+    _, email = make_user()
+    client = app.test_client()
+    for _ in range(5):
+        assert post_login(client, email, "mala").status_code == 302
+    assert limiter.errors > errors
@@ -0,0 +1,35 @@
+from wannapop import db, reference_cache
+from wannapop.helpers.helper_refcache import FileChannel, ReferenceCache
+from wannapop.models import Category
+
+
+def test_commit_invalidates_categories(ctx, make_category):
+    reference_cache.categories()
+    category_id, _ = make_category("Antes")
+    assert (category_id, "Antes") in reference_cache.categories()
+
+    db.session.get(Category, category_id).name = "Despues"
+    db.session.commit()
+    assert (category_id, "Despues") in reference_cache.categories()
+
+
+def test_rollback_keeps_cached_categories(ctx, make_category):
+    category_id, _ = make_category("Sin cambios")
+    cached = reference_cache.categories()
+
+    db.session.get(Category, category_id).name = "Descartado"
+    db.session.flush()
+    db.session.rollback()
+    assert reference_cache.categories() is cached
+
+
+def test_file_channel_invalidates_other_workers(ctx, tmp_path, make_category):
+    # Dos caches = dos workers que comparten el directorio de marcas
+    worker_a, worker_b = ReferenceCache(), ReferenceCache()
+    for worker in (worker_a, worker_b):
+        worker.channel = FileChannel(str(tmp_path))
+    worker_b.categories()
+
+    category_id, _ = make_category()
+    worker_a.invalidate("categories")
+    assert category_id in [c.id for c in worker_b.categories()]
@@ -0,0 +1,54 @@
+from wannapop import db, search_index
+from wannapop.helpers.helper_search import LikeSearchBackend, SqliteFtsBackend
+from wannapop.models import Product
+
+
+def search(backend, text):
+    query = db.session.query(Product.id)
+    return [row.id for row in backend.apply(query, Product, text).all()]
+
+
+def test_sqlite_uses_fts5(ctx):
+    assert isinstance(search_index.backend, SqliteFtsBackend)
+
+
+def test_title_match_ranks_above_description(ctx, make_user, make_product):
+    seller_id, _ = make_user()
+    in_description = make_product(seller_id, title="Mesa de roble", description="Estilo zorbatico nordico")
+    in_title = make_product(seller_id, title="Lampara zorbatica", description="Para el salon")
+
+    assert search(search_index.backend, "zorbatic") == [in_title, in_description]
+
+
+def test_every_word_is_required_and_accents_are_ignored(ctx, make_user, make_product):
+    seller_id, _ = make_user()
+    both = make_product(seller_id, title="Camión de juguete quimerico")
+    make_product(seller_id, title="Camión de bomberos")
+
+    assert search(search_index.backend, "camion quimer") == [both]
+
+
+def test_index_follows_updates_and_deletes(ctx, make_user, make_product):
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id, title="Bicicleta pelirrojiza")
+    assert search(search_index.backend, "pelirrojiza") == [product_id]
+
+    product = db.session.get(Product, product_id)
+    product.title = "Bicicleta azul"
+    db.session.commit()
+    assert search(search_index.backend, "pelirrojiza") == []
+
+    db.session.delete(product)
+    db.session.commit()
+    assert search(search_index.backend, "bicicleta azul") == []
+
+
+def test_symbols_only_match_nothing(ctx):
+    assert search(search_index.backend, '"*( )') == []
+
+
+def test_like_fallback(ctx, make_user, make_product):
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id, title="Tostadora xilofonica")
+
+    assert search(LikeSearchBackend(), "xilofon") == [product_id]
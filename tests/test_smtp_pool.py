@@ -0,0 +1,137 @@
+import smtplib
+import pytest
+from wannapop.helper_mail import SMTPTransport
+
+
+class FakeSMTP:
+    """Servidor SMTP falso: cada instancia es una conexion. Se controla desde la clase."""
+    connections = []
+    fail_connect = False
+
+    def __init__(self, host, port, local_hostname=None, timeout=None):
+        if FakeSMTP.fail_connect:
+            raise ConnectionRefusedError("sin servidor")
+        self.alive = True
+        self.sent = []
+        self.noops = 0
+        self.quit_called = False
+        self.logins = []
+        FakeSMTP.connections.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        self.logins.append(username)
+
+    def noop(self):
+        self.noops += 1
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("cerrada")
+        return (250, b"OK")
+
+    def sendmail(self, sender, recipients, raw):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("cerrada")
+        if recipients == ["rechazo@example.com"]:
+            raise smtplib.SMTPRecipientsRefused({"rechazo@example.com": (550, b"No")})
+        self.sent.append(raw)
+        return {}
+
+    def quit(self):
+        self.quit_called = True
+
+    def close(self):
+        self.alive = False
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    FakeSMTP.connections = []
+    FakeSMTP.fail_connect = False
+    monkeypatch.setattr("wannapop.helper_mail.smtplib.SMTP", FakeSMTP)
+    transport = SMTPTransport("smtp.example.com", 587, username="u", password="p", starttls=False,
+                              pool_size=1, max_idle=30, max_age=300)
+    transport._local_hostname = "tests.local"
+    return transport
+
+
+def message(raw=b"hola", to="ana@example.com"):
+    return ("noreply@example.com", [to], raw)
+
+
+def test_connection_is_reused(transport):
+    assert transport.send_many([message(b"1"), message(b"2")]) == [None, None]
+    transport.send(*message(b"3"))
+
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].sent == [b"1", b"2", b"3"]
+    assert FakeSMTP.connections[0].logins == ["u"]
+    assert transport.stats() == {"pooled": 1, "opened": 1, "reused": 1, "refused": 0}
+
+
+def test_idle_connection_is_checked_with_noop(transport):
+    transport.send(*message())
+    transport.max_idle = 0
+    transport.send(*message())
+
+    assert len(FakeSMTP.connections) == 1
+    assert FakeSMTP.connections[0].noops == 1
+
+
+def test_dead_idle_connection_is_replaced(transport):
+    transport.send(*message(b"1"))
+    FakeSMTP.connections[0].alive = False
+    transport.max_idle = 0
+
+    transport.send(*message(b"2"))
+    assert len(FakeSMTP.connections) == 2
+    assert FakeSMTP.connections[1].sent == [b"2"]
+
+
+def test_disconnect_mid_batch_reconnects_and_repeats(transport):
+    transport.send(*message(b"0"))
+    first = FakeSMTP.connections[0]
+    original = first.sendmail
+
+    def drop_after_one(sender, recipients, raw):
+        if first.sent[1:]:
+            first.alive = False
+        return original(sender, recipients, raw)
+
+    first.sendmail = drop_after_one
+    assert transport.send_many([message(b"1"), message(b"2"), message(b"3")]) == [None, None, None]
+
+    assert first.sent == [b"0", b"1"]
+    assert FakeSMTP.connections[1].sent == [b"2", b"3"]
+
+
+def test_new_connection_that_fails_is_not_retried(transport):
+    FakeSMTP.fail_connect = True
+    results = transport.send_many([message(), message()])
+    assert [type(error) for error in results] == [ConnectionRefusedError] * 2
+    with pytest.raises(ConnectionRefusedError):
+        transport.send(*message())
+
+
+def test_refused_message_keeps_the_connection(transport):
+    results = transport.send_many([message(to="rechazo@example.com"), message(b"ok")])
+    assert isinstance(results[0], smtplib.SMTPRecipientsRefused) and results[1] is None
+    assert len(FakeSMTP.connections) == 1
+    assert transport.stats()["pooled"] == 1
+
+
+def test_old_connections_are_closed(transport):
+    transport.send(*message())
+    transport.max_age = -1
+    transport.send(*message())
+
+    assert FakeSMTP.connections[0].quit_called
+    assert len(FakeSMTP.connections) == 2
+
+
+def test_close_empties_the_pool(transport):
+    transport.send(*message())
+    transport.close()
+    assert transport.stats()["pooled"] == 0
+    assert FakeSMTP.connections[0].quit_called
@@ -0,0 +1,98 @@
+import gzip
+import pytest
+from flask import Flask
+from wannapop import image_workers, static_assets
+from wannapop.helpers.helper_images import thumbnails_ready
+from wannapop.helpers.helper_static import IMMUTABLE, build_version, compress_assets
+
+
+@pytest.fixture
+def static_dir(app, tmp_path, monkeypatch):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }" * 50)
+    monkeypatch.setattr(app, "static_folder", str(tmp_path))
+    return tmp_path
+
+
+def test_static_url_carries_the_fingerprint(app, static_dir):
+    with app.test_request_context():
+        url = static_assets.url("css/site.css")
+        assert url.startswith("/static/css/site.css?v=") and len(url.split("v=")[1]) == 12
+        assert static_assets.url("css/no-existe.css") == "/static/css/no-existe.css"
+
+
+def test_immutable_only_for_the_current_fingerprint(app, static_dir):
+    client = app.test_client()
+    with app.test_request_context():
+        url = static_assets.url("css/site.css")
+
+    assert client.get(url).headers["Cache-Control"] == IMMUTABLE
+    assert client.get("/static/css/site.css?v=000000000000").headers.get("Cache-Control") != IMMUTABLE
+    assert client.get("/static/css/site.css").headers.get("Cache-Control") != IMMUTABLE
+
+
+def test_html_is_always_revalidated(app):
+    response = app.test_client().get("/login")
+    assert response.mimetype == "text/html"
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_precompressed_assets(app, static_dir):
+    assert compress_assets(str(static_dir)) >= 1
+    assert compress_assets(str(static_dir)) == 0
+
+    client = app.test_client()
+    response = client.get("/static/css/site.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert gzip.decompress(response.get_data()) == (static_dir / "css" / "site.css").read_bytes()
+
+    plain = client.get("/static/css/site.css", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+
+
+def test_build_version_changes_with_templates(tmp_path):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "static").mkdir()
+    template = tmp_path / "templates" / "page.html"
+    template.write_text("<p>uno</p>")
+    demo = Flask("demo", root_path=str(tmp_path))
+
+    before = build_version(demo)
+    assert build_version(demo) == before
+    template.write_text("<p>dos</p>")
+    assert build_version(demo) != before
+
+
+def test_thumbnail_readiness_is_remembered(app, monkeypatch):
+    name = "zz/zz/recordada.jpg"
+    calls = []
+    monkeypatch.setattr("wannapop.helpers.helper_images.os.path.exists", lambda path: calls.append(path) or True)
+
+    with app.app_context():
+        image_workers.forget(name)
+        assert thumbnails_ready(name, "card") and thumbnails_ready(name, "card")
+        assert len(calls) == 1
+        # Al subir siempre se mira el disco
+        assert thumbnails_ready(name, "card", cached=False)
+        assert len(calls) == 2
+
+
+def test_not_ready_is_forgotten_when_the_pool_finishes(app, monkeypatch):
+    from concurrent.futures import Future
+
+    name = "zz/zz/pendiente.jpg"
+    ready = {"value": False}
+    monkeypatch.setattr("wannapop.helpers.helper_images.os.path.exists", lambda path: ready["value"])
+
+    with app.app_context():
+        image_workers.forget(name)
+        assert not thumbnails_ready(name, "card")
+        ready["value"] = True
+        assert not thumbnails_ready(name, "card")
+
+        future = Future()
+        future.set_result(4)
+        image_workers._slots.acquire()
+        image_workers._finished(name, name, future)
+        assert thumbnails_ready(name, "card")
@@ -0,0 +1,113 @@
+import time
+import pytest
+from wannapop.helpers.helper_suggest import SuggestIndex, fold_words
+
+
+@pytest.fixture
+def index(app):
+    index = SuggestIndex()
+    index.init_app(app)
+    return index
+
+
+def wait_ready(index, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not index.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.ready
+
+
+def test_fold_words():
+    assert fold_words("Camión  NIÑO-grande") == ["camion", "nino", "grande"]
+
+
+def test_first_query_builds_in_background(index, make_user, make_product):
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id, title="Patinete orbitalino")
+
+    assert index.suggest("orbital") == []
+    wait_ready(index)
+    assert index.suggest("orbital") == [product_id]
+
+
+def test_every_word_is_a_prefix_newest_first(app, index, make_user, make_product):
+    seller_id, _ = make_user()
+    older = make_product(seller_id, title="Mesa de madera zentolita")
+    newer = make_product(seller_id, title="Mesa zentolita de cristal")
+    make_product(seller_id, title="Silla zentolita")
+    with app.app_context():
+        index.build()
+
+    assert index.suggest("zento mes") == [newer, older]
+    assert index.suggest("zentolita mesa", limit=1) == [newer]
+    # Palabras de una letra no filtran
+    assert index.suggest("z") == []
+
+
+def test_incremental_changes(app, index):
+    with app.app_context():
+        index.build()
+
+    index.add(9_000_001, "Tambor quetzalino")
+    assert index.suggest("quetzal") == [9_000_001]
+    index.remove(9_000_001, "Tambor quetzalino")
+    assert index.suggest("quetzal") == []
+
+
+def test_changes_during_a_rebuild_are_replayed(app, index):
+    # Lo que llega mientras se construye puede no estar en lo leido de la BD
+    index._rebuilding = True
+    index.add(9_000_002, "Acordeon pirulinesco")
+    with app.app_context():
+        index.build()
+
+    assert index.suggest("pirulin") == [9_000_002]
+
+
+def test_route_is_not_cached_until_ready(app, make_user, login, monkeypatch):
+    from wannapop import suggest_index
+
+    _, email = make_user()
+    client = login(email)
+    monkeypatch.setattr(suggest_index, "built_at", None)
+    monkeypatch.setattr(suggest_index, "_rebuild_in_background", lambda: None)
+
+    response = client.get("/products/suggest", query_string={"q": "mesa"})
+    assert response.get_json()["suggestions"] == []
+    assert "no-store" in response.headers["Cache-Control"]
+
+
+def test_multi_word_matches_brute_force():
+    import random
+
+    rng = random.Random(7)
+    words = ["mesa", "madera", "mando", "maceta", "silla", "sillon", "sofa", "lampara", "lamina", "roja", "rosa"]
+    titles = {product_id: " ".join(rng.sample(words, 3)) for product_id in range(1, 600)}
+    index = SuggestIndex()
+    index.built_at = time.monotonic()
+    for product_id, title in titles.items():
+        index.add(product_id, title)
+
+    for query in ("ma si", "mad sil", "lam ro", "mesa sofa rosa", "sill la ro", "ma ma", "mesa xilofono"):
+        prefixes = [word for word in fold_words(query) if len(word) >= 2]
+        expected = sorted(
+            (product_id for product_id, title in titles.items()
+             if all(any(word.startswith(prefix) for word in title.split()) for prefix in prefixes)),
+            reverse=True,
+        )[:8]
+        assert index.suggest(query) == expected, query
+
+
+def test_published_postings_are_not_changed_in_place():
+    index = SuggestIndex()
+    index.built_at = time.monotonic()
+    for product_id in (1, 3, 5):
+        index.add(product_id, "mesa")
+    seen = index.postings["mesa"]
+
+    # Una consulta puede estar recorriendo seen sin el lock
+    index.add(2, "mesa")
+    index.remove(3, "mesa")
+    assert list(seen) == [1, 3, 5]
+    assert list(index.postings["mesa"]) == [1, 2, 5]
+    assert index.suggest("mesa") == [5, 2, 1]
@@ -0,0 +1,63 @@
+import io
+import os
+import time
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from wannapop import db
+from wannapop.helpers.helper_files import save_image
+from wannapop.helpers.helper_images import thumb_name
+from wannapop.models import Product
+
+
+def jpeg(color):
+    output = io.BytesIO()
+    Image.new("RGB", (50, 50), color).save(output, format="JPEG")
+    return output.getvalue()
+
+
+def upload(app, data, filename="Foto.JPG"):
+    with app.test_request_context():
+        return save_image(FileStorage(io.BytesIO(data), filename=filename), app.config["UPLOAD_FOLDER"])
+
+
+def test_same_content_is_stored_once(app):
+    data = jpeg("green")
+    first = upload(app, data, "a.jpg")
+    second = upload(app, data, "otro nombre.JPG")
+
+    assert first == second
+    digest = os.path.basename(first).split(".")[0]
+    assert first == f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    assert os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], first))
+    assert not [name for name in os.listdir(app.config["UPLOAD_FOLDER"]) if name.endswith(".part")]
+
+
+def test_gc_removes_only_unreferenced_old_uploads(app, make_user, make_product):
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    used = upload(app, jpeg("navy"))
+    unused = upload(app, jpeg("olive"))
+    recent = upload(app, jpeg("teal"))
+
+    seller_id, _ = make_user()
+    product_id = make_product(seller_id)
+    with app.app_context():
+        db.session.get(Product, product_id).photo = used
+        db.session.commit()
+
+    old = time.time() - 7200
+    for name in (used, unused, thumb_name(used, "card", 300), thumb_name(unused, "card", 300)):
+        os.utime(os.path.join(upload_folder, name), (old, old))
+
+    result = app.test_cli_runner().invoke(args=["uploads-gc"])
+    assert result.exit_code == 0, result.output
+
+    exists = lambda name: os.path.exists(os.path.join(upload_folder, name))
+    assert exists(used) and exists(thumb_name(used, "card", 300))
+    assert not exists(unused) and not exists(thumb_name(unused, "card", 300))
+    assert exists(recent)
+
+
+def test_default_folder_is_upload_folder(app):
+    with app.test_request_context():
+        name = save_image(FileStorage(io.BytesIO(jpeg("maroon")), filename="sin-carpeta.jpg"))
+    assert os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], name))
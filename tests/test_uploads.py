@@ -0,0 +1,103 @@
+import io
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from wannapop import db
+from wannapop.helpers.helper_uploads import LimitedSpool, sniff_type
+from wannapop.models import Product
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+@pytest.mark.parametrize("head, expected", [
+    (JPEG, "jpeg"),
+    (PNG, "png"),
+    (b"GIF89a" + b"\x00" * 10, "gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "webp"),
+    (b"%PDF-1.7\n", "pdf"),
+    (b"<?php echo 1; ?>", None),
+    (b"", None),
+])
+def test_sniff_type(head, expected):
+    stream = io.BytesIO(b"xx" + head)
+    stream.seek(2)
+    assert sniff_type(stream) == expected
+    # Deja el stream donde estaba
+    assert stream.tell() == 2
+
+
+def test_spool_cuts_at_the_limit():
+    spool = LimitedSpool(10, max_size=4)
+    spool.write(b"12345")
+    spool.write(b"67890")
+    with pytest.raises(RequestEntityTooLarge):
+        spool.write(b"x")
+
+
+def product_data(category_id, title, photo, filename="foto.jpg"):
+    return {
+        "title": title,
+        "description": "Descripcion de prueba",
+        "price": "12",
+        "category": str(category_id),
+        "photo": (io.BytesIO(photo), filename),
+    }
+
+
+def post_product(client, category_id, title, photo, filename="foto.jpg"):
+    data = product_data(category_id, title, photo, filename)
+    return client.post("/products/create", data=data, content_type="multipart/form-data")
+
+
+def products_titled(app, title):
+    with app.app_context():
+        return db.session.query(Product).filter_by(title=title).count()
+
+
+def test_extension_is_not_enough(app, make_user, make_category, login):
+    _, email = make_user()
+    category_id, _ = make_category()
+    client = login(email)
+
+    response = post_product(client, category_id, "Disfrazado", b"<?php system($_GET['c']); ?>", "shell.jpg")
+    assert response.status_code == 200
+    assert "Tipo de archivo no permitido" in response.get_data(as_text=True)
+    assert products_titled(app, "Disfrazado") == 0
+
+
+def test_real_image_with_any_allowed_extension(app, make_user, make_category, login):
+    _, email = make_user()
+    category_id, _ = make_category()
+    client = login(email)
+
+    # Un PNG llamado .jpg es una imagen valida: manda el contenido, no la extension
+    response = post_product(client, category_id, "Png como jpg", PNG, "foto.jpg")
+    assert response.status_code == 302
+    assert products_titled(app, "Png como jpg") == 1
+
+
+def test_too_large_file_is_a_form_error(app, make_user, make_category, login, monkeypatch):
+    _, email = make_user()
+    category_id, _ = make_category()
+    client = login(email)
+    monkeypatch.setitem(app.config, "UPLOAD_MAX_FILE_SIZE", 1024)
+
+    response = post_product(client, category_id, "Enorme", JPEG + b"\x00" * 4096)
+    assert response.status_code == 303
+    assert response.headers["Location"].endswith("/products/create")
+    assert products_titled(app, "Enorme") == 0
+
+    page = client.get("/products/create").get_data(as_text=True)
+    assert "El archivo es demasiado grande" in page
+
+
+def test_too_large_json_keeps_the_413(app, make_user, make_category, login, monkeypatch):
+    _, email = make_user()
+    category_id, _ = make_category()
+    client = login(email)
+    monkeypatch.setitem(app.config, "UPLOAD_MAX_FILE_SIZE", 1024)
+
+    data = product_data(category_id, "Enorme json", JPEG + b"\x00" * 4096)
+    response = client.post("/products/create", data=data, content_type="multipart/form-data",
+                           headers={"Accept": "application/json"})
+    assert response.status_code == 413
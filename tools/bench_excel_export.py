@@ -0,0 +1,82 @@
+"""
+Benchmark de la exportacion a Excel: Workbook normal + BytesIO (antes) contra
+write-only + fichero temporal (ahora). Cada caso corre en un proceso nuevo para
+que el pico de RSS (ru_maxrss) sea solo suyo.
+
+    python tools/bench_excel_export.py [filas]     # por defecto 100000
+"""
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def make_database(path, rows):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, title TEXT, description TEXT, price NUMERIC)")
+    connection.executemany(
+        "INSERT INTO products (title, description, price) VALUES (?, ?, ?)",
+        ((f"Producto {i}", "Descripcion de ejemplo, con comas y algo de texto. " * 4, 19.99) for i in range(rows))
+    )
+    connection.commit()
+    connection.close()
+
+
+def run_before(path):
+    import openpyxl
+
+    connection = sqlite3.connect(path)
+    rows = connection.execute("SELECT id, title, description, price FROM products").fetchall()
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["ID", "Título", "Descripción", "Precio"])
+    for row in rows:
+        sheet.append(list(row))
+
+    output = BytesIO()
+    workbook.save(output)
+    return output.tell()
+
+
+def run_after(path):
+    from sqlalchemy import create_engine, text
+    from wannapop.helpers.helper_export import iter_rows, write_xlsx
+
+    engine = create_engine("sqlite:///" + path)
+    with tempfile.TemporaryFile(suffix=".xlsx") as output:
+        write_xlsx(iter_rows(engine, text("SELECT id, title, description, price FROM products ORDER BY id")), output)
+        return output.tell()
+
+
+def child(case, path):
+    start = time.perf_counter()
+    size = {"before": run_before, "after": run_after}[case](path)
+    elapsed = time.perf_counter() - start
+    # Linux: ru_maxrss en KB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{case:<7} {elapsed:7.1f} s  {peak:8.1f} MB RSS pico  {size / 1024 / 1024:6.1f} MB xlsx")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        make_database(path, rows)
+        print(f"{rows} filas")
+        for case in ("before", "after"):
+            subprocess.run([sys.executable, __file__, "--child", case, path], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de login bajo avalancha: N hilos haciendo POST /login sin parar (un worker de la app,
+como un worker de gunicorn con hilos) y otro hilo pidiendo una pagina ligera (GET /login) para ver
+cuanto se resiente el resto del trafico. Compara bcrypt en la peticion (BCRYPT_WORKERS=0)
+contra el pool de procesos. Cada caso corre en un proceso nuevo con su base de datos temporal.
+
+    python tools/bench_login.py [hilos] [segundos] [workers_del_pool]     # por defecto 16, 10 y 2
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"n": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+def run(threads, seconds):
+    """Un caso, dentro del proceso hijo (BCRYPT_WORKERS ya esta en el entorno)."""
+    os.environ.setdefault("CONTACT_ADDR", "admin@example.com")
+    os.environ.setdefault("SALT", "bench")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["OUTBOX_SENDER"] = "off"
+    # La avalancha sale toda de la misma IP y el mismo email: sin limite, si no serian 429
+    os.environ["RATELIMIT_ENABLED"] = "0"
+    import config
+    config.SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(os.getcwd(), "bench.db")
+    config.SQLALCHEMY_ECHO = False
+    config.DEBUG_TB_ENABLED = False
+    config.WTF_CSRF_ENABLED = False
+
+    from wannapop import create_app, db, password_hasher
+    from wannapop.models import Role, User
+
+    app = create_app()
+    with app.app_context():
+        db.session.add(Role(id=1, name="wanner"))
+        db.session.add(User(name="Bench", email=EMAIL, password=password_hasher.generate(PASSWORD),
+                            avatar="avatar.png", role_id=1, verified=True, email_token="bench"))
+        db.session.commit()
+
+    logins, pages, statuses = [], [], {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def storm():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post("/login", data={"email": EMAIL, "password": PASSWORD})
+            elapsed = (time.perf_counter() - started) * 1000
+            client.get("/logout")
+            with lock:
+                logins.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    def light():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get("/login")
+            with lock:
+                pages.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    workers = [threading.Thread(target=storm) for _ in range(threads)] + [threading.Thread(target=light)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    print(json.dumps({"login": percentiles(logins), "page": percentiles(pages), "status": statuses}))
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    pool = sys.argv[3] if len(sys.argv) > 3 else "2"
+
+    print(f"{threads} hilos haciendo login durante {seconds:.0f}s, {os.cpu_count()} CPUs")
+    print(f"{'caso':<22} {'logins':>7} {'p50':>8} {'p95':>8} {'p99':>8}   {'GET p50':>8} {'GET p99':>8}   estados")
+    for label, workers in (("en la peticion", "0"), (f"pool de {pool} procesos", pool)):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, BCRYPT_WORKERS=workers)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", str(threads), str(seconds)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        login, page = result["login"], result["page"]
+        print(f"{label:<22} {login['n']:>7} {login['p50']:>7.0f}ms {login['p95']:>7.0f}ms {login['p99']:>7.0f}ms"
+              f"   {page['p50']:>7.0f}ms {page['p99']:>7.0f}ms   {result['status']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,86 @@
+"""
+Benchmark del envio SMTP: una conexion nueva por mensaje (como antes) contra el pool
+de SMTPTransport (MailManager), mensaje a mensaje y en lotes por una sola conexion.
+Usa el servidor falso de tools/fake_smtp.py en un hilo, con --rtt de latencia simulada
+antes de cada respuesta (sin TLS: en un servidor real la conexion nueva cuesta ademas
+STARTTLS + AUTH, unos 3 viajes mas).
+
+    python tools/bench_smtp.py [mensajes] [rtt_segundos]     # por defecto 200 y 0.005
+"""
+import os
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_smtp import FakeSMTPServer  # noqa: E402
+from wannapop.helper_mail import SMTPTransport  # noqa: E402
+
+BATCH = 20
+
+
+def make_message(i):
+    msg = EmailMessage()
+    msg["From"] = "noreply@example.com"
+    msg["To"] = f"user{i}@example.com"
+    msg["Subject"] = "Verifica tu correo"
+    msg.set_content("Por favor verifica tu email.\n" * 20)
+    return ("noreply@example.com", [f"user{i}@example.com"], msg.as_bytes())
+
+
+def connection_per_message(host, port, messages):
+    for sender, recipients, raw in messages:
+        with smtplib.SMTP(host, port) as server:
+            server.sendmail(sender, recipients, raw)
+
+
+def pooled(host, port, messages):
+    transport = SMTPTransport(host, port, starttls=False)
+    for sender, recipients, raw in messages:
+        transport.send(sender, recipients, raw)
+    transport.close()
+
+
+def pooled_batches(host, port, messages):
+    transport = SMTPTransport(host, port, starttls=False)
+    for start in range(0, len(messages), BATCH):
+        errors = [e for e in transport.send_many(messages[start:start + BATCH]) if e is not None]
+        assert not errors, errors
+    transport.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rtt = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    messages = [make_message(i) for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        options = Namespace(host="127.0.0.1", port=0, dir=directory, delay=0, fail_rate=0, rtt=rtt, quiet=True)
+        server = FakeSMTPServer(options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+        print(f"{count} mensajes, rtt {rtt * 1000:.0f} ms")
+        for name, case in (
+            ("conexion por mensaje", connection_per_message),
+            ("pool, uno a uno", pooled),
+            (f"pool, lotes de {BATCH}", pooled_batches),
+        ):
+            before = server.count
+            start = time.perf_counter()
+            case(host, port, messages)
+            elapsed = time.perf_counter() - start
+            assert server.count - before == count
+            print(f"{name:<22} {elapsed:6.2f} s  {count / elapsed:8.1f} mensajes/s")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Comprueba con EXPLAIN QUERY PLAN (SQLite) que ninguna combinacion de filtros / orden
+del listado /products ordena la tabla entera ("USE TEMP B-TREE FOR ORDER BY").
+
+    python tools/explain_listing.py
+
+Sale con codigo 1 si alguna combinacion necesita ordenar.
+"""
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+from itertools import product as combinations
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from wannapop import create_app, db  # noqa: E402
+from wannapop.models import Category  # noqa: E402
+from wannapop.helpers.helper_listing import listing_query, SORTS  # noqa: E402
+from wannapop.helpers.helper_pagination import keyset_filter  # noqa: E402
+
+# Valores de ejemplo para la segunda pagina (cursor)
+CURSOR_VALUES = {
+    "newest": [datetime(2024, 1, 1), 1000],
+    "price_asc": [Decimal("10"), 1000],
+    "price_desc": [Decimal("10"), 1000],
+}
+
+
+def driver_value(value):
+    # El plan no depende del valor: basta con un tipo que sqlite3 sepa enlazar
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return value
+
+
+def explain(query):
+    compiled = query.statement.compile(db.engine)
+    params = tuple(driver_value(compiled.params[name]) for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.engine.echo = False
+        if db.engine.dialect.name != "sqlite":
+            print("Solo para SQLite (EXPLAIN QUERY PLAN)")
+            return 0
+
+        category = db.session.query(Category.name).order_by(Category.id).limit(1).scalar()
+        failures = 0
+
+        for staff, category_name, price, sort, second_page in combinations(
+            (False, True), (None, category), (False, True), SORTS, (False, True)
+        ):
+            query, key_columns = listing_query(
+                staff=staff,
+                category=category_name,
+                min_price=Decimal("5") if price else None,
+                max_price=Decimal("50") if price else None,
+                sort=sort,
+            )
+            if second_page:
+                query = query.filter(keyset_filter(key_columns, CURSOR_VALUES[sort]))
+
+            plan = explain(query.limit(13))
+            sorts_table = any("TEMP B-TREE" in step for step in plan)
+            failures += sorts_table
+
+            label = (
+                f"{'staff ' if staff else 'wanner'} category={'si' if category_name else 'no'} "
+                f"precio={'si' if price else 'no'} sort={sort:<10} pagina={'2' if second_page else '1'}"
+            )
+            print(f"{'ORDENA' if sorts_table else 'ok    '} {label}")
+            for step in plan:
+                print(f"         {step}")
+
+        print(f"\n{failures} combinaciones ordenan la tabla")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
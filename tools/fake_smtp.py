@@ -0,0 +1,135 @@
+"""
+Servidor SMTP falso para desarrollo y pruebas del outbox de correo. No envia nada:
+guarda cada mensaje como .eml y lo resume por pantalla. Sin STARTTLS ni login.
+
+    python tools/fake_smtp.py [--port 2525] [--dir /tmp/mails] [--delay 2] [--fail-rate 0.3] [--rtt 0.02]
+
+En el .env de la app:
+
+    MAIL_SMTP_SERVER=127.0.0.1
+    MAIL_SMTP_PORT=2525
+    MAIL_SMTP_STARTTLS=0
+
+--delay simula un servidor lento (segundos por mensaje), --rtt la latencia de red
+(segundos antes de cada respuesta) y --fail-rate contesta un 451 temporal a esa
+fraccion de mensajes (para ver los reintentos).
+"""
+import argparse
+import os
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        if self.server.options.rtt and not line.startswith("250-"):
+            time.sleep(self.server.options.rtt)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        options = self.server.options
+        sender, recipients = None, []
+        self.reply("220 fake-smtp listo")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-fake-smtp")
+                self.reply("250 8BITMIME")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].split()[0].strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 Fin con <CRLF>.<CRLF>")
+                data = self.read_data()
+                if options.delay:
+                    time.sleep(options.delay)
+                if random.random() < options.fail_rate:
+                    self.reply("451 Fallo temporal simulado")
+                else:
+                    self.save(sender, recipients, data)
+                    self.reply("250 OK guardado")
+                sender, recipients = None, []
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Adios")
+                return
+            else:
+                self.reply("502 No implementado")
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            # Dot-stuffing (RFC 5321 4.5.2)
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def save(self, sender, recipients, data):
+        server = self.server
+        with server.lock:
+            server.count += 1
+            number = server.count
+        path = os.path.join(server.options.dir, f"{int(time.time())}-{number:05d}.eml")
+        with open(path, "wb") as output:
+            output.write(data)
+
+        if server.options.quiet:
+            return
+        message = message_from_bytes(data, policy=policy.default)
+        attachments = sum(1 for _ in message.iter_attachments())
+        print(f"#{number} {sender} -> {', '.join(recipients)} | {message['Subject']} | "
+              f"{len(data)} bytes, {attachments} adjuntos | {path}", flush=True)
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, options):
+        super().__init__((options.host, options.port), SMTPHandler)
+        self.options = options
+        self.count = 0
+        self.lock = threading.Lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SMTP falso (guarda .eml)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--dir", default=os.path.join("instance", "mails"))
+    parser.add_argument("--delay", type=float, default=0, help="segundos de espera por mensaje")
+    parser.add_argument("--fail-rate", type=float, default=0, help="fraccion de mensajes con 451")
+    parser.add_argument("--rtt", type=float, default=0, help="segundos de latencia antes de cada respuesta")
+    parser.add_argument("--quiet", action="store_true", help="no imprime cada mensaje")
+    options = parser.parse_args()
+
+    os.makedirs(options.dir, exist_ok=True)
+    with FakeSMTPServer(options) as server:
+        print(f"SMTP falso en {options.host}:{options.port}, mensajes en {options.dir}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,22 @@ import logging
 from logging.handlers import RotatingFileHandler
 from .hashid_utils import encode_id, decode_id
 from .helper_mail import MailManager
+from .helpers.helper_search import SearchIndex
+from .helpers.helper_refcache import ReferenceCache
+from .helpers.helper_fragments import FragmentCache
+from .helpers.helper_facets import FacetCounts, ListingTotals
+from .helpers.helper_suggest import SuggestIndex
+from .helpers.helper_jobs import ExportJobs
+from .helpers.helper_images import ImageWorkers, image_attrs
+from .helpers.helper_static import StaticAssets
+from .helpers.helper_uploads import UploadLimits
+from .helpers.helper_outbox import MailOutbox
+from .helpers.helper_identity import IdentityCache
+from .helpers.helper_passwords import PasswordHasher
+from .helpers.helper_ratelimit import RateLimiter
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 from flask_principal import Principal
 from flask_wtf.csrf import CSRFProtect
@@ -15,42 +28,76 @@ from types import SimpleNamespace
 
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
+rate_limiter = RateLimiter()
 login_manager = LoginManager()
 principal_manager = Principal()
 mail_manager = MailManager()
+mail_outbox = MailOutbox()
 csrf = CSRFProtect()
 toolbar = DebugToolbarExtension()
+search_index = SearchIndex()
+reference_cache = ReferenceCache()
+fragment_cache = FragmentCache()
+facet_counts = FacetCounts()
+listing_totals = ListingTotals()
+suggest_index = SuggestIndex()
+export_jobs = ExportJobs()
+image_workers = ImageWorkers()
+static_assets = StaticAssets()
+upload_limits = UploadLimits()
+identity_cache = IdentityCache()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object("config")
 
+    # Detras de TRUSTED_PROXIES proxies, remote_addr / scheme salen de X-Forwarded-*
+    if app.config.get("TRUSTED_PROXIES"):
+        proxies = app.config["TRUSTED_PROXIES"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
     @app.context_processor
     def utility_processor():
 
         return dict(
             encode_id=encode_id,
             decode_id=decode_id,
-            hashids=SimpleNamespace(encode=encode_id)  
+            hashids=SimpleNamespace(encode=encode_id),
+            product_card=fragment_cache.product_card,
+            image_attrs=image_attrs
         )
 
     db.init_app(app)
-    bcrypt.init_app(app)
+    password_hasher.init_app(app)
     login_manager.init_app(app)
     principal_manager.init_app(app)
     mail_manager.init_app(app)
+    mail_outbox.init_app(app)
+    reference_cache.init_app(app)
+    identity_cache.init_app(app)
+    fragment_cache.init_app(app)
+    facet_counts.init_app(app)
+    listing_totals.init_app(app)
+    suggest_index.init_app(app)
+    export_jobs.init_app(app)
+    image_workers.init_app(app)
+    static_assets.init_app(app)
+    upload_limits.init_app(app)
+    rate_limiter.init_app(app)
     csrf.init_app(app)
     toolbar.init_app(app)
 
 
     register_blueprints(app)
+    register_commands(app)
 
     setup_login_manager()
 
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     with app.app_context():
         db.create_all()
+        search_index.init_app(app, db.engine)
 
 
     setup_logging(app)
@@ -84,13 +131,31 @@ def register_blueprints(app):
     app.register_blueprint(routes_sales)
     app.register_blueprint(routes_purchases)
 
+def register_commands(app):
+    """ Registrar los comandos de `flask`."""
+    from .commands import (
+        search_reindex, backfill_product_status, create_indexes, exports_purge, thumbnails_backfill, uploads_gc,
+        assets_compress, outbox_send, verification_resend, normalize_timestamps
+    )
+
+    app.cli.add_command(search_reindex)
+    app.cli.add_command(create_indexes)
+    app.cli.add_command(exports_purge)
+    app.cli.add_command(thumbnails_backfill)
+    app.cli.add_command(uploads_gc)
+    app.cli.add_command(assets_compress)
+    app.cli.add_command(outbox_send)
+    app.cli.add_command(verification_resend)
+    app.cli.add_command(backfill_product_status)
+    app.cli.add_command(normalize_timestamps)
+
 def setup_login_manager():
     """Config login_manager y cargar el usuario."""
-    from .models import User
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Usuario + rol + bloqueo en una consulta, o ninguna si esta en la cache de identidad
+        return identity_cache.load(int(user_id))
 
     login_manager.login_view = "auth_page.login"
     login_manager.login_message = "Por favor, inicia sesion para acceder a esta pagina."
@@ -0,0 +1,245 @@
+import os
+import time
+import click
+from datetime import datetime, timedelta
+from flask import current_app, url_for
+from flask.cli import with_appcontext
+from PIL import UnidentifiedImageError
+from sqlalchemy import DateTime, inspect, text, update, delete
+from . import db, search_index, export_jobs, mail_manager, mail_outbox
+from .models import Product, ProductChange, User, product_status_expression
+from .hashid_utils import encode_id
+from .helpers.helper_files import iter_uploads
+from .helpers.helper_static import compress_assets
+from .helpers.helper_images import (
+    THUMBS_DIR, PRODUCT_VARIANTS, AVATAR_VARIANTS, strip_metadata, make_thumbnails
+)
+
+
+@click.command("search-reindex")
+@with_appcontext
+def search_reindex():
+    """Reconstruye el indice de busqueda de productos."""
+    search_index.rebuild(db.engine)
+    click.echo(f"Indice de busqueda reconstruido ({search_index.backend.name}).")
+
+
+@click.command("exports-purge")
+@with_appcontext
+def exports_purge():
+    """Borra las exportaciones caducadas y el registro de cambios mas viejo que la retencion."""
+    purged = export_jobs.purge_expired()
+    click.echo(f"{purged} exportaciones borradas.")
+
+    horizon = datetime.utcnow() - timedelta(days=current_app.config["EXPORT_CHANGELOG_DAYS"])
+    result = db.session.execute(delete(ProductChange).where(ProductChange.created < horizon))
+    db.session.commit()
+    click.echo(f"{result.rowcount} cambios antiguos borrados del registro.")
+
+
+@click.command("thumbnails-backfill")
+@click.option("--force", is_flag=True, help="Regenera tambien las miniaturas que ya existen.")
+@click.option("--strip-exif/--keep-exif", default=True, show_default=True,
+              help="Reescribe tambien los originales sin EXIF (los subidos antes de quitarlo al guardar).")
+@with_appcontext
+def thumbnails_backfill(force, strip_exif):
+    """Quita el EXIF y genera las miniaturas WebP de los ficheros que ya hay en static/uploads."""
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    avatars = {avatar for (avatar,) in db.session.query(User.avatar).distinct()}
+    photos = {photo for (photo,) in db.session.query(Product.photo).distinct()}
+
+    written = skipped = 0
+    for name, path in iter_uploads(upload_folder):
+        # Un fichero suelto que no es de nadie se trata como foto de producto
+        variants = AVATAR_VARIANTS if name in avatars else ()
+        if name in photos or not variants:
+            variants += PRODUCT_VARIANTS
+        try:
+            if strip_exif:
+                strip_metadata(path)
+            written += make_thumbnails(path, upload_folder, variants, force=force)
+        except (UnidentifiedImageError, OSError) as e:
+            skipped += 1
+            click.echo(f"{name}: {e}", err=True)
+
+    click.echo(f"{written} miniaturas generadas, {skipped} ficheros ignorados.")
+
+
+@click.command("uploads-gc")
+@click.option("--grace", default=3600, show_default=True, help="Segundos: no se borra nada mas nuevo.")
+@click.option("--dry-run", is_flag=True, help="Solo lista lo que se borraria.")
+@with_appcontext
+def uploads_gc(grace, dry_run):
+    """Borra las subidas que no usa ningun producto ni usuario, sus miniaturas y temporales viejos."""
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    referenced = {photo for (photo,) in db.session.query(Product.photo).distinct() if photo}
+    referenced |= {avatar for (avatar,) in db.session.query(User.avatar).distinct()}
+    horizon = time.time() - grace
+
+    def remove(path):
+        click.echo(f"{'Se borraria' if dry_run else 'Borrado'}: {os.path.relpath(path, upload_folder)}")
+        if not dry_run:
+            os.remove(path)
+
+    removed = 0
+    kept_stems = set()
+    for name, path in iter_uploads(upload_folder):
+        if name in referenced or os.path.getmtime(path) > horizon:
+            kept_stems.add(os.path.splitext(name)[0])
+            continue
+        remove(path)
+        removed += 1
+
+    # Miniaturas sin original y temporales abandonados (subidas / miniaturas a medias)
+    thumbs_folder = os.path.join(upload_folder, THUMBS_DIR)
+    for root, _, files in os.walk(upload_folder):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            if file_name.endswith((".part", ".tmp")):
+                if os.path.getmtime(path) < horizon:
+                    remove(path)
+            elif root.startswith(thumbs_folder):
+                stem = os.path.relpath(path, thumbs_folder).replace(os.sep, "/").rsplit("-", 2)[0]
+                if stem not in kept_stems:
+                    remove(path)
+
+    # Carpetas del reparto (ab/cd/) que se han quedado vacias
+    if not dry_run:
+        for root, dirs, files in os.walk(upload_folder, topdown=False):
+            if root != upload_folder and not os.listdir(root) and os.path.getmtime(root) < horizon:
+                os.rmdir(root)
+
+    click.echo(f"{removed} subidas sin usar {'encontradas' if dry_run else 'borradas'}.")
+
+
+@click.command("assets-compress")
+@click.option("--force", is_flag=True, help="Vuelve a comprimir aunque ya este al dia.")
+@with_appcontext
+def assets_compress(force):
+    """Genera los .gz (y .br con el paquete brotli) de CSS / JS para servirlos precomprimidos."""
+    written = compress_assets(current_app.static_folder, force=force)
+    click.echo(f"{written} ficheros comprimidos.")
+
+
+@click.command("outbox-send")
+@click.option("--loop", is_flag=True, help="No termina: sigue enviando (para OUTBOX_SENDER=off).")
+@with_appcontext
+def outbox_send(loop):
+    """Envia los correos pendientes del outbox."""
+    while True:
+        processed = mail_outbox.send_due()
+        if processed:
+            click.echo(f"{processed} correos procesados.")
+        if not loop:
+            break
+        if processed < mail_outbox.batch_size:
+            time.sleep(mail_outbox.poll_interval)
+            mail_outbox.purge_sent()
+
+
+@click.command("verification-resend")
+@click.option("--base-url", required=True, help="URL publica de la app para los enlaces (https://...).")
+@click.option("--batch", default=500, show_default=True, help="Usuarios por commit.")
+@with_appcontext
+def verification_resend(base_url, batch):
+    """Vuelve a mandar el correo de verificacion a los usuarios sin verificar (via outbox)."""
+    query = db.session.query(User).filter(User.verified.is_(False), User.email_token.isnot(None)).order_by(User.id)
+    queued = 0
+    # url_for(_external) necesita saber el host: contexto de peticion falso con base_url
+    with current_app.test_request_context(base_url=base_url):
+        last_id = 0
+        while True:
+            users = query.filter(User.id > last_id).limit(batch).all()
+            if not users:
+                break
+            last_id = users[-1].id
+            messages = mail_manager.render_many("verify", "Verifica tu correo", [
+                ((user.name, user.email), {
+                    "name": user.name,
+                    "link": url_for("auth_page.verify_email", hashid=encode_id(user.id),
+                                    email_token=user.email_token, _external=True),
+                })
+                for user in users
+            ])
+            for msg in messages:
+                mail_outbox.enqueue(msg)
+            db.session.commit()
+            queued += len(messages)
+    click.echo(f"{queued} correos de verificacion encolados.")
+
+
+@click.command("create-indexes")
+@with_appcontext
+def create_indexes():
+    """Crea los indices de los modelos que falten (create_all no los anade a tablas existentes)."""
+    created = 0
+    with db.engine.begin() as connection:
+        existing = {
+            table.name: {index["name"] for index in inspect(connection).get_indexes(table.name)}
+            for table in db.metadata.sorted_tables
+        }
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing[table.name]:
+                    index.create(connection)
+                    click.echo(f"Indice {index.name} creado.")
+                    created += 1
+    click.echo(f"{created} indices nuevos.")
+
+
+@click.command("normalize-timestamps")
+@with_appcontext
+def normalize_timestamps():
+    """
+    SQLite: pasa las fechas guardadas como 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS' al formato de
+    SQLAlchemy ('YYYY-MM-DD HH:MM:SS.ffffff'). SQLite las compara como texto y las cortas quedan
+    mal ordenadas frente a los parametros (cursor (created, id), exportacion delta...).
+    """
+    if db.engine.dialect.name != "sqlite":
+        click.echo("Solo hace falta en SQLite (los otros motores guardan DATETIME de verdad).")
+        return
+
+    fixed = 0
+    with db.engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            for column in table.columns:
+                if not isinstance(column.type, DateTime):
+                    continue
+                for length, suffix in ((10, " 00:00:00.000000"), (19, ".000000")):
+                    result = connection.execute(text(
+                        f'UPDATE "{table.name}" SET "{column.name}" = "{column.name}" || :suffix '
+                        f'WHERE length("{column.name}") = :length'
+                    ), {"suffix": suffix, "length": length})
+                    if result.rowcount:
+                        click.echo(f"{table.name}.{column.name}: {result.rowcount} fechas normalizadas.")
+                        fixed += result.rowcount
+    click.echo(f"{fixed} fechas normalizadas.")
+
+
+@click.command("backfill-product-status")
+@with_appcontext
+def backfill_product_status():
+    """Anade products.status si falta y lo rellena desde ofertas aceptadas / bloqueos."""
+    columns = {c["name"] for c in inspect(db.engine).get_columns("products")}
+
+    with db.engine.begin() as connection:
+        if "status" not in columns:
+            connection.execute(text(
+                "ALTER TABLE products ADD COLUMN status VARCHAR(16) NOT NULL DEFAULT 'available'"
+            ))
+            click.echo("Columna products.status creada.")
+
+        for index in Product.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+    # Un solo UPDATE; updated se deja igual (no es un cambio del producto)
+    result = db.session.execute(
+        update(Product)
+        .values(status=product_status_expression(), updated=Product.updated)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    click.echo(f"Estado recalculado en {result.rowcount} productos.")
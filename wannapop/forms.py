@@ -2,6 +2,7 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, IntegerField, PasswordField, SelectField, TextAreaField, HiddenField, MultipleFileField, DecimalField
 from wtforms.validators import DataRequired, Length, Optional, NumberRange, Email, EqualTo
 from flask_wtf.file import FileField, FileAllowed, FileRequired
+from .helpers.helper_uploads import MagicBytes, ATTACHMENT_TYPES
 
 # == Formularios para Usuarios ==
 
@@ -10,7 +11,7 @@ class UserForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email(message="Introduce un email valido"),Length(max=120)])
     password = PasswordField('Password', validators=[DataRequired(), Length(min=8, max=30)])
     confirm_password = PasswordField("Repite la contraseña", validators=[DataRequired(), EqualTo("password", message="Las contraseñas no coinciden")]) 
-    avatar = FileField('Avatar', validators=[DataRequired(), FileAllowed(['png', 'jpg', 'jpeg'], 'Solo imagenes permitidas')])
+    avatar = FileField('Avatar', validators=[DataRequired(), FileAllowed(['png', 'jpg', 'jpeg'], 'Solo imagenes permitidas'), MagicBytes()])
     role_id = SelectField('Rol', coerce=int)
     submit = SubmitField('CREAR')
 
@@ -22,7 +23,7 @@ class UserDeleteForm(FlaskForm):
 class UpdateUserForm(FlaskForm):
     name = StringField('Nombre', validators=[DataRequired(), Length(min=3, max=80)])
     email = StringField('Email', validators=[DataRequired(), Email(), Length(max=120)])
-    avatar = FileField('Avatar', validators=[FileAllowed(['png', 'jpg', 'jpeg'])])
+    avatar = FileField('Avatar', validators=[FileAllowed(['png', 'jpg', 'jpeg']), MagicBytes()])
     role_id = SelectField('Rol', coerce=int)
     submit = SubmitField('ACTUALIZAR')
 
@@ -53,7 +54,7 @@ class LoginForm(FlaskForm):
 class ProductForm(FlaskForm):
     title = StringField('Título', validators=[DataRequired(), Length(min=2, max=120)])
     description = TextAreaField('Descripción', validators=[DataRequired(), Length(min=5, max=500)])
-    photo = FileField('Foto', validators=[Optional(), FileAllowed(['png', 'jpg', 'jpeg'])])
+    photo = FileField('Foto', validators=[Optional(), FileAllowed(['png', 'jpg', 'jpeg']), MagicBytes()])
     price = IntegerField('Precio', validators=[DataRequired(), NumberRange(min=1)])
     category = SelectField('Categoria', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Guardar')
@@ -62,7 +63,8 @@ class ProductForm(FlaskForm):
 class ProductCreateForm(ProductForm):
     photo = FileField('Foto', validators=[
         FileRequired(),
-        FileAllowed(['png', 'jpg', 'jpeg'])
+        FileAllowed(['png', 'jpg', 'jpeg']),
+        MagicBytes()
     ])
 
 
@@ -81,14 +83,14 @@ class ContactForm(FlaskForm):
         label='Mensaje',
         validators=[DataRequired(), Length(min=10, max=1000)]
     )
-    attachments = MultipleFileField(label='Adjuntar archivos')  # новые файлы :)
+    attachments = MultipleFileField(label='Adjuntar archivos', validators=[MagicBytes(ATTACHMENT_TYPES)])  # новые файлы :)
     submit = SubmitField(label='Enviar')
 
 # == Formulario para update de perfil ==
 
 class ProfileUpdateForm(FlaskForm):
     name = StringField('Nombre', validators=[DataRequired(), Length(min=3, max=80)])
-    avatar = FileField('Avatar', validators=[FileAllowed(['png', 'jpg', 'jpeg'])])
+    avatar = FileField('Avatar', validators=[FileAllowed(['png', 'jpg', 'jpeg']), MagicBytes()])
     email = StringField('Email', validators=[DataRequired(), Email(message="Introduce un email valido"),Length(max=120)])
     submit = SubmitField('Guardar cambios')
 
@@ -2,8 +2,166 @@ import smtplib, ssl
 from email.message import EmailMessage
 from email.utils import formataddr
 from datetime import datetime
+from queue import LifoQueue, Empty, Full
+import logging
 import mimetypes
 import os
+import socket
+import time
+from werkzeug.utils import secure_filename
+
+# Hijo del logger de la app ("wannapop"): sale por sus mismos handlers
+logger = logging.getLogger(__name__)
+
+
+class SMTPTransport:
+    """
+    Pool pequeño de conexiones SMTP ya autenticadas (EHLO + STARTTLS + AUTH una vez por conexion).
+    Una conexion que lleva un rato parada se comprueba con NOOP antes de usarla; si el servidor
+    la ha cerrado se abre otra. Cada conexion la usa un solo hilo a la vez.
+    """
+
+    def __init__(self, host, port, username=None, password=None, starttls=True, timeout=30,
+                 pool_size=2, max_idle=30, max_age=300):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_age = max_age
+        # Un contexto TLS para todas las conexiones (cargar los certificados cuesta)
+        self.ssl_context = ssl.create_default_context() if starttls else None
+        self._pool = LifoQueue(maxsize=pool_size)
+        self._pid = os.getpid()
+        # smtplib llama a getfqdn() (DNS) en cada conexion nueva si no se le da el nombre
+        self._local_hostname = None
+        self.opened = 0
+        self.reused = 0
+        self.refused = 0
+
+    def _connect(self):
+        if self._local_hostname is None:
+            self._local_hostname = socket.getfqdn()
+        server = smtplib.SMTP(self.host, self.port, local_hostname=self._local_hostname, timeout=self.timeout)
+        try:
+            if self.ssl_context is not None:
+                server.starttls(context=self.ssl_context)
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.opened += 1
+        now = time.monotonic()
+        return [server, now, now]  # conexion, abierta, ultimo uso
+
+    @staticmethod
+    def _close(entry):
+        try:
+            entry[0].quit()
+        except Exception:
+            entry[0].close()
+
+    def _acquire(self):
+        """(entrada, reutilizada) del pool si sigue viva; si no, una conexion nueva."""
+        if self._pid != os.getpid():
+            # Tras un fork los sockets heredados son del padre
+            self._pool = LifoQueue(maxsize=self._pool.maxsize)
+            self._pid = os.getpid()
+
+        while True:
+            try:
+                entry = self._pool.get_nowait()
+            except Empty:
+                return self._connect(), False
+            now = time.monotonic()
+            if now - entry[1] > self.max_age:
+                self._close(entry)
+                continue
+            if now - entry[2] > self.max_idle:
+                try:
+                    if entry[0].noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP")
+                except (smtplib.SMTPException, OSError):
+                    entry[0].close()
+                    continue
+            self.reused += 1
+            return entry, True
+
+    def _release(self, entry):
+        entry[2] = time.monotonic()
+        try:
+            self._pool.put_nowait(entry)
+        except Full:
+            self._close(entry)
+
+    def send_many(self, messages):
+        """
+        messages: [(remitente, destinatarios, bytes)]. Todos por la misma conexion.
+        Devuelve una lista paralela con None (enviado) o la excepcion de ese mensaje.
+        """
+        try:
+            entry, proven = self._acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            return [e] * len(messages)
+
+        results = []
+        pending = list(messages)
+        try:
+            while pending:
+                sender, recipients, raw = pending[0]
+                try:
+                    refused = entry[0].sendmail(sender, recipients, raw)
+                    if refused:
+                        # Aceptado para el resto: no se reintenta, pero que quede constancia
+                        self.refused += len(refused)
+                        logger.warning("Correo de %s: destinatarios rechazados %s", sender, {
+                            address: f"{code} {reply.decode('utf-8', 'replace')}"
+                            for address, (code, reply) in refused.items()
+                        })
+                    results.append(None)
+                    proven = True
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                    # Rechazo de este mensaje (4xx / 5xx): la conexion sigue valiendo.
+                    # Antes que OSError: las excepciones de smtplib heredan de el
+                    results.append(e)
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    entry[0].close()
+                    entry = None
+                    if not proven:
+                        # Conexion recien abierta que ya falla: no vale la pena insistir
+                        return results + [e] * len(pending)
+                    # Conexion que funcionaba y el servidor ha cerrado: otra y se repite este mensaje
+                    try:
+                        entry, proven = self._connect(), False
+                    except (smtplib.SMTPException, OSError) as e:
+                        return results + [e] * len(pending)
+                    continue
+                pending.pop(0)
+        except BaseException:
+            if entry is not None:
+                entry[0].close()
+            raise
+
+        self._release(entry)
+        return results
+
+    def send(self, sender, recipients, raw):
+        error = self.send_many([(sender, recipients, raw)])[0]
+        if error is not None:
+            raise error
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._pool.get_nowait())
+            except Empty:
+                return
+
+    def stats(self):
+        return {"pooled": self._pool.qsize(), "opened": self.opened, "reused": self.reused, "refused": self.refused}
+
 
 class MailManager:
     def init_app(self, app):
@@ -18,107 +176,126 @@ class MailManager:
 
         self.upload_folder = app.config.get("UPLOAD_FOLDER", "./uploads")
 
-    def send_contact_msg(self, user, message_text, attachments=None, include_avatar=True):
-        """
-        user: objeto User
-        message_text: texto de mensaje
-        attachments: lista de rutas a ficheros adjuntos
-        include_avatar: bool, si anyadimos el avatar
-        """
+        # Plantillas de templates/emails con el entorno de la app (autoescape en .html)
+        self.jinja_env = app.jinja_env
+
+        # Todo el envio SMTP pasa por aqui (lo usa el outbox, ver helper_outbox)
+        self.transport = SMTPTransport(
+            self.sender_server,
+            self.sender_port,
+            username=self.sender_addr,
+            password=self.sender_pass,
+            starttls=app.config.get("MAIL_SMTP_STARTTLS", True),
+            timeout=app.config.get("MAIL_SMTP_TIMEOUT", 30),
+            pool_size=app.config.get("MAIL_SMTP_POOL_SIZE", 2),
+            max_idle=app.config.get("MAIL_SMTP_MAX_IDLE", 30),
+            max_age=app.config.get("MAIL_SMTP_MAX_AGE", 300),
+        )
 
-        objeto = f"Nuevo mensaje de {user.name}"
+    def deliver(self, sender, recipients, raw):
+        """Envio de un mensaje ya serializado por una conexion del pool."""
+        self.transport.send(sender, recipients, raw)
 
-        # Fallback de texto plano
-        contenido = f"""
-Usuario: {user.name}
-Email: {user.email}
-Enviado el: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+    def deliver_many(self, messages):
+        """Varios mensajes [(remitente, destinatarios, bytes)] por una sola conexion. None o excepcion por mensaje."""
+        return self.transport.send_many(messages)
 
-Mensaje:
-{message_text}
-"""
+    # == Plantillas ==
 
-        # Crear EmailMessage
+    def _templates(self, template):
+        """(texto, html) ya compilados de emails/<template>.txt / .html; el entorno de Jinja los cachea."""
+        return (
+            self.jinja_env.get_template(f"emails/{template}.txt"),
+            self.jinja_env.get_template(f"emails/{template}.html"),
+        )
+
+    def _build(self, compiled, to, subject, context):
+        text_template, html_template = compiled
         msg = EmailMessage()
         msg['From'] = formataddr(("Soporte Wannapop", self.sender_addr))
-        msg['To'] = formataddr(("Administrador", self.contact_addr))
-        msg['Subject'] = objeto
-        msg.set_content(contenido)
+        msg['To'] = formataddr(to)
+        msg['Subject'] = subject
+        msg.set_content(text_template.render(context))
+        # El .html se renderiza con autoescape: lo que venga del usuario sale escapado
+        msg.add_alternative(html_template.render(context), subtype='html')
+        return msg
 
-        # Inicializar variables para avatar inline
-        avatar_cid = None
-        avatar_path = None
+    def message(self, to, subject, template, **context):
+        """
+        EmailMessage (texto + HTML) a partir de las plantillas emails/<template>.txt y .html.
+        to: (nombre, direccion)
+        """
+        return self._build(self._templates(template), to, subject, context)
+
+    def render_many(self, template, subject, recipients, **shared):
+        """
+        Un EmailMessage por destinatario con la misma plantilla (se busca una sola vez).
+        recipients: [((nombre, direccion), contexto)]; shared se añade al contexto de todos.
+        Para enviarlos, mail_outbox.enqueue de cada uno y commit: el outbox los manda por lotes
+        por la misma conexion SMTP.
+        """
+        compiled = self._templates(template)
+        return [
+            self._build(compiled, to, subject, {**shared, **context})
+            for to, context in recipients
+        ]
+
+    def send_contact_msg(self, user, message_text, attachments=None, include_avatar=True):
+        """
+        Encola el mensaje de contacto (se envia al hacer commit, ver helper_outbox).
+        user: objeto User
+        message_text: texto de mensaje
+        attachments: lista de FileStorage (subidas del formulario, en su temporal)
+        include_avatar: bool, si anyadimos el avatar
+        """
 
         # Avatar inline
+        avatar_cid = None
+        avatar_path = None
         if include_avatar and hasattr(user, 'avatar') and user.avatar:
             avatar_path = os.path.join(self.upload_folder, user.avatar)
             if os.path.isfile(avatar_path):
                 avatar_cid = 'useravatar'
 
-        # version HTML
-        html_content = f"""
-<html>
-<body style="font-family: Arial, sans-serif; color: #333; margin:0; padding:0;">
-<div style="max-width:600px; margin:0 auto; border:1px solid #ddd; border-radius:8px; overflow:hidden; box-shadow:0 0 10px rgba(0,0,0,0.1);">
-    
-    <!-- Header con avatar y nombre -->
-    <div style="background:#4CAF50; color:#fff; padding:20px; display:flex; align-items:center;">
-        {'<img src="cid:useravatar" alt="Avatar" style="width:60px; height:60px; border-radius:50%; margin-right:15px;">' if avatar_cid else ''}
-        <div>
-            <h2 style="margin:0; font-size:20px;">{user.name}</h2>
-            <p style="margin:0; font-size:14px;">{user.email}</p>
-        </div>
-    </div>
-
-    <!-- Cuerpo del mensaje -->
-    <div style="padding:20px; background:#fff;">
-        <p><strong>Enviado el:</strong> {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
-        <p><strong>Mensaje:</strong></p>
-        <div style="padding:15px; background:#f9f9f9; border-left:4px solid #4CAF50; border-radius:4px; white-space:pre-wrap;">
-            {message_text.replace('<','&lt;').replace('>','&gt;')}
-        </div>
-    </div>
-
-    <!-- Footer -->
-    <div style="padding:10px 20px; background:#f0f0f0; font-size:12px; color:#777; text-align:center;">
-        Este mensaje fue enviado desde el formulario de contacto.
-    </div>
-</div>
-</body>
-</html>
-"""
-
-        msg.add_alternative(html_content, subtype='html')
+        msg = self.message(
+            ("Administrador", self.contact_addr),
+            f"Nuevo mensaje de {user.name}",
+            "contact",
+            name=user.name,
+            email=user.email,
+            sent_at=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            message=message_text,
+            avatar_cid=avatar_cid,
+        )
 
         # Añadir avatar como related
         if avatar_cid:
+            ctype = mimetypes.guess_type(avatar_path)[0] or 'image/png'
             with open(avatar_path, 'rb') as img:
                 msg.get_payload()[1].add_related(
                     img.read(),
                     maintype='image',
-                    subtype=os.path.splitext(user.avatar)[1][1:] or 'png',
+                    subtype=ctype.split('/', 1)[1],
                     cid=f'<{avatar_cid}>'
                 )
 
         # Archivos adjuntos
         if attachments:
-            for file_path in attachments:
-                if os.path.isfile(file_path):
-                    ctype, encoding = mimetypes.guess_type(file_path)
-                    if ctype is None or encoding is not None:
-                        ctype = 'application/octet-stream'
-                    maintype, subtype = ctype.split('/', 1)
-                    with open(file_path, 'rb') as f:
-                        msg.add_attachment(
-                            f.read(),
-                            maintype=maintype,
-                            subtype=subtype,
-                            filename=os.path.basename(file_path)
-                        )
-
-        # Enviar mail
-        contexto = ssl.create_default_context()
-        with smtplib.SMTP(self.sender_server, self.sender_port) as server:
-            server.starttls(context=contexto)
-            server.login(self.sender_addr, self.sender_pass)
-            server.send_message(msg, from_addr=self.sender_addr, to_addrs=self.contact_addr)
+            for file in attachments:
+                filename = secure_filename(file.filename) or "adjunto"
+                ctype, encoding = mimetypes.guess_type(filename)
+                if ctype is None or encoding is not None:
+                    ctype = 'application/octet-stream'
+                maintype, subtype = ctype.split('/', 1)
+                # Una sola lectura, ya acotada por UPLOAD_MAX_FILE_SIZE
+                file.stream.seek(0)
+                msg.add_attachment(
+                    file.stream.read(),
+                    maintype=maintype,
+                    subtype=subtype,
+                    filename=filename
+                )
+
+        # Encolar: lo envia el hilo del outbox
+        from . import mail_outbox
+        mail_outbox.enqueue(msg)
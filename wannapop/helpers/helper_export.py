@@ -0,0 +1,180 @@
+# wannapop/helpers/helper_export.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from sqlalchemy import select, literal, null
+
+EXPORT_HEADER = ["id", "title", "description", "price"]
+CHUNK_SIZE = 1000
+
+
+def date_arg(args, name):
+    """?date_from= / ?date_to= en formato YYYY-MM-DD. Vacio o mal escrito -> None."""
+    try:
+        return datetime.strptime(args.get(name, ""), "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def export_filters(args):
+    """Filtros comunes de las exportaciones a partir de request.args."""
+    return {
+        "category": args.get("category") or None,
+        "date_from": date_arg(args, "date_from"),
+        "date_to": date_arg(args, "date_to"),
+    }
+
+
+def export_query(category=None, date_from=None, date_to=None):
+    """SELECT (Core, sin objetos ORM) de las filas a exportar, por id."""
+    from ..models import Product, Category
+
+    query = select(Product.id, Product.title, Product.description, Product.price).order_by(Product.id)
+
+    if category:
+        query = query.join(Category, Product.category_id == Category.id).where(Category.name == category)
+    if date_from:
+        query = query.where(Product.created >= date_from)
+    if date_to:
+        # date_to incluido: hasta el final de ese dia
+        query = query.where(Product.created < date_to + timedelta(days=1))
+
+    return query
+
+
+# == Exportacion delta ==
+
+DELTA_HEADER = ["event", "id", "title", "description", "price", "category", "status", "changed_at"]
+# Maximo ?lag= de /exportar/delta (segundos)
+DELTA_MAX_LAG = 3600
+
+
+def delta_queries(since):
+    """
+    Lo que ha cambiado desde since (incluido):
+    - upsert: productos creados o modificados (products.updated, indice ix_products_updated)
+    - deleted / blocked / unblocked: del registro product_changes
+    """
+    from ..models import Product, Category, ProductChange
+
+    upserts = (
+        select(
+            literal("upsert").label("event"),
+            Product.id,
+            Product.title,
+            Product.description,
+            Product.price,
+            Category.name,
+            Product.status,
+            Product.updated,
+        )
+        .join(Category, Product.category_id == Category.id)
+        .where(Product.updated >= since)
+        .order_by(Product.updated, Product.id)
+    )
+    events = (
+        select(
+            ProductChange.event,
+            ProductChange.product_id,
+            null(), null(), null(), null(), null(),
+            ProductChange.created,
+        )
+        .where(ProductChange.created >= since)
+        .order_by(ProductChange.created, ProductChange.id)
+    )
+    return upserts, events
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+def ndjson_chunks(row_chunks, fields, trailer=None):
+    """Una linea JSON por fila (bytes UTF-8) por bloque. trailer: objeto final opcional (p.ej. la marca)."""
+    for chunk in row_chunks:
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), default=_json_default, ensure_ascii=False) + "\n"
+            for row in chunk
+        ).encode("utf-8")
+    if trailer is not None:
+        yield (json.dumps(trailer, default=_json_default) + "\n").encode("utf-8")
+
+
+def iter_rows(engine, query, chunk_size=CHUNK_SIZE):
+    """
+    Filas de la query en bloques de chunk_size con cursor de servidor (stream_results).
+    Conexion propia: el generador sigue vivo cuando la vista ya ha devuelto la respuesta.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for chunk in result.partitions():
+            yield chunk
+
+
+def iter_rows_by_id(engine, query, id_column, chunk_size=CHUNK_SIZE):
+    """
+    Igual que iter_rows pero cada bloque es una consulta nueva (id > ultimo LIMIT n).
+    No deja una lectura abierta entre bloques, asi quien la usa puede ir haciendo commits
+    (p.ej. el progreso de un trabajo) sin bloquearse con SQLite.
+    """
+    last_id = None
+    while True:
+        batch = query if last_id is None else query.where(id_column > last_id)
+        with engine.connect() as connection:
+            chunk = connection.execute(batch.limit(chunk_size)).all()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def csv_chunks(row_chunks, header=EXPORT_HEADER):
+    """Un trozo de CSV (bytes UTF-8) por bloque de filas. El modulo csv se encarga de comas y saltos de linea."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    for chunk in row_chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """Comprime en streaming (formato gzip) sin juntar todo el fichero."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_xlsx(row_chunks, fileobj, header=("ID", "Título", "Descripción", "Precio"), title="Productos"):
+    """
+    Excel en modo write-only: cada fila va directa al XML del zip (en disco), no se
+    guarda un arbol de celdas en memoria. fileobj deberia ser un fichero temporal.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(list(header))
+
+    for chunk in row_chunks:
+        for row in chunk:
+            # Caracteres de control que Excel no admite (p.ej. copiados de otra web)
+            sheet.append([ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value for value in row])
+
+    workbook.save(fileobj)
@@ -0,0 +1,138 @@
+# wannapop/helpers/helper_facets.py
+import threading
+import time
+from sqlalchemy import func
+from .helper_search import search_terms
+from .helper_fragments import MemoryBackend
+
+
+def normalize_search(search_query):
+    """'  Mesa   MADERA ' -> 'mesa madera'. Misma busqueda escrita distinto = misma entrada de cache."""
+    return " ".join(term.lower() for term in search_terms(search_query))
+
+
+class FacetCounts:
+    """
+    Numero de productos disponibles por categoria para una busqueda, en un solo GROUP BY.
+    Cache por (busqueda normalizada) dentro de una version del catalogo: crear, borrar,
+    bloquear o vender un producto sube la version (catalog_state) y la cache se vacia.
+    """
+
+    def __init__(self):
+        self.cache = MemoryBackend(256)
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache = MemoryBackend(app.config.get("FACET_CACHE_MAX_ENTRIES", 256))
+
+    def counts(self, search_query="", version=None):
+        """{category_id: n} solo con las categorias que tienen algo. version: la de catalog_state() si ya se tiene."""
+        if version is None:
+            from ..models import catalog_state
+            version, _ = catalog_state()
+
+        with self._lock:
+            if version != self._version:
+                self.cache.clear()
+                self._version = version
+
+        search = normalize_search(search_query)
+        counts = self.cache.get(search)
+        if counts is not None:
+            self.hits += 1
+            return counts
+
+        self.misses += 1
+        counts = self._query(search)
+        self.cache.set(search, counts)
+        return counts
+
+    @staticmethod
+    def _query(search):
+        from .. import db, search_index
+        from ..models import Product, ProductStatus
+
+        query = (
+            db.session.query(Product.category_id, func.count(Product.id))
+            .filter(Product.status == ProductStatus.available.value)
+        )
+        if search:
+            # El backend ordena por relevancia: en un GROUP BY no pinta nada
+            query = search_index.apply(query, Product, search).order_by(None)
+
+        return dict(query.group_by(Product.category_id).all())
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
+
+
+class ListingTotals:
+    """
+    Total del listado (lo que ve el usuario con esos filtros) sin un COUNT(*) por peticion.
+    PRODUCTS_TOTAL_MODE:
+      "exact": COUNT exacto cacheado dentro de una version del catalogo; la misma combinacion de
+               filtros solo se cuenta una vez hasta que algo cambia (crear, borrar, bloquear, vender...).
+      "approximate": el ultimo COUNT de cada combinacion se reutiliza approx_ttl segundos aunque el
+               catalogo cambie (con muchas escrituras no se recuenta tras cada una); se muestra "~N".
+      "none": sin total (ni COUNT).
+    """
+
+    MODES = ("exact", "approximate", "none")
+
+    def __init__(self):
+        self.mode = "exact"
+        self.approx_ttl = 300
+        self.cache = MemoryBackend(1024)
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.mode = app.config.get("PRODUCTS_TOTAL_MODE", "exact")
+        if self.mode not in self.MODES:
+            raise ValueError(f"PRODUCTS_TOTAL_MODE no valido: {self.mode!r} (exact, approximate o none)")
+        self.approx_ttl = app.config.get("PRODUCTS_TOTAL_APPROX_TTL", 300)
+        self.cache = MemoryBackend(app.config.get("LISTING_TOTALS_MAX_ENTRIES", 1024))
+
+    @property
+    def approximate(self):
+        return self.mode == "approximate"
+
+    def total(self, query, key, version):
+        """query: la del listado (sin paginar); key: tupla con todo lo que la define. None en modo "none"."""
+        if self.mode == "none":
+            return None
+
+        now = time.monotonic()
+        if not self.approximate:
+            with self._lock:
+                if version != self._version:
+                    self.cache.clear()
+                    self._version = version
+
+        cached = self.cache.get(key)
+        if cached is not None and (not self.approximate or cached[1] >= now):
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        total = query.order_by(None).count()
+        self.cache.set(key, (total, now + self.approx_ttl))
+        return total
+
+    def stats(self):
+        return {
+            "mode": self.mode, "entries": len(self.cache), "version": self._version,
+            "hits": self.hits, "misses": self.misses,
+        }
@@ -1,28 +1,84 @@
+import hashlib
 import os
-import uuid
+import tempfile
 from werkzeug.utils import secure_filename
 from flask import current_app
+from PIL import UnidentifiedImageError
+from .helper_images import PRODUCT_VARIANTS, THUMBS_DIR, process_upload, strip_metadata, thumbnails_ready
+from .. import image_workers
 
-def save_image(file, upload_folder=None):
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest, ext):
+    """sha256 -> 'ab/cd/abcd...ef.jpg': dos niveles de carpetas para no tener millones de ficheros en una."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def save_image(file, upload_folder=None, variants=PRODUCT_VARIANTS):
     """
-    Guarda archivo en /static/uploads y devuelve solo filename
+    Guarda archivo en UPLOAD_FOLDER (static/uploads) y devuelve su nombre relativo (va a Product.photo / User.avatar).
+    El nombre es el SHA-256 de lo subido: el mismo fichero subido dos veces se guarda una vez.
+    El EXIF (GPS, camara...) se quita aqui, antes de que el fichero este en su ruta publica;
+    las miniaturas WebP (variants, ver helper_images) se hacen en segundo plano.
+    Los ficheros que ya no usa nadie los borra `flask uploads-gc`.
     """
     if not file:
         return None
 
-    # Carpeta destino (defecto = static/uploads)
+    # Carpeta destino (defecto = UPLOAD_FOLDER, la misma que miran las miniaturas y uploads-gc)
     if not upload_folder:
-        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
 
-    # Extensión y nombre único
-    ext = os.path.splitext(file.filename)[1]
-    filename = secure_filename(f"{uuid.uuid4().hex}{ext}")
+    # Extension (normalizada) del nombre original
+    ext = secure_filename(os.path.splitext(file.filename)[1].lower())
+    ext = f".{ext.lstrip('.')}" if ext else ""
 
-    # Crear carpeta si no existe
-    os.makedirs(upload_folder, exist_ok=True)
+    # Se copia a un temporal calculando el hash por el camino
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as output:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                output.write(chunk)
+
+        filename = blob_name(digest.hexdigest(), ext)
+        file_path = os.path.join(upload_folder, filename)
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+            # Fecha nueva: flask uploads-gc no borra ficheros recientes (la fila aun no tiene commit)
+            os.utime(file_path)
+        else:
+            try:
+                strip_metadata(tmp_path)
+            except (UnidentifiedImageError, OSError) as e:
+                current_app.logger.warning(f"No se ha podido quitar el EXIF de {filename}: {e}")
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    # Ruta final
-    file_path = os.path.join(upload_folder, filename)
-    file.save(file_path)
+    # Repetido: solo hace falta si le faltan variantes (p.ej. era un avatar y ahora es foto de producto)
+    if not all(thumbnails_ready(filename, variant, cached=False) for variant in variants):
+        # Cola llena: en la propia peticion, mejor lenta que sin miniaturas
+        if not image_workers.submit(file_path, upload_folder, variants):
+            process_upload(file_path, upload_folder, variants)
+            image_workers.forget(filename)
 
     return filename
+
+
+def iter_uploads(upload_folder):
+    """(nombre relativo con '/', ruta) de los originales de la carpeta de subidas, sin miniaturas ni temporales."""
+    for root, dirs, files in os.walk(upload_folder):
+        if root == upload_folder and THUMBS_DIR in dirs:
+            dirs.remove(THUMBS_DIR)
+        for name in files:
+            if name.endswith((".part", ".tmp")):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, upload_folder).replace(os.sep, "/"), path
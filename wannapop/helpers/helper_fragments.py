@@ -0,0 +1,165 @@
+# wannapop/helpers/helper_fragments.py
+import threading
+import zlib
+from collections import OrderedDict
+from flask import current_app
+from flask_login import current_user
+from markupsafe import Markup
+from ..hashid_utils import encode_id
+from .helper_images import image_attrs, thumbnails_ready
+
+
+class MemoryBackend:
+    """LRU en memoria del proceso, acotada por numero de entradas."""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Cualquier servidor con protocolo Redis (redis, valkey, keydb...) en local.
+    La expulsion LRU la hace el servidor (maxmemory-policy allkeys-lru), aqui solo TTL.
+    """
+
+    prefix = "wannapop:frag:"
+
+    def __init__(self, url, ttl=3600):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("FRAGMENT_CACHE_BACKEND=redis necesita el paquete 'redis'")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value.encode("utf-8"), ex=self.ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class FragmentCache:
+    """
+    Cache de HTML ya renderizado de las tarjetas de producto.
+    Clave: (variante, tipo de usuario, id, updated, estado, categoria, miniaturas) -> cualquier cambio
+    del producto (updated/status) genera otra clave y la vieja acaba expulsada por LRU.
+    """
+
+    template = "components/product_card.html"
+
+    def __init__(self):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        self._template_version = None
+
+    def init_app(self, app):
+        backend = app.config.get("FRAGMENT_CACHE_BACKEND", "memory")
+        if backend == "memory":
+            self.backend = MemoryBackend(app.config.get("FRAGMENT_CACHE_MAX_ENTRIES", 5000))
+        elif backend == "redis":
+            self.backend = RedisBackend(app.config["FRAGMENT_CACHE_URL"], app.config.get("FRAGMENT_CACHE_TTL", 3600))
+        else:
+            self.backend = NullBackend()
+
+    @staticmethod
+    def viewer_class():
+        role_name = getattr(current_user, "role_name", None)
+        return "staff" if role_name in ("moderator", "admin") else "wanner"
+
+    def template_version(self):
+        """Checksum de la plantilla: un despliegue con otra plantilla no reutiliza HTML viejo (p.ej. en Redis)."""
+        if self._template_version is None:
+            source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, self.template)
+            self._template_version = format(zlib.crc32(source.encode("utf-8")), "x")
+        return self._template_version
+
+    def product_card(self, product, variant, owner=False):
+        """Global de Jinja: {{ product_card(product, 'listing') }}"""
+        key = ":".join(str(part) for part in (
+            self.template_version(),
+            variant,
+            self.viewer_class(),
+            int(owner),
+            product.id,
+            product.updated.timestamp(),
+            product.status,
+            product.category_name,
+            # Sin esto la tarjeta con la foto original se quedaria en cache al llegar las miniaturas
+            int(thumbnails_ready(product.photo, "card")),
+        ))
+
+        html = self.backend.get(key)
+        if html is not None:
+            self.hits += 1
+            return Markup(html)
+
+        self.misses += 1
+        html = current_app.jinja_env.get_template(self.template).render(
+            product=product,
+            variant=variant,
+            owner=owner,
+            encode_id=encode_id,
+            image_attrs=image_attrs,
+        )
+        self.backend.set(key, html)
+        return Markup(html)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
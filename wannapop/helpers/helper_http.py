@@ -0,0 +1,52 @@
+# wannapop/helpers/helper_http.py
+import hashlib
+from datetime import timezone
+from flask import request, session, make_response
+from flask_login import current_user
+
+
+def make_etag(*parts):
+    """
+    ETag fuerte a partir de los datos de los que depende la pagina + quien la ve
+    + la version del despliegue (plantillas y static: tras desplegar no vale un 304 con el HTML viejo).
+    """
+    from .. import static_assets
+
+    viewer = (getattr(current_user, "id", None), getattr(current_user, "role_name", None))
+    raw = "|".join(str(part) for part in (static_assets.version, *viewer, *parts))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    """True si el navegador ya tiene esta version (If-None-Match / If-Modified-Since)."""
+    # Mensajes flash pendientes -> hay que pintar la pagina para mostrarlos
+    if session.get("_flashes"):
+        return False
+
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    if last_modified and request.if_modified_since:
+        return _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+
+    return False
+
+
+def not_modified(etag, last_modified=None):
+    return with_validators(make_response("", 304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """Anyade ETag / Last-Modified. Paginas por usuario: private + revalidar siempre."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+def _as_utc(value):
+    # En BD se guarda utcnow() sin zona
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
@@ -0,0 +1,118 @@
+# wannapop/helpers/helper_identity.py
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import exists, select
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from .helper_refcache import FileChannel, LocalChannel
+
+# Nombre de la marca en el canal: cualquier cambio de usuario invalida las caches del resto de workers
+CHANNEL_NAME = "identities"
+
+
+def query_identity(user_id):
+    """Usuario + rol + si esta bloqueado en una sola consulta. (User, bloqueado) o None."""
+    from .. import db
+    from ..models import User, blocked_users
+
+    blocked = exists().where(blocked_users.user_id == User.id)
+    return db.session.execute(
+        select(User, blocked)
+        .options(joinedload(User.role))
+        .where(User.id == user_id)
+    ).first()
+
+
+class IdentityCache:
+    """
+    Cache corta (IDENTITY_CACHE_TTL segundos) del usuario de la sesion, por worker.
+    Guarda los valores de las columnas, no el objeto ORM: en cada peticion se crea un User
+    nuevo y se añade a la sesion sin consultar (se puede modificar y hacer commit como siempre).
+    Se invalida al hacer commit de cambios en el usuario o en sus bloqueos (ver models.py);
+    con REFCACHE_CHANNEL_DIR el aviso llega tambien al resto de workers (sin el, por defecto
+    va apagada). IDENTITY_CACHE_TTL = 0 -> sin cache, una consulta por peticion.
+    """
+
+    Entry = namedtuple("Entry", "values blocked expires version")
+
+    def __init__(self):
+        self.ttl = 30
+        self.max_entries = 10000
+        self.channel = LocalChannel()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        channel_dir = app.config.get("REFCACHE_CHANNEL_DIR")
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", 30 if channel_dir else 0)
+        self.max_entries = app.config.get("IDENTITY_CACHE_MAX_ENTRIES", 10000)
+        self.channel = FileChannel(channel_dir) if channel_dir else LocalChannel()
+        if self.ttl and not channel_dir:
+            app.logger.warning(
+                "IDENTITY_CACHE_TTL sin REFCACHE_CHANNEL_DIR: con varios workers, bloqueos y cambios de rol "
+                f"pueden tardar hasta {self.ttl}s en aplicarse en el resto"
+            )
+
+    def load(self, user_id):
+        """Para el user_loader de Flask-Login."""
+        if not self.ttl:
+            return self._query(user_id)
+
+        version = self.channel.version(CHANNEL_NAME)
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.expires >= time.monotonic() and entry.version == version:
+            with self._lock:
+                self.hits += 1
+            return self._attach(entry.values, entry.blocked)
+
+        user = self._query(user_id)
+        with self._lock:
+            self.misses += 1
+            if user is None:
+                self._entries.pop(user_id, None)
+                return None
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = self.Entry(
+                {attr.key: getattr(user, attr.key) for attr in user.__mapper__.column_attrs},
+                user._blocked,
+                time.monotonic() + self.ttl,
+                version,
+            )
+        return user
+
+    @staticmethod
+    def _query(user_id):
+        row = query_identity(user_id)
+        if row is None:
+            return None
+        user, blocked = row
+        user._blocked = bool(blocked)
+        return user
+
+    @staticmethod
+    def _attach(values, blocked):
+        """User persistente en la sesion actual a partir de los valores guardados, sin SELECT."""
+        from .. import db
+        from ..models import User
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        # Si la peticion ya lo tenia cargado, merge devuelve ese
+        user = db.session.merge(user, load=False)
+        user._blocked = blocked
+        return user
+
+    def invalidate(self, user_ids, publish=True):
+        """Borra esos usuarios de la cache local y, si publish, avisa al resto de workers."""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if publish:
+            self.channel.publish(CHANNEL_NAME)
+
+    def stats(self):
+        with self._lock:
+            return {"ttl": self.ttl, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
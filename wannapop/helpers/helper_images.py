@@ -0,0 +1,256 @@
+# wannapop/helpers/helper_images.py
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from flask import current_app
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+THUMBS_DIR = "thumbs"
+
+# Variantes: anchos que se generan (1x y 2x) y el sizes del <img>
+IMAGE_VARIANTS = {
+    "card": {"widths": (300, 600), "sizes": "(max-width: 576px) 100vw, 300px"},
+    "detail": {"widths": (800, 1600), "sizes": "(max-width: 992px) 100vw, 50vw"},
+    "avatar": {"widths": (200, 400), "sizes": "200px"},
+}
+PRODUCT_VARIANTS = ("card", "detail")
+AVATAR_VARIANTS = ("avatar",)
+
+WEBP_QUALITY = 80
+
+# Segundos que se recuerda que un original aun no tiene miniaturas
+NOT_READY_TTL = 5
+
+
+def thumb_name(filename, variant, width):
+    """'ab/cd/abcd.jpg' -> 'thumbs/ab/cd/abcd-card-300.webp' (relativo a la carpeta de uploads)."""
+    stem = os.path.splitext(filename)[0]
+    return f"{THUMBS_DIR}/{stem}-{variant}-{width}.webp"
+
+
+def upload_name(path, upload_folder):
+    """Ruta absoluta -> nombre como en la BD ('ab/cd/abcd.jpg', siempre con '/')."""
+    return os.path.relpath(path, upload_folder).replace(os.sep, "/")
+
+
+def strip_metadata(path):
+    """Reescribe el original sin EXIF (GPS, modelo de camara...). Mismo formato."""
+    with Image.open(path) as original:
+        image_format = original.format
+        # Sin EXIF no se toca: cada re-codificacion de un JPEG pierde calidad
+        if getattr(original, "is_animated", False) or not original.getexif():
+            return
+        # Aplica la orientacion EXIF antes de tirar los metadatos (si no, fotos de movil giradas)
+        image = ImageOps.exif_transpose(original)
+        image.info.pop("exif", None)
+        # .tmp por proceso: la misma subida repetida se puede estar procesando dos veces a la vez
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        save_options = {"quality": 90} if image_format == "JPEG" else {}
+        image.save(tmp_path, format=image_format, **save_options)
+    os.replace(tmp_path, path)
+
+
+def make_thumbnails(path, upload_folder, variants, force=False):
+    """
+    Genera las variantes WebP de un original. Solo las que falten (o todas con force).
+    Devuelve cuantas ha escrito.
+    """
+    filename = os.path.relpath(path, upload_folder)
+    pending = [
+        (variant, width)
+        for variant in variants
+        for width in IMAGE_VARIANTS[variant]["widths"]
+        if force or not os.path.exists(os.path.join(upload_folder, thumb_name(filename, variant, width)))
+    ]
+    if not pending:
+        return 0
+
+    os.makedirs(os.path.dirname(os.path.join(upload_folder, thumb_name(filename, *pending[0]))), exist_ok=True)
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+        # Primero los anchos grandes: cuando existe el pequeño (el que mira image_attrs) la variante esta completa
+        for variant, width in sorted(pending, key=lambda item: -item[1]):
+            thumb = image.copy()
+            # Nunca se agranda: si el original es pequeño se queda como esta
+            thumb.thumbnail((width, width), Image.Resampling.LANCZOS)
+            target = os.path.join(upload_folder, thumb_name(filename, variant, width))
+            # Sin exif=...: el WebP sale sin metadatos
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            thumb.save(tmp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(tmp_path, target)
+
+    return len(pending)
+
+
+def process_upload(path, upload_folder, variants):
+    """make_thumbnails() en el propio proceso. Si no es una imagen que Pillow entienda, se deja sin miniaturas."""
+    try:
+        make_thumbnails(path, upload_folder, variants)
+    except (UnidentifiedImageError, OSError) as e:
+        current_app.logger.warning(f"No se han podido generar miniaturas de {path}: {e}")
+
+
+class ImageWorkers:
+    """
+    Pool de procesos para make_thumbnails(): la peticion guarda el original (ya sin EXIF, ver
+    save_image) y vuelve enseguida, las miniaturas aparecen despues (mientras tanto image_attrs
+    sirve el original). Como mucho IMAGE_QUEUE_MAX imagenes pendientes por worker; si esta lleno
+    se espera IMAGE_QUEUE_WAIT segundos y si sigue lleno submit devuelve False (save_image las hace
+    entonces en la propia peticion).
+    IMAGE_WORKERS = 0 -> en la propia peticion, como antes.
+    Tambien recuerda que originales ya tienen miniaturas (IMAGE_READY_TTL segundos) para no
+    mirar el disco por cada tarjeta; al terminar una imagen se olvida lo que se sabia de ella.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.workers = 0
+        self.wait = 0
+        self.ready_ttl = 300
+        self.ready_max_entries = 20000
+        self._ready = {}
+        self._slots = None
+        self._lock = threading.Lock()
+        self._app = None
+        self.submitted = 0
+        self.done = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.workers = app.config.get("IMAGE_WORKERS", 2)
+        self.wait = app.config.get("IMAGE_QUEUE_WAIT", 2)
+        self._slots = threading.BoundedSemaphore(app.config.get("IMAGE_QUEUE_MAX", 32))
+        self.ready_ttl = app.config.get("IMAGE_READY_TTL", 300)
+        self.ready_max_entries = app.config.get("IMAGE_READY_MAX_ENTRIES", 20000)
+        # Los procesos se crean al primer submit; spawn y no fork (el worker ya tiene hilos y conexiones)
+        if self.workers:
+            self.executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, path, upload_folder, variants):
+        """Encola las miniaturas de path. Devuelve False si la cola esta llena (no se ha encolado)."""
+        if self.executor is None:
+            process_upload(path, upload_folder, variants)
+            self.forget(upload_name(path, upload_folder))
+            return True
+
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            self._app.logger.warning(f"Cola de imagenes llena, no se encolan las miniaturas de {path}")
+            return False
+
+        try:
+            future = self.executor.submit(make_thumbnails, path, upload_folder, tuple(variants))
+        except BrokenProcessPool:
+            # Un proceso murio (p.ej. sin memoria): pool nuevo y esta imagen aqui mismo
+            self._slots.release()
+            self._app.logger.error("Pool de imagenes roto, se vuelve a crear")
+            self.executor = self._new_executor()
+            process_upload(path, upload_folder, variants)
+            self.forget(upload_name(path, upload_folder))
+            return True
+
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(partial(self._finished, path, upload_name(path, upload_folder)))
+        return True
+
+    def _finished(self, path, filename, future):
+        self._slots.release()
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+            # La siguiente tarjeta vuelve a mirar el disco y ya vera las miniaturas
+            for variant in IMAGE_VARIANTS:
+                self._ready.pop((filename, variant), None)
+        if error is not None:
+            self._app.logger.warning(f"No se han podido generar miniaturas de {path}: {error}")
+
+    # == Miniaturas listas ==
+
+    def ready(self, filename, variant, upload_folder):
+        """
+        Si estan las miniaturas (basta con la pequeña, se escribe la ultima). Un si se recuerda
+        ready_ttl segundos; un no, pocos (otro worker de gunicorn puede estar generandolas).
+        """
+        key = (filename, variant)
+        now = time.monotonic()
+        cached = self._ready.get(key)
+        if cached is not None and cached[1] >= now:
+            return cached[0]
+
+        width = IMAGE_VARIANTS[variant]["widths"][0]
+        ready = os.path.exists(os.path.join(upload_folder, thumb_name(filename, variant, width)))
+        with self._lock:
+            if len(self._ready) >= self.ready_max_entries:
+                self._ready.clear()
+            self._ready[key] = (ready, now + (self.ready_ttl if ready else min(self.ready_ttl, NOT_READY_TTL)))
+        return ready
+
+    def forget(self, filename):
+        with self._lock:
+            for variant in IMAGE_VARIANTS:
+                self._ready.pop((filename, variant), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self.submitted - self.done - self.failed,
+                "submitted": self.submitted,
+                "done": self.done,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "ready_entries": len(self._ready),
+            }
+
+
+def thumbnails_ready(filename, variant, cached=True):
+    """Si ya estan las miniaturas de la variante. cached=False mira el disco (p.ej. al subir)."""
+    from .. import image_workers
+
+    if not filename:
+        return False
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    if not cached or not image_workers.ready_ttl:
+        image_workers.forget(filename)
+        width = IMAGE_VARIANTS[variant]["widths"][0]
+        return os.path.exists(os.path.join(upload_folder, thumb_name(filename, variant, width)))
+    return image_workers.ready(filename, variant, upload_folder)
+
+
+def image_attrs(filename, variant):
+    """
+    Global de Jinja: <img {{ image_attrs(product.photo, 'card') }} alt="...">
+    src + srcset + sizes de la variante; si aun no hay miniaturas, el original.
+    """
+    from .. import static_assets
+
+    original = static_assets.url(f"uploads/{filename}")
+    if not thumbnails_ready(filename, variant):
+        return Markup(f'src="{escape(original)}"')
+
+    config = IMAGE_VARIANTS[variant]
+    names = [thumb_name(filename, variant, width) for width in config["widths"]]
+
+    srcset = ", ".join(
+        f"{static_assets.url(f'uploads/{name}')} {width}w"
+        for name, width in zip(names, config["widths"])
+    )
+    src = static_assets.url(f"uploads/{names[0]}")
+    return Markup(f'src="{escape(src)}" srcset="{escape(srcset)}" sizes="{escape(config["sizes"])}"')
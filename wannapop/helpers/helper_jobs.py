@@ -0,0 +1,182 @@
+# wannapop/helpers/helper_jobs.py
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+
+from .helper_export import export_query, iter_rows_by_id, csv_chunks, write_xlsx
+
+EXPORT_FORMATS = {
+    "csv": ("products.csv", "text/csv"),
+    "xlsx": ("products.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+class ExportJobs:
+    """
+    Exportaciones del catalogo en un pool de hilos del propio worker.
+    El estado vive en la tabla export_jobs (cualquier worker puede contestar al polling)
+    y el fichero en EXPORT_DIR hasta que caduca (EXPORT_TTL).
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.directory = None
+        self.ttl = timedelta(hours=1)
+        self.stale = timedelta(minutes=5)
+        self._app = None
+
+    def init_app(self, app):
+        self._app = app
+        self.directory = app.config.get("EXPORT_DIR") or os.path.join(app.instance_path, "exports")
+        self.ttl = timedelta(seconds=app.config.get("EXPORT_TTL", 3600))
+        self.stale = timedelta(seconds=app.config.get("EXPORT_STALE_SECONDS", 300))
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get("EXPORT_WORKERS", 2),
+            thread_name_prefix="export"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def params_key(fmt, filters):
+        raw = json.dumps({"format": fmt, **filters}, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    # == Encolar ==
+
+    def submit(self, user_id, fmt, filters):
+        """Devuelve un trabajo igual reciente del mismo usuario (en marcha o terminado) o crea uno nuevo."""
+        from .. import db
+        from ..models import ExportJob, ExportJobStatus
+
+        self.purge_expired()
+
+        key = self.params_key(fmt, filters)
+        now = datetime.utcnow()
+        candidates = (
+            ExportJob.query
+            .filter(ExportJob.params_key == key)
+            .filter(ExportJob.user_id == user_id)
+            .filter(ExportJob.status != ExportJobStatus.failed.value)
+            .order_by(ExportJob.created.desc())
+        )
+        for job in candidates:
+            if job.status == ExportJobStatus.done.value and job.expires > now and os.path.exists(job.path):
+                return job
+            # En marcha y dando señales de vida (un worker muerto deja trabajos colgados)
+            if job.status in (ExportJobStatus.pending.value, ExportJobStatus.running.value) and job.updated > now - self.stale:
+                return job
+
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            format=fmt,
+            params=json.dumps(filters, default=str),
+            params_key=key,
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id, fmt, filters)
+        return job
+
+    # == Ejecutar (hilo del pool) ==
+
+    def _run(self, job_id, fmt, filters):
+        with self._app.app_context():
+            from .. import db
+            from ..models import ExportJob, ExportJobStatus, Product
+
+            path = os.path.join(self.directory, f"{job_id}.{fmt}")
+            try:
+                query = export_query(**filters)
+                total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+                self._update(job_id, status=ExportJobStatus.running.value, rows_total=total)
+
+                rows = self._track(job_id, iter_rows_by_id(db.engine, query, Product.id))
+                # Se escribe en .part y se renombra: nunca se sirve un fichero a medias
+                with open(path + ".part", "wb") as output:
+                    if fmt == "csv":
+                        for chunk in csv_chunks(rows):
+                            output.write(chunk)
+                    else:
+                        write_xlsx(rows, output)
+                os.replace(path + ".part", path)
+
+                self._update(
+                    job_id,
+                    status=ExportJobStatus.done.value,
+                    path=path,
+                    expires=datetime.utcnow() + self.ttl
+                )
+            except Exception as e:
+                db.session.rollback()
+                self._app.logger.exception("Exportacion %s fallida", job_id)
+                self._update(job_id, status=ExportJobStatus.failed.value, error=str(e)[:500])
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+            finally:
+                db.session.remove()
+
+    def _track(self, job_id, row_chunks):
+        done = 0
+        for chunk in row_chunks:
+            yield chunk
+            done += len(chunk)
+            self._update(job_id, rows_done=done)
+
+    @staticmethod
+    def _update(job_id, **values):
+        from .. import db
+        from ..models import ExportJob
+
+        db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id)
+            .values(updated=datetime.utcnow(), **values)
+        )
+        db.session.commit()
+
+    # == Limpieza ==
+
+    def purge_expired(self):
+        """Borra ficheros y filas caducados (y fallidos viejos). Devuelve cuantos."""
+        from .. import db
+        from ..models import ExportJob, ExportJobStatus
+
+        now = datetime.utcnow()
+        expired = ExportJob.query.filter(
+            (ExportJob.expires < now)
+            | ((ExportJob.status == ExportJobStatus.failed.value) & (ExportJob.updated < now - self.ttl))
+        ).all()
+
+        for job in expired:
+            if job.path and os.path.exists(job.path):
+                os.remove(job.path)
+            db.session.delete(job)
+        if expired:
+            db.session.commit()
+        return len(expired)
+
+    # == Estado ==
+
+    @staticmethod
+    def describe(job):
+        progress = None
+        if job.rows_total:
+            progress = round(job.rows_done / job.rows_total, 3)
+        elif job.rows_total == 0 and job.status == "done":
+            progress = 1.0
+        return {
+            "id": job.id,
+            "format": job.format,
+            "status": job.status,
+            "rows_done": job.rows_done,
+            "rows_total": job.rows_total,
+            "progress": progress,
+            "error": job.error,
+            "expires": job.expires.isoformat() + "Z" if job.expires else None,
+        }
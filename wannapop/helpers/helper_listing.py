@@ -0,0 +1,80 @@
+# wannapop/helpers/helper_listing.py
+from .. import search_index
+from ..models import db, Product, Category, ProductStatus
+
+# Orden del listado -> clave del cursor (columna, descendente). Indices en models.Product
+SORTS = {
+    'newest': [(Product.created, True), (Product.id, True)],
+    'price_asc': [(Product.price, False), (Product.id, False)],
+    'price_desc': [(Product.price, True), (Product.id, True)],
+}
+
+
+def product_cards_query():
+    """
+    Query de las tarjetas de producto en una sola consulta.
+    Cada fila trae los campos que pinta la tarjeta + category_name, is_blocked e is_sold,
+    asi la plantilla no tiene que recorrer product.offers / product.blocked / product.category.
+    """
+    return (
+        db.session.query(
+            Product.id,
+            Product.title,
+            Product.description,
+            Product.photo,
+            Product.price,
+            Product.seller_id,
+            Product.status,
+            Product.created,
+            Product.updated,
+            Category.name.label("category_name"),
+            (Product.status == ProductStatus.blocked.value).label("is_blocked"),
+            (Product.status == ProductStatus.sold.value).label("is_sold"),
+        )
+        .join(Category, Product.category_id == Category.id)
+    )
+
+
+def only_available(query):
+    """Quita los productos bloqueados y vendidos (lo que ve un wanner). Usa los indices que empiezan por status."""
+    return query.filter(Product.status == ProductStatus.available.value)
+
+
+def listing_query(staff=False, category=None, search=None, min_price=None, max_price=None, sort=None):
+    """
+    Query del listado /products con filtros y orden -> (query, key_columns del cursor).
+    key_columns es None si se ordena por relevancia de la busqueda.
+    """
+    query = product_cards_query()
+
+    # == Bloqueados y vendidos solo para moderator / admin ==
+    if not staff:
+        query = only_available(query)
+
+    # == Filtrar por categorias ==
+    if category:
+        query = query.filter(Category.name == category)
+
+    # == Rango de precio ==
+    # Ordenando por fecha, price + 0 hace que el motor recorra el indice de created (con LIMIT
+    # para en cuanto tiene la pagina) en vez de sacar todo el rango de precio y ordenarlo
+    price = Product.price + 0 if (sort or 'newest') == 'newest' and not search else Product.price
+    if min_price is not None:
+        query = query.filter(price >= min_price)
+    if max_price is not None:
+        query = query.filter(price <= max_price)
+
+    # == Buscar (indice de texto, ordenado por relevancia) ==
+    if search:
+        query = search_index.apply(query, Product, search)
+
+    # == Orden ==
+    # Busqueda sin sort: relevancia (cursor por offset). Si no, la clave del cursor es el orden
+    if search and not sort:
+        return query, None
+
+    key_columns = SORTS[sort or 'newest']
+    query = query.order_by(None).order_by(
+        *(column.desc() if descending else column.asc() for column, descending in key_columns)
+    )
+    return query, key_columns
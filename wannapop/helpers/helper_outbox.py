@@ -0,0 +1,257 @@
+# wannapop/helpers/helper_outbox.py
+import os
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.utils import getaddresses
+from sqlalchemy import delete, func, select, update
+
+
+def _permanent(error):
+    """5xx del servidor (destinatario que no existe, mensaje rechazado...): reintentar no sirve."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # smtplib la lanza tambien con 450/451/452 (greylisting, buzon lleno): solo si todos son 5xx
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": round(pick(0.5), 1), "p95": round(pick(0.95), 1), "max": round(ordered[-1], 1)}
+
+
+class MailOutbox:
+    """
+    Outbox de correo: la peticion solo inserta una fila en mail_outbox (en su misma transaccion,
+    si hay rollback no se manda nada) y un hilo por worker los va enviando por SMTP.
+    Varios workers pueden enviar a la vez: cada mensaje se reclama con un UPDATE ... WHERE status='pending'.
+    Fallos temporales -> reintento con espera exponencial (OUTBOX_RETRY_BASE * 2^intentos, con jitter).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.batch_size = 20
+        self.poll_interval = 5
+        self.max_attempts = 8
+        self.retry_base = 30
+        self.retry_max = 3600
+        self.claim_timeout = timedelta(minutes=5)
+        self.keep = timedelta(days=7)
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._last_purge = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        # Ultimos envios: ms desde que se encolo y ms de SMTP por mensaje (media de su lote)
+        self.queue_latency = deque(maxlen=1000)
+        self.smtp_duration = deque(maxlen=1000)
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get("OUTBOX_SENDER", "thread") == "thread"
+        self.batch_size = app.config.get("OUTBOX_BATCH_SIZE", 20)
+        self.poll_interval = app.config.get("OUTBOX_POLL_INTERVAL", 5)
+        self.max_attempts = app.config.get("OUTBOX_MAX_ATTEMPTS", 8)
+        self.retry_base = app.config.get("OUTBOX_RETRY_BASE", 30)
+        self.retry_max = app.config.get("OUTBOX_RETRY_MAX", 3600)
+        self.claim_timeout = timedelta(seconds=app.config.get("OUTBOX_CLAIM_TIMEOUT", 300))
+        self.keep = timedelta(days=app.config.get("OUTBOX_KEEP_DAYS", 7))
+        # El hilo se arranca con la primera peticion (no en los comandos flask ni en el master de gunicorn)
+        app.before_request(self.ensure_sender)
+
+    # == Encolar ==
+
+    def enqueue(self, msg):
+        """Añade el EmailMessage a la sesion. Se envia cuando quien llama hace commit."""
+        from .. import db
+        from ..models import OutboxMessage
+
+        recipients = [addr for _, addr in getaddresses(msg.get_all("To", []) + msg.get_all("Cc", []) + msg.get_all("Bcc", [])) if addr]
+        del msg["Bcc"]
+        sender = getaddresses([msg["From"]])[0][1]
+
+        row = OutboxMessage(
+            sender=sender,
+            recipients=",".join(recipients),
+            subject=str(msg["Subject"] or "")[:255],
+            raw=msg.as_bytes(),
+        )
+        db.session.add(row)
+        return row
+
+    def wake(self):
+        self.ensure_sender()
+        self._wakeup.set()
+
+    # == Hilo de envio ==
+
+    def ensure_sender(self):
+        """Arranca el hilo si no esta vivo en este proceso (tras un fork de gunicorn hay que crearlo otra vez)."""
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="mail-outbox", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        from .. import db
+
+        while True:
+            with self._app.app_context():
+                try:
+                    processed = self.send_due()
+                    self._purge_sent()
+                except Exception:
+                    self._app.logger.exception("Error en el envio de correos pendientes")
+                    processed = 0
+                finally:
+                    db.session.remove()
+            # Lote lleno: seguramente hay mas, sin esperar
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def send_due(self, limit=None):
+        """Envia los mensajes que tocan (pendientes con next_attempt pasado). Devuelve cuantos ha procesado."""
+        from .. import db, mail_manager
+        from ..models import OutboxMessage, OutboxStatus
+
+        now = datetime.utcnow()
+        # Reclamados por un worker que murio a medio envio
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.status == OutboxStatus.sending.value)
+            .where(OutboxMessage.claimed_at < now - self.claim_timeout)
+            .values(status=OutboxStatus.pending.value)
+        )
+        db.session.commit()
+
+        due = db.session.execute(
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == OutboxStatus.pending.value)
+            .where(OutboxMessage.next_attempt <= now)
+            .order_by(OutboxMessage.next_attempt)
+            .limit(limit or self.batch_size)
+        ).scalars().all()
+
+        claimed = []
+        for message_id in due:
+            rowcount = db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .where(OutboxMessage.status == OutboxStatus.pending.value)
+                .values(status=OutboxStatus.sending.value, claimed_at=datetime.utcnow())
+            ).rowcount
+            if rowcount:
+                claimed.append(message_id)
+        db.session.commit()
+        if not claimed:
+            return 0
+
+        # Todo el lote por una sola conexion SMTP (MailManager.deliver_many)
+        messages = db.session.execute(
+            select(OutboxMessage).where(OutboxMessage.id.in_(claimed)).order_by(OutboxMessage.next_attempt)
+        ).scalars().all()
+        started = time.perf_counter()
+        results = mail_manager.deliver_many(
+            [(message.sender, message.recipients.split(","), message.raw) for message in messages]
+        )
+        smtp_ms = (time.perf_counter() - started) * 1000 / len(messages)
+
+        for message, error in zip(messages, results):
+            if error is None:
+                self._delivered(message, smtp_ms)
+            else:
+                self._failed(message, error)
+        db.session.commit()
+        return len(messages)
+
+    def _delivered(self, message, smtp_ms):
+        from ..models import OutboxStatus
+
+        message.status = OutboxStatus.sent.value
+        message.sent_at = datetime.utcnow()
+        message.attempts += 1
+        message.last_error = None
+        with self._lock:
+            self.sent += 1
+            self.smtp_duration.append(smtp_ms)
+            self.queue_latency.append((message.sent_at - message.created).total_seconds() * 1000)
+
+    def _failed(self, message, error):
+        from ..models import OutboxStatus
+
+        message.attempts += 1
+        message.last_error = f"{type(error).__name__}: {error}"[:500]
+        if _permanent(error) or message.attempts >= self.max_attempts:
+            message.status = OutboxStatus.failed.value
+            with self._lock:
+                self.failed += 1
+            self._app.logger.error(f"Correo {message.id} a {message.recipients} descartado: {message.last_error}")
+            return
+
+        delay = min(self.retry_base * 2 ** (message.attempts - 1), self.retry_max)
+        message.status = OutboxStatus.pending.value
+        message.next_attempt = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        with self._lock:
+            self.retried += 1
+        self._app.logger.warning(f"Correo {message.id}: intento {message.attempts} fallido, se reintenta en ~{delay}s ({message.last_error})")
+
+    def _purge_sent(self):
+        """Una vez por hora borra los enviados mas viejos que OUTBOX_KEEP_DAYS."""
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        self.purge_sent()
+
+    def purge_sent(self):
+        from .. import db
+        from ..models import OutboxMessage, OutboxStatus
+
+        result = db.session.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.status == OutboxStatus.sent.value)
+            .where(OutboxMessage.sent_at < datetime.utcnow() - self.keep)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    # == Metricas ==
+
+    def stats(self):
+        from .. import db, mail_manager
+        from ..models import OutboxMessage
+
+        by_status = dict(db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all())
+        with self._lock:
+            return {
+                "sender": "thread" if self.enabled else "off",
+                "sender_alive": bool(self._thread and self._thread.is_alive()),
+                "by_status": by_status,
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "queue_latency_ms": _percentiles(self.queue_latency),
+                "smtp_ms": _percentiles(self.smtp_duration),
+                "smtp_pool": mail_manager.transport.stats(),
+            }
@@ -0,0 +1,135 @@
+# wannapop/helpers/helper_pagination.py
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_
+
+
+def keyset_filter(key_columns, values, backwards=False):
+    """(a, b) > (x, y) expandido: a > x OR (a = x AND b > y), respetando el sentido de cada columna."""
+    clauses = []
+    for i, (column, descending) in enumerate(key_columns):
+        equal = [c == v for (c, _), v in zip(key_columns[:i], values[:i])]
+        going_down = descending != backwards
+        clauses.append(and_(*equal, column < values[i] if going_down else column > values[i]))
+
+    # Redundante, pero con esto el indice empieza en el cursor en vez de al principio
+    first, descending = key_columns[0]
+    bound = first <= values[0] if descending != backwards else first >= values[0]
+    return and_(bound, or_(*clauses))
+
+
+class CursorPagination:
+    """
+    Paginacion por cursor (keyset) sin OFFSET ni COUNT(*).
+
+    key_columns: lista de (columna, descendente) que define el orden, la ultima
+    debe ser unica (p.ej. el id). Si es None el orden ya viene en la query
+    (p.ej. relevancia de la busqueda) y el cursor guarda un offset.
+
+    next_cursor / prev_cursor son tokens firmados y opacos para el cliente. Llevan el orden
+    con el que se crearon: un cursor de otro orden (p.ej. de ?sort=newest en ?sort=price_asc)
+    vuelve a la primera pagina.
+    """
+
+    def __init__(self, query, per_page, cursor=None, key_columns=None, secret_key="", total=None, approximate_total=False):
+        self.per_page = per_page
+        self.key_columns = key_columns
+        self.total = total
+        # El total es orientativo (PRODUCTS_TOTAL_MODE=approximate): la plantilla pone "~"
+        self.approximate_total = approximate_total
+        self._serializer = URLSafeSerializer(secret_key, salt="cursor-pagination")
+        self._order = self._order_key(key_columns)
+
+        position = self._decode(cursor)
+        self.direction = position.get("d", "next")
+
+        if key_columns is None:
+            self._paginate_offset(query, position.get("o", 0))
+        else:
+            self._paginate_keyset(query, position.get("k"))
+
+    # == Keyset ==
+
+    def _paginate_keyset(self, query, values):
+        backwards = self.direction == "prev"
+
+        if values is not None:
+            try:
+                values = [self._load(column, value) for (column, _), value in zip(self.key_columns, values, strict=True)]
+            except (TypeError, ValueError, InvalidOperation):
+                values = None
+        if values is not None:
+            query = query.filter(keyset_filter(self.key_columns, values, backwards))
+
+        order = []
+        for column, descending in self.key_columns:
+            # Hacia atras se recorre en orden inverso y luego se da la vuelta
+            order.append(column.asc() if descending == backwards else column.desc())
+        rows = query.order_by(None).order_by(*order).limit(self.per_page + 1).all()
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        self.items = rows
+        self.has_next = has_more if not backwards else values is not None
+        self.has_prev = values is not None if not backwards else has_more
+        self.next_cursor = self._encode({"k": self._key(rows[-1])}) if self.has_next and rows else None
+        self.prev_cursor = self._encode({"k": self._key(rows[0]), "d": "prev"}) if self.has_prev and rows else None
+
+    def _key(self, row):
+        return [self._dump(getattr(row, column.key)) for column, _ in self.key_columns]
+
+    # == Offset (orden por relevancia) ==
+
+    def _paginate_offset(self, query, offset):
+        offset = max(offset, 0) if isinstance(offset, int) else 0
+        rows = query.offset(offset).limit(self.per_page + 1).all()
+
+        self.items = rows[:self.per_page]
+        self.has_next = len(rows) > self.per_page
+        self.has_prev = offset > 0
+        self.next_cursor = self._encode({"o": offset + self.per_page}) if self.has_next else None
+        self.prev_cursor = self._encode({"o": max(offset - self.per_page, 0)}) if self.has_prev else None
+
+    # == Tokens ==
+
+    @staticmethod
+    def _order_key(key_columns):
+        """'created-,id-' / 'price+,id+' / 'offset': lo que tiene que coincidir para aceptar un cursor."""
+        if key_columns is None:
+            return "offset"
+        return ",".join(f"{column.key}{'-' if descending else '+'}" for column, descending in key_columns)
+
+    def _encode(self, position):
+        return self._serializer.dumps({**position, "s": self._order})
+
+    def _decode(self, cursor):
+        if not cursor:
+            return {}
+        try:
+            position = self._serializer.loads(cursor)
+        except BadSignature:
+            # Cursor manipulado o de otra SECRET_KEY -> primera pagina
+            return {}
+        if not isinstance(position, dict) or position.get("s") != self._order:
+            # Cursor de otro orden: sus valores no son de estas columnas
+            return {}
+        return position
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _load(column, value):
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return python_type(value)
@@ -0,0 +1,135 @@
+# wannapop/helpers/helper_passwords.py
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+
+def hash_password(password, rounds):
+    """Hash bcrypt ($2b$<rounds>$...) como str. Sin Flask: corre en los procesos del pool."""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(pw_hash, password):
+    """Si password corresponde a pw_hash. Un hash que no es bcrypt no coincide con nada."""
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+def hash_rounds(pw_hash):
+    """Coste (log2 de rondas) de un hash bcrypt: '$2b$12$...' -> 12. None si no es bcrypt."""
+    try:
+        return int(pw_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": round(pick(0.5), 1), "p95": round(pick(0.95), 1), "p99": round(pick(0.99), 1), "max": round(ordered[-1], 1)}
+
+
+class PasswordHasher:
+    """
+    bcrypt (generar y comprobar) en un pool de procesos: cada hash son ~250 ms de CPU
+    que asi no ocupan el worker de la peticion.
+    Como mucho BCRYPT_QUEUE_MAX operaciones en curso por worker; si esta lleno se espera
+    BCRYPT_QUEUE_WAIT segundos y si sigue lleno -> 503 con Retry-After (avalancha de logins).
+    BCRYPT_WORKERS = 0 -> en la propia peticion. BCRYPT_LOG_ROUNDS es el coste de los hashes
+    nuevos; los que tienen otro coste se rehacen al hacer login (needs_rehash).
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.workers = 0
+        self.rounds = 12
+        self.wait = 0
+        self._slots = None
+        self._lock = threading.Lock()
+        self._app = None
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        # Ultimas operaciones: ms desde que se pide hasta que hay resultado (cola incluida)
+        self.duration = deque(maxlen=1000)
+
+    def init_app(self, app):
+        self._app = app
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", 12)
+        self.workers = app.config.get("BCRYPT_WORKERS", 2)
+        self.wait = app.config.get("BCRYPT_QUEUE_WAIT", 5)
+        self._slots = threading.BoundedSemaphore(app.config.get("BCRYPT_QUEUE_MAX", 16))
+        # spawn y no fork, como el pool de imagenes
+        if self.workers:
+            self.executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _run(self, function, *args):
+        started = time.perf_counter()
+        if self.executor is None:
+            result = function(*args)
+        else:
+            if not self._slots.acquire(timeout=self.wait):
+                with self._lock:
+                    self.rejected += 1
+                self._app.logger.warning("Cola de bcrypt llena, peticion rechazada con 503")
+                raise ServiceUnavailable("Demasiadas peticiones, vuelve a intentarlo en unos segundos.", retry_after=max(1, int(self.wait)))
+            try:
+                result = self.executor.submit(function, *args).result()
+            except BrokenProcessPool:
+                # Un proceso murio: pool nuevo y esta operacion aqui mismo
+                self._app.logger.error("Pool de bcrypt roto, se vuelve a crear")
+                self.executor = self._new_executor()
+                result = function(*args)
+            finally:
+                self._slots.release()
+
+        with self._lock:
+            self.completed += 1
+            self.duration.append((time.perf_counter() - started) * 1000)
+        return result
+
+    def generate(self, password):
+        """Hash nuevo con el coste configurado (str, para User.password)."""
+        return self._run(hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        return self._run(check_password, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        return hash_rounds(pw_hash) != self.rounds
+
+    def check_and_rehash(self, user, password):
+        """
+        Comprueba la contraseña del usuario; si es correcta y el hash tiene otro coste,
+        deja user.password con uno nuevo (lo guarda el commit de quien llama).
+        """
+        if not self.check(user.password, password):
+            return False
+        if self.needs_rehash(user.password):
+            user.password = self.generate(password)
+            with self._lock:
+                self.rehashed += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "duration_ms": _percentiles(self.duration),
+            }
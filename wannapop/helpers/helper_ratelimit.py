@@ -0,0 +1,255 @@
+# wannapop/helpers/helper_ratelimit.py
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, render_template, request
+from werkzeug.exceptions import TooManyRequests
+
+
+def parse_rule(rule):
+    """'10/60' -> (10, 60): rafaga de 10 peticiones que se recupera entera en 60 segundos."""
+    capacity, seconds = rule.split("/")
+    return int(capacity), float(seconds)
+
+
+def refill(tokens, updated, now, capacity, seconds):
+    """Fichas del cubo en now (se recupera capacity cada seconds, sin pasar de capacity)."""
+    return min(capacity, tokens + (now - updated) * capacity / seconds)
+
+
+def spend(entries, current, now):
+    """
+    Todo o nada: entries = [(key, capacity, seconds, cost)], current = [(tokens, updated) o None].
+    Devuelve (nuevos valores, None) si todos los cubos tienen ficha (y se gastan cost de cada uno)
+    o (valores sin gastar nada, (posicion del primero vacio, segundos hasta su siguiente ficha)).
+    cost 0 = solo mirar que quede ficha.
+    """
+    tokens = [
+        refill(*row, now, capacity, seconds) if row else capacity
+        for (_, capacity, seconds, _), row in zip(entries, current)
+    ]
+    for i, ((_, capacity, seconds, _), left) in enumerate(zip(entries, tokens)):
+        if left < 1:
+            return tokens, (i, (1 - left) * seconds / capacity)
+    return [left - cost for (*_, cost), left in zip(entries, tokens)], None
+
+
+class MemoryBuckets:
+    """Cubos en memoria: cada worker lleva su propia cuenta (con N workers el limite real es N veces)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, entries, now):
+        """Ver spend(). Devuelve None si se puede o (posicion, segundos) del cubo vacio."""
+        with self._lock:
+            tokens, empty = spend(entries, [self._buckets.get(key) for key, *_ in entries], now)
+            for (key, *_), left in zip(entries, tokens):
+                self._buckets[key] = (left, now)
+            return empty
+
+    def purge(self, older_than):
+        with self._lock:
+            for key in [key for key, (_, updated) in self._buckets.items() if updated < older_than]:
+                del self._buckets[key]
+
+
+class SQLiteBuckets:
+    """
+    Cubos en un fichero SQLite compartido por todos los workers del host.
+    Cada take() es una transaccion BEGIN IMMEDIATE (lectura + escritura sin carreras entre procesos).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=2, isolation_level=None)
+
+    def _connection(self):
+        # Una conexion por hilo y proceso (tras un fork la del padre no vale)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def take(self, entries, now):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = [
+                connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                for key, *_ in entries
+            ]
+            tokens, empty = spend(entries, current, now)
+            connection.executemany(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                [(key, left, now) for (key, *_), left in zip(entries, tokens)],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return empty
+
+    def purge(self, older_than):
+        self._connection().execute("DELETE FROM buckets WHERE updated < ?", (older_than,))
+
+
+def _email_key(email):
+    # El email no se guarda tal cual en el fichero de cubos
+    if not email:
+        return None
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()[:24]
+
+
+class RateLimiter:
+    """
+    Limite por token bucket de las vistas caras (bcrypt, SMTP): login, registro, reenvio.
+    Dos cubos por vista, uno por IP y otro por email del formulario; solo cuentan los POST y
+    solo se gasta si los dos tienen ficha (un 429 por email no gasta la de la IP).
+    Con failures_only (login) el cubo del email solo lo gastan los intentos fallidos (la vista
+    llama a failed()): los logins correctos, de quien sea, no cuentan para nadie.
+    Sin fichas -> 429 con Retry-After. Reglas 'rafaga/segundos' en RATELIMIT_RULES.
+    La IP es request.remote_addr: detras de un proxy hay que poner TRUSTED_PROXIES (ProxyFix),
+    si no todos los clientes comparten la IP del proxy.
+    Con RATELIMIT_STORAGE (fichero SQLite) el limite es comun a todos los workers del host;
+    vacio -> en memoria por worker. Si el SQLite falla se deja pasar (y se cuenta en errors).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.rules = {}
+        self.backend = MemoryBuckets()
+        self._lock = threading.Lock()
+        self._last_purge = 0
+        self.allowed = 0
+        self.limited = {}
+        self.errors = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        self.rules = {
+            scope: {kind: parse_rule(rule) for kind, rule in rules.items()}
+            for scope, rules in app.config.get("RATELIMIT_RULES", {}).items()
+        }
+        storage = app.config.get("RATELIMIT_STORAGE")
+        self.backend = SQLiteBuckets(storage) if storage else MemoryBuckets()
+        app.register_error_handler(TooManyRequests, self.too_many)
+
+    # == Comprobar ==
+
+    def limit(self, scope, email_field="email", failures_only=False):
+        """Decorador de la vista: @rate_limiter.limit("login", failures_only=True)"""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if request.method == "POST":
+                    self.check(scope, request.remote_addr, request.form.get(email_field), email_cost=0 if failures_only else 1)
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    def check(self, scope, ip, email=None, email_cost=1):
+        """
+        Gasta una ficha del cubo de la IP y email_cost del del email (0 = solo mirar que quede);
+        si alguno esta vacio no gasta ninguna y TooManyRequests.
+        """
+        if not self.enabled or scope not in self.rules:
+            return
+        entries = self._entries(scope, [("ip", ip, 1), ("email", _email_key(email), email_cost)])
+        now = time.time()
+        try:
+            empty = self.backend.take([entry for _, entry in entries], now) if entries else None
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            current_app.logger.warning(f"Rate limit sin comprobar ({scope}): {e}")
+            return
+
+        if empty is not None:
+            position, wait = empty
+            kind = entries[position][0]
+            with self._lock:
+                self.limited[f"{scope}:{kind}"] = self.limited.get(f"{scope}:{kind}", 0) + 1
+            current_app.logger.warning(f"Rate limit {scope} por {kind} ({ip}), reintentar en {wait:.0f}s")
+            raise TooManyRequests(retry_after=math.ceil(wait))
+
+        with self._lock:
+            self.allowed += 1
+        self._purge(now)
+
+    def failed(self, scope, email):
+        """Un intento fallido con ese email (vistas con failures_only): gasta una ficha de su cubo."""
+        if not self.enabled or scope not in self.rules:
+            return
+        entries = self._entries(scope, [("email", _email_key(email), 1)])
+        if not entries:
+            return
+        try:
+            self.backend.take([entry for _, entry in entries], time.time())
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            current_app.logger.warning(f"Rate limit sin apuntar el fallo ({scope}): {e}")
+
+    def _entries(self, scope, keys):
+        """[(kind, (clave, capacidad, segundos, coste))] de los cubos con regla y valor."""
+        return [
+            (kind, (f"{scope}:{kind}:{value}", *self.rules[scope][kind], cost))
+            for kind, value, cost in keys
+            if value and kind in self.rules[scope]
+        ]
+
+    def _purge(self, now):
+        """Cada diez minutos borra los cubos que ya estarian llenos (sin uso en mas de un periodo)."""
+        if now - self._last_purge < 600:
+            return
+        self._last_purge = now
+        longest = max((seconds for rules in self.rules.values() for _, seconds in rules.values()), default=0)
+        try:
+            self.backend.purge(now - longest)
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def too_many(error):
+        """429 con la pagina de aviso (o el error tal cual si piden JSON)."""
+        if request.accept_mimetypes.best == "application/json":
+            return error
+        headers = {"Retry-After": str(error.retry_after)} if error.retry_after else {}
+        return render_template("auth/rate_limited.html", retry_after=error.retry_after), 429, headers
+
+    # == Metricas ==
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": self.backend.name,
+                "allowed": self.allowed,
+                "limited": dict(self.limited),
+                "errors": self.errors,
+            }
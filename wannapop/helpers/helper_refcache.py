@@ -0,0 +1,111 @@
+# wannapop/helpers/helper_refcache.py
+import os
+import threading
+import time
+from collections import namedtuple
+
+CategoryRef = namedtuple("CategoryRef", "id name")
+RoleRef = namedtuple("RoleRef", "id name")
+
+
+def load_categories():
+    from ..models import Category
+    return [CategoryRef(c.id, c.name) for c in Category.query.order_by(Category.id.asc())]
+
+
+def load_roles():
+    from ..models import Role
+    return [RoleRef(r.id, r.name) for r in Role.query.order_by(Role.id.asc())]
+
+
+class LocalChannel:
+    """Sin invalidacion entre procesos: cada worker solo depende del TTL y de sus propios cambios."""
+
+    def publish(self, name):
+        pass
+
+    def version(self, name):
+        return 0
+
+
+class FileChannel:
+    """
+    Invalidacion entre workers del mismo host.
+    Cada conjunto tiene un fichero "marca"; invalidar = tocarlo, comprobar = un stat().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.stamp")
+
+    def publish(self, name):
+        path = self._path(name)
+        with open(path, "a"):
+            pass
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def version(self, name):
+        try:
+            return os.stat(self._path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+
+class ReferenceCache:
+    """
+    Cache en memoria de datos que casi no cambian (categorias, roles).
+    Guarda namedtuples, no objetos ORM, para poder compartirlos entre peticiones.
+    """
+
+    Entry = namedtuple("Entry", "value expires version")
+
+    def __init__(self):
+        self.loaders = {"categories": load_categories, "roles": load_roles}
+        self.ttl = 300
+        self.channel = LocalChannel()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("REFCACHE_TTL", 300)
+        channel_dir = app.config.get("REFCACHE_CHANNEL_DIR")
+        self.channel = FileChannel(channel_dir) if channel_dir else LocalChannel()
+
+    def get(self, name):
+        version = self.channel.version(name)
+        entry = self._entries.get(name)
+
+        if entry is None or entry.expires < time.monotonic() or entry.version != version:
+            with self._lock:
+                value = self.loaders[name]()
+                entry = self.Entry(value, time.monotonic() + self.ttl, version)
+                self._entries[name] = entry
+
+        return entry.value
+
+    def invalidate(self, name, publish=True):
+        """Borra la entrada local y, si publish, avisa al resto de workers."""
+        self._entries.pop(name, None)
+        if publish:
+            self.channel.publish(name)
+
+    # == Accesos directos ==
+
+    def categories(self):
+        return self.get("categories")
+
+    def roles(self):
+        return self.get("roles")
+
+    def role_name(self, role_id):
+        for role in self.roles():
+            if role.id == role_id:
+                return role.name
+
+        # Rol nuevo que aun no teniamos -> recargar una vez
+        self.invalidate("roles", publish=False)
+        return next((r.name for r in self.roles() if r.id == role_id), None)
@@ -50,7 +50,7 @@ class HelperRole:
 def on_identity_loaded(sender, identity):
     identity.user = current_user
 
-    role_name = getattr(getattr(current_user, "role", None), "name", None)
+    role_name = getattr(current_user, "role_name", None)
     role_name = (role_name or "").lower()
 
 
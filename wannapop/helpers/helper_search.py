@@ -0,0 +1,190 @@
+# wannapop/helpers/helper_search.py
+import re
+from sqlalchemy import or_, func, text, table, column, literal_column, false
+
+
+def search_terms(search_query):
+    """Separa la busqueda en palabras (sin simbolos de la sintaxis de cada motor)."""
+    return re.findall(r"\w+", search_query or "")
+
+
+class LikeSearchBackend:
+    """Backend por defecto: ILIKE sin indice. Solo para motores sin soporte."""
+
+    name = "like"
+
+    def create_index(self, connection):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def apply(self, query, model, search_query):
+        return query.filter(
+            or_(
+                model.title.ilike(f"%{search_query}%"),
+                model.description.ilike(f"%{search_query}%")
+            )
+        )
+
+
+class SqliteFtsBackend(LikeSearchBackend):
+    """
+    Tabla virtual FTS5 con contenido externo (products).
+    Los triggers mantienen el indice en la misma transaccion que el INSERT/UPDATE/DELETE.
+    """
+
+    name = "fts5"
+    fts_table = "products_fts"
+
+    def create_index(self, connection):
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": self.fts_table}
+        ).first()
+
+        connection.execute(text(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5(
+                title, description,
+                content='products', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ai AFTER INSERT ON products BEGIN
+                INSERT INTO {self.fts_table}(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.fts_table}_ad AFTER DELETE ON products BEGIN
+                INSERT INTO {self.fts_table}({self.fts_table}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS {self.fts_table}_au AFTER UPDATE OF title, description ON products BEGIN
+                INSERT INTO {self.fts_table}({self.fts_table}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO {self.fts_table}(rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END
+        """))
+
+        # Indice nuevo sobre una tabla con datos -> indexar lo que ya existe
+        if not exists:
+            self.rebuild(connection)
+
+    def rebuild(self, connection):
+        connection.execute(text(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"))
+
+    def apply(self, query, model, search_query):
+        terms = search_terms(search_query)
+        if not terms:
+            return query.filter(false())
+
+        # "palabra"* -> prefijo de cada palabra, todas obligatorias
+        match = " ".join(f'"{term}"*' for term in terms)
+        fts = table(self.fts_table, column("rowid"))
+        fts_ref = literal_column(self.fts_table)
+
+        return (
+            query.join(fts, fts.c.rowid == model.id)
+            .filter(fts_ref.op("MATCH")(match))
+            # bm25: menor = mas relevante. El titulo pesa mas que la descripcion
+            .order_by(func.bm25(fts_ref, 10.0, 1.0), model.id.desc())
+        )
+
+
+class PostgresFtsBackend(LikeSearchBackend):
+    """tsvector + indice GIN de expresion (sin columnas extra que sincronizar)."""
+
+    name = "tsvector"
+    config = "simple"
+
+    def _vector(self, model):
+        return func.to_tsvector(self.config, func.coalesce(model.title, "") + " " + func.coalesce(model.description, ""))
+
+    def create_index(self, connection):
+        connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS ix_products_fts ON products
+            USING gin (to_tsvector('{self.config}', coalesce(title, '') || ' ' || coalesce(description, '')))
+        """))
+
+    def apply(self, query, model, search_query):
+        terms = search_terms(search_query)
+        if not terms:
+            return query.filter(false())
+
+        vector = self._vector(model)
+        tsquery = func.to_tsquery(self.config, " & ".join(f"{term}:*" for term in terms))
+
+        return (
+            query.filter(vector.op("@@")(tsquery))
+            .order_by(func.ts_rank(vector, tsquery).desc(), model.id.desc())
+        )
+
+
+class MysqlFtsBackend(LikeSearchBackend):
+    """Indice FULLTEXT de InnoDB con MATCH ... AGAINST en modo booleano."""
+
+    name = "fulltext"
+
+    def create_index(self, connection):
+        exists = connection.execute(text("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = 'ix_products_fts'
+        """)).first()
+        if not exists:
+            connection.execute(text("ALTER TABLE products ADD FULLTEXT INDEX ix_products_fts (title, description)"))
+
+    def apply(self, query, model, search_query):
+        from sqlalchemy.dialects.mysql import match
+
+        terms = search_terms(search_query)
+        if not terms:
+            return query.filter(false())
+
+        relevance = match(model.title, model.description, against=" ".join(f"+{term}*" for term in terms)).in_boolean_mode()
+
+        return query.filter(relevance > 0).order_by(relevance.desc(), model.id.desc())
+
+
+BACKENDS = {
+    "sqlite": SqliteFtsBackend,
+    "postgresql": PostgresFtsBackend,
+    "mysql": MysqlFtsBackend,
+    "mariadb": MysqlFtsBackend,
+}
+
+
+class SearchIndex:
+    """
+    Busqueda de texto del catalogo.
+    SEARCH_BACKEND = "auto" elige el backend segun el motor de la BD, "like" lo desactiva.
+    """
+
+    def __init__(self):
+        self.backend = LikeSearchBackend()
+
+    def init_app(self, app, engine):
+        backend = app.config.get("SEARCH_BACKEND", "auto")
+        if backend == "auto":
+            backend_cls = BACKENDS.get(engine.dialect.name, LikeSearchBackend)
+        else:
+            backend_cls = next(
+                (b for b in (LikeSearchBackend, *BACKENDS.values()) if b.name == backend),
+                LikeSearchBackend
+            )
+        self.backend = backend_cls()
+
+        with engine.begin() as connection:
+            self.backend.create_index(connection)
+
+    def rebuild(self, engine):
+        with engine.begin() as connection:
+            self.backend.rebuild(connection)
+
+    def apply(self, query, model, search_query):
+        """Filtra por la busqueda y ordena por relevancia."""
+        return self.backend.apply(query, model, search_query)
@@ -0,0 +1,174 @@
+# wannapop/helpers/helper_static.py
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app, request, send_from_directory, url_for
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Extensiones que se sirven precomprimidas (flask assets-compress)
+COMPRESSIBLE = (".css", ".js", ".svg")
+# (sufijo del fichero, Content-Encoding) por orden de preferencia
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+
+class StaticAssets:
+    """
+    URLs de static/ con huella (?v=<sha256 del contenido>) para poder cachearlas un año
+    (Cache-Control immutable): si el fichero cambia, cambia la URL.
+    Ademas sirve el .br / .gz de CSS y JS si existe y el navegador lo acepta.
+    """
+
+    def __init__(self):
+        self.max_entries = 10000
+        self.version = ""
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get("STATIC_FINGERPRINT_MAX_ENTRIES", 10000)
+        # Version del despliegue (entra en los ETag de las paginas): APP_VERSION o huella de plantillas + static
+        self.version = app.config.get("APP_VERSION") or build_version(app)
+        app.jinja_env.globals.update(static_url=self.url)
+        app.view_functions["static"] = self.send
+        app.after_request(self.cache_headers)
+
+    # == Huellas ==
+
+    def fingerprint(self, filename):
+        """12 hex del SHA-256 del fichero; se recalcula solo si cambia mtime / tamaño. None si no existe."""
+        path = os.path.join(current_app.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._fingerprints.get(filename)
+            if cached and cached[0] == signature:
+                self._fingerprints.move_to_end(filename)
+                return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b""):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:12]
+
+        with self._lock:
+            self._fingerprints[filename] = (signature, fingerprint)
+            self._fingerprints.move_to_end(filename)
+            while len(self._fingerprints) > self.max_entries:
+                self._fingerprints.popitem(last=False)
+        return fingerprint
+
+    def url(self, filename):
+        """Global de Jinja: {{ static_url('css/styles.css') }} -> /static/css/styles.css?v=1a2b3c4d5e6f"""
+        fingerprint = self.fingerprint(filename)
+        if fingerprint is None:
+            return url_for("static", filename=filename)
+        return url_for("static", filename=filename, v=fingerprint)
+
+    # == Servir ==
+
+    def send(self, filename):
+        """Sustituye a la vista static de Flask: igual, pero con el precomprimido si lo hay."""
+        static_folder = current_app.static_folder
+        if filename.endswith(COMPRESSIBLE):
+            accepted = request.accept_encodings
+            source = os.path.join(static_folder, filename)
+            for suffix, encoding in ENCODINGS:
+                compressed = source + suffix
+                if accepted[encoding] and os.path.isfile(compressed) and os.path.isfile(source) \
+                        and os.path.getmtime(compressed) >= os.path.getmtime(source):
+                    response = send_from_directory(
+                        static_folder,
+                        filename + suffix,
+                        mimetype=mimetypes.guess_type(filename)[0],
+                    )
+                    response.headers["Content-Encoding"] = encoding
+                    response.vary.add("Accept-Encoding")
+                    return response
+            response = send_from_directory(static_folder, filename)
+            response.vary.add("Accept-Encoding")
+            return response
+        return send_from_directory(static_folder, filename)
+
+    def cache_headers(self, response):
+        """
+        Un año + immutable solo si ?v= es la huella actual (una URL vieja sigue revalidando).
+        El HTML (que lleva esas URLs) sin Cache-Control propio -> no-cache: el navegador siempre
+        revalida y tras un despliegue nunca pinta una pagina vieja que apunte a CSS / JS viejos.
+        """
+        if request.endpoint != "static":
+            if response.mimetype == "text/html" and "Cache-Control" not in response.headers:
+                response.cache_control.no_cache = True
+            return response
+        if response.status_code not in (200, 304):
+            return response
+        version = request.args.get("v")
+        filename = (request.view_args or {}).get("filename")
+        if version and filename and version == self.fingerprint(filename):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+def build_version(app):
+    """
+    12 hex del SHA-256 de las plantillas y de static/ (sin subidas ni precomprimidos).
+    Cambia si cambia cualquier fichero que afecte al HTML o a las URLs ?v= que lleva.
+    """
+    digest = hashlib.sha256()
+    for folder in (app.template_folder and os.path.join(app.root_path, app.template_folder), app.static_folder):
+        if not folder or not os.path.isdir(folder):
+            continue
+        for root, dirs, files in os.walk(folder):
+            if root == app.static_folder and "uploads" in dirs:
+                dirs.remove("uploads")
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith((".gz", ".br")):
+                    continue
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, app.root_path).encode("utf-8"))
+                with open(path, "rb") as source:
+                    for chunk in iter(lambda: source.read(64 * 1024), b""):
+                        digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def compress_assets(static_folder, force=False):
+    """Escribe <fichero>.gz (y .br si esta instalado el paquete brotli) de CSS / JS. Devuelve cuantos ha escrito."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for root, dirs, files in os.walk(static_folder):
+        # Las subidas ya vienen comprimidas (JPEG / WebP)
+        if root == static_folder and "uploads" in dirs:
+            dirs.remove("uploads")
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            source = os.path.join(root, name)
+            with open(source, "rb") as original:
+                data = original.read()
+
+            outputs = [(".gz", lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                outputs.append((".br", lambda raw: brotli.compress(raw, quality=11)))
+
+            for suffix, compress in outputs:
+                target = source + suffix
+                if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                with open(target + ".tmp", "wb") as output:
+                    output.write(compress(data))
+                os.replace(target + ".tmp", target)
+                written += 1
+    return written
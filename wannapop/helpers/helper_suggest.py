@@ -0,0 +1,258 @@
+# wannapop/helpers/helper_suggest.py
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+def fold(text):
+    """'Camión Niño' -> 'camion nino'. Sin acentos ni mayusculas, como escriben los usuarios."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def fold_words(text):
+    return re.findall(r"\w+", fold(text))
+
+
+class SuggestIndex:
+    """
+    Indice de prefijos en memoria para las sugerencias del buscador.
+
+    - vocabulary: lista ordenada de palabras (plegadas). Un prefijo = un rango con bisect.
+    - postings: palabra -> array('I') de ids de productos disponibles, ordenado.
+
+    Memoria: no se guardan los titulos, solo ids de 4 bytes. 1M de titulos de 4 palabras con
+    un vocabulario de 100k palabras ocupan ~29 MB (medido con tracemalloc). SUGGEST_MAX_MEMORY_MB
+    pone el tope: al construir se indexa de mas nuevo a mas viejo y se para al llegar.
+
+    Se construye en un hilo aparte (la primera consulta lo arranca) y hasta que esta listo
+    suggest() devuelve []. Los cambios que llegan mientras se construye se guardan y se
+    aplican al indice nuevo al cambiarlo.
+
+    Un array de postings ya publicado no se modifica salvo para añadir al final (un id mas
+    nuevo): insertar o borrar en medio crea uno nuevo. Asi suggest() coge las referencias
+    con el lock y las recorre sin el.
+    """
+
+    def __init__(self):
+        self.max_memory = 64 * 1024 * 1024
+        self.max_age = 600
+        self.min_prefix = 2
+        self.vocabulary = []
+        self.postings = {}
+        self.built_at = None
+        self.truncated = False
+        self.queries = 0
+        self._app = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending = []
+
+    def init_app(self, app):
+        self._app = app
+        self.max_memory = app.config.get("SUGGEST_MAX_MEMORY_MB", 64) * 1024 * 1024
+        self.max_age = app.config.get("SUGGEST_MAX_AGE", 600)
+
+    # == Construccion ==
+
+    def build(self):
+        """Construye el indice desde la BD (dentro de un app context) y lo cambia de golpe."""
+        from .. import db
+        from ..models import Product, ProductStatus
+
+        rows = (
+            db.session.query(Product.id, Product.title)
+            .filter(Product.status == ProductStatus.available.value)
+            .order_by(Product.id.desc())
+            .yield_per(2000)
+        )
+
+        postings = {}
+        size = 0
+        truncated = False
+        for product_id, title in rows:
+            for word in set(fold_words(title)):
+                ids = postings.get(word)
+                if ids is None:
+                    ids = postings[word] = array("I")
+                    size += sys.getsizeof(word) + 100
+                ids.append(product_id)
+                size += ids.itemsize
+            if size > self.max_memory:
+                truncated = True
+                break
+
+        # Se ha recorrido de mas nuevo a mas viejo -> dar la vuelta para tener ids ascendentes
+        for ids in postings.values():
+            ids.reverse()
+
+        with self._lock:
+            self.postings = postings
+            self.vocabulary = sorted(postings)
+            # Commits que pueden no estar en lo leido (add / remove repetidos no cambian nada)
+            for added, product_id, title in self._pending:
+                (self._add if added else self._remove)(product_id, title)
+            self._pending = []
+            self.built_at = time.monotonic()
+            self.truncated = truncated
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding or self._app is None:
+                return
+            self._rebuilding = True
+            self._pending = []
+
+        def run(app):
+            try:
+                with app.app_context():
+                    self.build()
+            except Exception:
+                app.logger.exception("No se ha podido construir el indice de sugerencias")
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+                    self._pending = []
+
+        threading.Thread(target=run, args=(self._app,), daemon=True).start()
+
+    @property
+    def ready(self):
+        return self.built_at is not None
+
+    # == Cambios incrementales (los aplica models.py tras el commit) ==
+
+    def add(self, product_id, title):
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((True, product_id, title))
+            if self.built_at is not None:
+                self._add(product_id, title)
+
+    def remove(self, product_id, title):
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((False, product_id, title))
+            if self.built_at is not None:
+                self._remove(product_id, title)
+
+    def _add(self, product_id, title):
+        # Con self._lock
+        for word in set(fold_words(title)):
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = array("I")
+                insort(self.vocabulary, word)
+            if not ids or ids[-1] < product_id:
+                ids.append(product_id)
+            else:
+                i = bisect_left(ids, product_id)
+                if i == len(ids) or ids[i] != product_id:
+                    # Copia: puede haber una consulta recorriendo el array sin el lock
+                    self.postings[word] = ids[:i] + array("I", [product_id]) + ids[i:]
+
+    def _remove(self, product_id, title):
+        # Con self._lock
+        for word in set(fold_words(title)):
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            i = bisect_left(ids, product_id)
+            if i == len(ids) or ids[i] != product_id:
+                continue
+            if len(ids) > 1:
+                # Copia, como en _add
+                self.postings[word] = ids[:i] + ids[i + 1:]
+            else:
+                del self.postings[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+
+    # == Consulta ==
+
+    def suggest(self, q, limit=8):
+        """
+        Ids (mas nuevos primero) cuyo titulo tiene una palabra que empieza por
+        cada palabra de q: 'mesa mad' -> 'Mesa de madera'. [] mientras no este construido.
+        """
+        # Palabras de 1 letra ('mesa d') casan con media tabla: se ignoran
+        words = [word for word in fold_words(q) if len(word) >= self.min_prefix]
+        if not words:
+            return []
+
+        # Nunca se construye dentro de la peticion. Caducado: otros workers tambien escriben
+        if self.built_at is None or time.monotonic() - self.built_at > self.max_age:
+            self._rebuild_in_background()
+            if self.built_at is None:
+                return []
+
+        # Con el lock solo se cogen las referencias a los postings de cada palabra
+        with self._lock:
+            self.queries += 1
+            groups = [self._matching(word) for word in set(words)]
+
+        # Se recorre la palabra con menos ids (la mas selectiva) y el resto solo se comprueba
+        groups.sort(key=lambda postings: sum(len(ids) for ids in postings))
+        driver, *others = groups
+        if not driver:
+            return []
+        if not others:
+            # Una sola palabra: los N mas nuevos estan en la cola de cada posting
+            return heapq.nlargest(limit, {i for ids in driver for i in ids[-limit:]})
+
+        # Candidatos de mas nuevo a mas viejo, por tandas crecientes: se para al tener limit
+        newest_first = heapq.merge(*(reversed(ids) for ids in driver), reverse=True)
+        result = []
+        batch = limit * 4
+        while len(result) < limit:
+            chunk = list(dict.fromkeys(islice(newest_first, batch)))
+            if not chunk:
+                break
+            candidates = set(chunk)
+            for postings in others:
+                candidates = self._present(postings, candidates)
+                if not candidates:
+                    break
+            result += [product_id for product_id in chunk if product_id in candidates]
+            batch *= 2
+        return result[:limit]
+
+    @staticmethod
+    def _present(postings, candidates):
+        """Los candidatos que estan en alguno de los postings (sin juntar los postings en un set)."""
+        found = set()
+        for ids in postings:
+            if len(ids) > 16 * len(candidates):
+                # Posting largo: busqueda binaria de cada candidato que falta
+                for product_id in candidates - found:
+                    i = bisect_left(ids, product_id)
+                    if i < len(ids) and ids[i] == product_id:
+                        found.add(product_id)
+            else:
+                found |= candidates.intersection(ids)
+            if len(found) == len(candidates):
+                break
+        return found
+
+    def _matching(self, prefix):
+        """Postings de todas las palabras del vocabulario que empiezan por prefix."""
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\uffff")
+        return [self.postings[word] for word in self.vocabulary[start:end]]
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "rebuilding": self._rebuilding,
+            "words": len(self.vocabulary),
+            "postings": sum(len(ids) for ids in self.postings.values()),
+            "approx_bytes": sum(sys.getsizeof(w) + ids.buffer_info()[1] * ids.itemsize for w, ids in self.postings.items()),
+            "truncated": self.truncated,
+            "age_seconds": round(time.monotonic() - self.built_at) if self.built_at else None,
+            "queries": self.queries,
+        }
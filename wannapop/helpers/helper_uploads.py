@@ -0,0 +1,90 @@
+# wannapop/helpers/helper_uploads.py
+from tempfile import SpooledTemporaryFile
+from flask import Request, current_app, flash, redirect, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from wtforms.validators import StopValidation
+
+# Firmas (magic bytes) de los tipos que se aceptan: nombre -> comprobacion de la cabecera
+MAGIC_TYPES = {
+    "jpeg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    "png": lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    "gif": lambda head: head[:6] in (b"GIF87a", b"GIF89a"),
+    "webp": lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP",
+    "pdf": lambda head: head.startswith(b"%PDF-"),
+}
+IMAGE_TYPES = ("jpeg", "png")
+ATTACHMENT_TYPES = ("jpeg", "png", "gif", "webp", "pdf")
+
+
+def sniff_type(stream):
+    """Tipo real del fichero segun sus primeros bytes (None si no es ninguno conocido). Deja el stream al principio."""
+    position = stream.tell()
+    head = stream.read(16)
+    stream.seek(position)
+    for name, matches in MAGIC_TYPES.items():
+        if matches(head):
+            return name
+    return None
+
+
+class LimitedSpool(SpooledTemporaryFile):
+    """
+    Donde werkzeug va escribiendo cada fichero del multipart: en memoria hasta max_size
+    y luego a disco (carpeta temporal del sistema, no static/uploads).
+    Si un fichero pasa de limit se corta ahi mismo con 413, sin leer el resto del cuerpo.
+    """
+
+    def __init__(self, limit, **kwargs):
+        super().__init__(mode="w+b", **kwargs)
+        self.limit = limit
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        if self.limit and self.written > self.limit:
+            raise RequestEntityTooLarge()
+        return super().write(data)
+
+
+class UploadRequest(Request):
+    """Request con tope por fichero (UPLOAD_MAX_FILE_SIZE); el tope total es MAX_CONTENT_LENGTH de Flask."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return LimitedSpool(
+            config.get("UPLOAD_MAX_FILE_SIZE"),
+            max_size=config.get("UPLOAD_SPOOL_MEMORY", 512 * 1024),
+            dir=config.get("UPLOAD_SPOOL_DIR"),
+        )
+
+
+class UploadLimits:
+    """Activa UploadRequest y convierte el 413 en un aviso en el propio formulario."""
+
+    def init_app(self, app):
+        app.request_class = UploadRequest
+        app.register_error_handler(RequestEntityTooLarge, self.too_large)
+
+    @staticmethod
+    def too_large(error):
+        if request.method != "POST" or request.accept_mimetypes.best == "application/json":
+            return error
+        limit = current_app.config.get("UPLOAD_MAX_FILE_SIZE") or current_app.config.get("MAX_CONTENT_LENGTH")
+        flash(f"El archivo es demasiado grande (maximo {limit // (1024 * 1024)} MB).", "danger")
+        return redirect(request.url, code=303)
+
+
+class MagicBytes:
+    """Validador WTForms: el contenido (no la extension) tiene que ser de uno de los tipos."""
+
+    def __init__(self, types=IMAGE_TYPES, message=None):
+        self.types = types
+        self.message = message
+
+    def __call__(self, form, field):
+        files = field.data if isinstance(field.data, list) else [field.data]
+        for file in files:
+            if not file or not getattr(file, "filename", None):
+                continue
+            if sniff_type(file.stream) not in self.types:
+                raise StopValidation(self.message or f"Tipo de archivo no permitido ({', '.join(self.types)})")
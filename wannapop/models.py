@@ -1,14 +1,36 @@
 from datetime import datetime
-from sqlalchemy import DateTime, Integer, String, ForeignKey, Numeric, Boolean, UniqueConstraint
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from . import db
+from enum import Enum
+from itertools import chain
+from sqlalchemy import DateTime, Integer, String, ForeignKey, Numeric, Boolean, LargeBinary, UniqueConstraint, Index, case, exists, event, update, select, inspect
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session, object_session
+from . import db, reference_cache, suggest_index, mail_outbox, identity_cache
 from flask_login import UserMixin
 
 
+class ProductStatus(str, Enum):
+    available = "available"
+    sold = "sold"
+    blocked = "blocked"
+
+
 # SQLAlchemy schemas
 
 class Product(db.Model):
     __tablename__ = "products"
+    # Un indice por combinacion filtro + orden del listado (ver tools/explain_listing.py).
+    # wanner: status = 'available' delante; moderator / admin: sin status
+    __table_args__ = (
+        Index("ix_products_updated", "updated"),
+        Index("ix_products_status_category_created", "status", "category_id", "created"),
+        Index("ix_products_status_category_price", "status", "category_id", "price"),
+        Index("ix_products_status_created", "status", "created"),
+        Index("ix_products_status_price", "status", "price"),
+        Index("ix_products_category_created", "category_id", "created"),
+        Index("ix_products_category_price", "category_id", "price"),
+        Index("ix_products_created", "created"),
+        Index("ix_products_price", "price"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -19,6 +41,13 @@ class Product(db.Model):
     seller_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     created: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Desnormalizado: se actualiza en aceptar/cancelar oferta y bloquear/desbloquear
+    status: Mapped[str] = mapped_column(
+        String(16),
+        default=ProductStatus.available.value,
+        server_default=ProductStatus.available.value,
+        nullable=False
+    )
 
     category: Mapped["Category"] = relationship(back_populates="products")
     seller: Mapped["User"] = relationship(back_populates="products")
@@ -31,6 +60,18 @@ class Product(db.Model):
         cascade="all, delete-orphan"
     )
 
+    @property
+    def is_sold(self):
+        return self.status == ProductStatus.sold.value
+
+    @property
+    def is_blocked(self):
+        return self.status == ProductStatus.blocked.value
+
+    def derive_status(self):
+        """Estado calculado desde las ofertas aceptadas / bloqueo (una sola consulta)."""
+        return db.session.query(product_status_expression()).filter(Product.id == self.id).scalar()
+
 
 class User(db.Model, UserMixin):
     
@@ -54,6 +95,19 @@ class User(db.Model, UserMixin):
     blocked_as_user: Mapped[list["blocked_users"]] = relationship("blocked_users", foreign_keys="blocked_users.user_id",back_populates="user", cascade="all, delete-orphan")
     blocked_as_moderator: Mapped[list["blocked_users"]] = relationship("blocked_users", foreign_keys="blocked_users.moderator_id",back_populates="moderator", cascade="all, delete-orphan")
 
+    @property
+    def role_name(self):
+        """Nombre del rol desde la cache de referencia (sin cargar user.role)."""
+        return reference_cache.role_name(self.role_id)
+
+    @property
+    def is_blocked(self):
+        """Si esta bloqueado. El user_loader ya lo trae en su consulta; si no, se mira blocked_as_user."""
+        blocked = self.__dict__.get("_blocked")
+        if blocked is None:
+            return bool(self.blocked_as_user)
+        return blocked
+
 
 class Role(db.Model):
     __tablename__ = 'roles'
@@ -140,4 +194,298 @@ class Offer(db.Model):
         uselist=False,
         back_populates="offer",
         cascade="all, delete-orphan"
-    )
\ No newline at end of file
+    )
+
+
+# Version del catalogo (ETag de los listados)
+
+class CatalogState(db.Model):
+    __tablename__ = 'catalog_state'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Cambios que no se ven en products.updated (borrados) o que interesan como evento (bloqueos)
+
+class ProductChangeEvent(str, Enum):
+    deleted = "deleted"
+    blocked = "blocked"
+    unblocked = "unblocked"
+
+
+class ProductChange(db.Model):
+    __tablename__ = 'product_changes'
+    __table_args__ = (
+        Index("ix_product_changes_created", "created"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Sin FK: el producto puede ya no existir
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    event: Mapped[str] = mapped_column(String(16), nullable=False)
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Exportaciones en segundo plano
+
+class ExportJobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        Index("ix_export_jobs_params_key_status", "params_key", "status"),
+    )
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    format: Mapped[str] = mapped_column(String(8), nullable=False)
+    params: Mapped[str] = mapped_column(String(500), nullable=False)
+    # sha1 de formato + filtros: misma exportacion -> mismo fichero
+    params_key: Mapped[str] = mapped_column(String(40), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default=ExportJobStatus.pending.value, nullable=False)
+    rows_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rows_total: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    expires: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+# Correos pendientes de enviar (los manda helper_outbox.MailOutbox en segundo plano)
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'mail_outbox'
+    __table_args__ = (
+        Index("ix_mail_outbox_status_next_attempt", "status", "next_attempt"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    sender: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Destinatarios separados por comas
+    recipients: Mapped[str] = mapped_column(String(1000), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    # El mensaje entero ya serializado (cabeceras, HTML, adjuntos de hasta UPLOAD_MAX_FILE_SIZE).
+    # En MySQL un BLOB se queda en 64 KB: LONGBLOB
+    raw: Mapped[bytes] = mapped_column(LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default=OutboxStatus.pending.value, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    created: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+def catalog_state():
+    """(version, updated) actual del catalogo. Una consulta por PK."""
+    row = db.session.execute(select(CatalogState.version, CatalogState.updated).where(CatalogState.id == 1)).first()
+    return (row.version, row.updated) if row else (0, None)
+
+
+def product_status_expression():
+    """CASE sold / blocked / available a partir de accepted_offers y blocked_products."""
+    sold = (
+        exists()
+        .where(Offer.product_id == Product.id)
+        .where(AcceptedOffer.offer_id == Offer.id)
+    )
+    blocked = exists().where(BlockedProduct.product_id == Product.id)
+
+    return case(
+        (sold, ProductStatus.sold.value),
+        (blocked, ProductStatus.blocked.value),
+        else_=ProductStatus.available.value
+    )
+
+
+# == Invalidacion de la cache de referencia ==
+
+def _mark_reference_changed(name):
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("reference_changed", set()).add(name)
+    return listener
+
+
+for _model, _name in ((Category, "categories"), (Role, "roles")):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _mark_reference_changed(_name))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_reference_cache(session):
+    for name in session.info.pop("reference_changed", ()):
+        reference_cache.invalidate(name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_reference_changes(session):
+    session.info.pop("reference_changed", None)
+
+
+# == Invalidacion de la cache de identidad (usuario de la sesion) ==
+
+def _mark_identity_changed(user_id_of):
+    def listener(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("identity_changed", set()).add(user_id_of(target))
+    return listener
+
+
+for _event in ("after_update", "after_delete"):
+    event.listen(User, _event, _mark_identity_changed(lambda user: user.id))
+for _event in ("after_insert", "after_delete"):
+    event.listen(blocked_users, _event, _mark_identity_changed(lambda block: block.user_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_identity_cache(session):
+    user_ids = session.info.pop("identity_changed", None)
+    if user_ids:
+        identity_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_identity_changes(session):
+    session.info.pop("identity_changed", None)
+
+
+# == Version del catalogo ==
+
+CATALOG_MODELS = (Product, BlockedProduct, AcceptedOffer, Category)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_catalog_version(session, flush_context):
+    """Un +1 por transaccion que toca productos, bloqueos, ventas o categorias."""
+    if session.info.get("catalog_bumped"):
+        return
+    if not any(isinstance(obj, CATALOG_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        return
+
+    now = datetime.utcnow()
+    connection = session.connection()
+    result = connection.execute(
+        update(CatalogState)
+        .where(CatalogState.id == 1)
+        .values(version=CatalogState.version + 1, updated=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(CatalogState.__table__.insert().values(id=1, version=1, updated=now))
+    session.info["catalog_bumped"] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_catalog_bump(session):
+    session.info.pop("catalog_bumped", None)
+
+
+# == Indice de sugerencias ==
+
+def _record_suggest_change(session, product_id, old_title, new_title):
+    session.info.setdefault("suggest_changes", []).append((product_id, old_title, new_title))
+
+
+@event.listens_for(Product, "after_insert")
+def _suggest_product_inserted(mapper, connection, target):
+    if target.status == ProductStatus.available.value:
+        _record_suggest_change(object_session(target), target.id, None, target.title)
+
+
+@event.listens_for(Product, "after_update")
+def _suggest_product_updated(mapper, connection, target):
+    state = inspect(target)
+    title_history = state.attrs.title.history
+    if not title_history.has_changes() and not state.attrs.status.history.has_changes():
+        return
+    old_title = title_history.deleted[0] if title_history.deleted else target.title
+    new_title = target.title if target.status == ProductStatus.available.value else None
+    _record_suggest_change(object_session(target), target.id, old_title, new_title)
+
+
+@event.listens_for(Product, "after_delete")
+def _suggest_product_deleted(mapper, connection, target):
+    _record_suggest_change(object_session(target), target.id, target.title, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_suggest_changes(session):
+    for product_id, old_title, new_title in session.info.pop("suggest_changes", ()):
+        if old_title is not None:
+            suggest_index.remove(product_id, old_title)
+        if new_title is not None:
+            suggest_index.add(product_id, new_title)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_suggest_changes(session):
+    session.info.pop("suggest_changes", None)
+
+
+# == Registro de cambios (exportacion delta) ==
+
+def _log_product_change(connection, product_id, event_name):
+    # Misma conexion = misma transaccion que el cambio: si hay rollback no queda registro
+    connection.execute(ProductChange.__table__.insert().values(
+        product_id=product_id, event=event_name, created=datetime.utcnow()
+    ))
+
+
+@event.listens_for(Product, "after_delete")
+def _log_product_deleted(mapper, connection, target):
+    _log_product_change(connection, target.id, ProductChangeEvent.deleted.value)
+
+
+@event.listens_for(BlockedProduct, "after_insert")
+def _log_product_blocked(mapper, connection, target):
+    _log_product_change(connection, target.product_id, ProductChangeEvent.blocked.value)
+
+
+@event.listens_for(BlockedProduct, "after_delete")
+def _log_product_unblocked(mapper, connection, target):
+    # Al borrar el producto se borra su bloqueo en cascada: eso ya es "deleted"
+    session = object_session(target)
+    if session is not None and any(
+        isinstance(obj, Product) and obj.id == target.product_id for obj in session.deleted
+    ):
+        return
+    _log_product_change(connection, target.product_id, ProductChangeEvent.unblocked.value)
+
+
+# == Outbox de correo ==
+
+@event.listens_for(OutboxMessage, "after_insert")
+def _outbox_message_added(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["outbox_wakeup"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_outbox(session):
+    # Despues del commit: si se despierta antes, el hilo aun no ve la fila
+    if session.info.pop("outbox_wakeup", None):
+        mail_outbox.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_outbox_wakeup(session):
+    session.info.pop("outbox_wakeup", None)
@@ -1,18 +1,14 @@
-import smtplib
-import ssl
 from flask import Blueprint, render_template, request, flash, current_app, redirect, url_for
 from flask_login import login_user, login_required, logout_user, current_user
 from .forms import Registration_form, LoginForm, ResendEmailForm
 from .models import db, User
-from . import bcrypt
+from . import password_hasher, mail_manager, mail_outbox, rate_limiter
 from .hashid_utils import encode_id, decode_id
 from .helpers.helper_role import HelperRole
 from .helpers.helper_files import save_image
+from .helpers.helper_images import AVATAR_VARIANTS
 from config import ALLOWED_EXTENSIONS
 import secrets
-from config import MAIL_SENDER_ADDR, MAIL_SENDER_PASSWORD, MAIL_SMTP_PORT, MAIL_SMTP_SERVER
-from email.message import EmailMessage
-from email.utils import formataddr
 
 auth_page = Blueprint(
     'auth_page', __name__,
@@ -24,72 +20,16 @@ def allowed_file(filename):
 
 # == Funcio para enviar mensajes ==
 def send_verification_email(user):
-    sender_addr = MAIL_SENDER_ADDR
-    sender_pass = MAIL_SENDER_PASSWORD
-    sender_server = MAIL_SMTP_SERVER
-    sender_port = MAIL_SMTP_PORT
-    contact_addr = user.email
-
-    objeto = 'Verifica tu correo'
     enlace = url_for('auth_page.verify_email', hashid=encode_id(user.id), email_token=user.email_token, _external=True)
+    msg = mail_manager.message((user.name, user.email), 'Verifica tu correo', 'verify', name=user.name, link=enlace)
 
-    # == Email con HTML ==
-    html_content = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; background-color: #f7f7f7; padding: 20px;">
-        <table width="100%" cellpadding="0" cellspacing="0" style="max-width: 600px; margin: auto; background: #ffffff; padding: 30px; border-radius: 8px;">
-            <tr>
-                <td style="text-align: center;">
-                    <h2 style="color: #333;">¡Hola, {user.name}!</h2>
-                    <p style="color: #555; font-size: 16px;">
-                        Gracias por registrarte en <strong>Wannapop</strong>.<br>
-                        Solo queda un paso para activar tu cuenta.
-                    </p>
-
-                    <a href="{enlace}" target="_blank" 
-                       style="display: inline-block; padding: 12px 24px; margin-top: 20px;
-                       background-color: #0066ff; color: #ffffff; text-decoration: none;
-                       border-radius: 5px; font-size: 16px;">
-                        Verificar Email
-                    </a>
-
-                    <p style="margin-top: 30px; color: #777; font-size: 14px;">
-                        Si el botón no funciona, copia y pega este enlace en tu navegador:
-                    </p>
-
-                    <p style="word-break: break-all; font-size: 14px;">
-                        <a href="{enlace}" target="_blank" style="color: #0066ff;">{enlace}</a>
-                    </p>
-
-                    <hr style="margin-top: 30px; border: none; border-top: 1px solid #eee;">
-
-                    <p style="color: #999; font-size: 12px;">
-                        Si no solicitaste este correo, puedes ignorarlo.
-                    </p>
-                </td>
-            </tr>
-        </table>
-    </body>
-    </html>
-    """
-
-    msg = EmailMessage()
-    msg['From'] = formataddr(("Soporte Wannapop", sender_addr))
-    msg['To'] = formataddr((user.name, contact_addr))
-    msg['Subject'] = objeto
-    msg.set_content("Por favor verifica tu email.")
-    msg.add_alternative(html_content, subtype="html")
-
-    contexto = ssl.create_default_context()
-
-    with smtplib.SMTP(sender_server, sender_port) as server:
-        server.starttls(context=contexto)
-        server.login(sender_addr, sender_pass)
-        server.send_message(msg, from_addr=sender_addr, to_addrs=contact_addr)
+    # Solo se encola: se envia tras el commit de quien llama (helper_outbox)
+    mail_outbox.enqueue(msg)
 
 
 # == Registre usuarios ==
 @auth_page.route('/register', methods=["GET", "POST"])
+@rate_limiter.limit("register")
 def register():
     form = Registration_form()
     if form.validate_on_submit():
@@ -99,13 +39,13 @@ def register():
             flash("Ese correo ya esta registrado. Prueba con otro.", "warning")
             return redirect(url_for('auth_page.register'))
 
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = password_hasher.generate(form.password.data)
         tokenEmail = secrets.token_urlsafe(20)
 
         filename = "avatar.png"
         if form.avatar.data and form.avatar.data.filename != "":
             if allowed_file(form.avatar.data.filename):
-                filename = save_image(form.avatar.data, upload_folder=current_app.config['UPLOAD_FOLDER'])
+                filename = save_image(form.avatar.data, upload_folder=current_app.config['UPLOAD_FOLDER'], variants=AVATAR_VARIANTS)
             else:
                 flash("Tipo de archivo no permitido", "danger")
                 return render_template('auth/register.html', form=form)
@@ -122,9 +62,10 @@ def register():
 
         try:
             db.session.add(user)
-            db.session.commit()
+            db.session.flush()
 
             send_verification_email(user)
+            db.session.commit()
 
             flash('Usuario registrado con exito!', 'success')
             flash('Revisa tu correo para confirmar email!', 'success')
@@ -142,6 +83,7 @@ def register():
 
 # == Login ==
 @auth_page.route('/login', methods=["GET", "POST"])
+@rate_limiter.limit("login", failures_only=True)
 def login():
     form = LoginForm()
     next_page = request.args.get('next')
@@ -149,8 +91,10 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
 
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
-            
+        if user and password_hasher.check_and_rehash(user, form.password.data):
+            # Guarda el hash rehecho si BCRYPT_LOG_ROUNDS ha cambiado
+            db.session.commit()
+
             if not user.verified:
                 flash("Tu cuenta aun no esta verificada. Revisa tu correo.", "warning")
                 return redirect(url_for('auth_page.login'))
@@ -161,6 +105,7 @@ def login():
             current_app.logger.info(f"Usuario logueado: {user.email}")
             return redirect(next_page or url_for('main_page.home'))
         else:
+            rate_limiter.failed("login", form.email.data)
             flash('Email o contraseña incorrectos', 'danger')
             return redirect(url_for('auth_page.login'))
 
@@ -187,6 +132,7 @@ def verify_email(hashid, email_token):
 
 # == Resend de token para verificacion ==
 @auth_page.route("/resend", methods=["GET", "POST"])
+@rate_limiter.limit("resend")
 def resend_email():
     if current_user.is_authenticated:
         flash("Ya estás logueado.", "info")
@@ -206,9 +152,8 @@ def resend_email():
             return redirect(url_for("auth_page.login"))
 
         user.email_token = secrets.token_urlsafe(20)
-        db.session.commit()
-
         send_verification_email(user)
+        db.session.commit()
         flash("Se ha enviado un nuevo correo de verificación.", "success")
         return redirect(url_for("auth_page.login"))
 
@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
 from .helpers.helper_role import HelperRole as hr
-from .models import db, Product, AcceptedOffer, Offer
+from .models import db, Product, AcceptedOffer, Offer, ProductStatus
 from .hashid_utils import encode_id, decode_id
 from .forms import AcceptOfferForm, CancelOfferForm
 
@@ -47,6 +47,16 @@ def accept_offer(offer_id):
 
     offer = Offer.query.get_or_404(offer_id)
 
+    # Un producto bloqueado no se vende (y no debe perder su estado de moderacion).
+    # derive_status mira accepted_offers / blocked_products, no solo la columna
+    status = offer.product.derive_status()
+    if status == ProductStatus.blocked.value:
+        flash("El producto esta bloqueado y no se pueden aceptar ofertas.", "warning")
+        return redirect(url_for("routes_sales.sales"))
+    if status == ProductStatus.sold.value:
+        flash("El producto ya tiene una oferta aceptada.", "warning")
+        return redirect(url_for("routes_sales.sales"))
+
     acepted_offer = AcceptedOffer(
         offer_id=offer.id,
         instructions=instrucciones,
@@ -56,6 +66,8 @@ def accept_offer(offer_id):
     for o in Offer.query.filter_by(product_id=offer.product_id).all():
         o.active = False 
 
+    offer.product.status = ProductStatus.sold.value
+
     try:
         db.session.add(acepted_offer)
         db.session.commit()
@@ -118,6 +130,8 @@ def delete_accepted_offer(accepted_offer_id):
             o.active = True
 
         db.session.delete(accepted)
+        db.session.flush()
+        offer.product.status = offer.product.derive_status()
 
         db.session.commit()
         flash("Has cancelado la aceptación. Todas las ofertas han sido reactivadas.", "info")
@@ -3,10 +3,12 @@ from config import ALLOWED_EXTENSIONS
 from .models import User, db, Role, blocked_users, Product, AcceptedOffer, Offer
 from .forms import UserForm, UpdateUserForm, UserDeleteForm
 from flask_login import login_required, current_user
-from . import bcrypt
+from . import password_hasher, reference_cache
 from .helpers.helper_role import HelperRole as hr
 from .hashid_utils import encode_id, decode_id
 from .helpers.helper_files import save_image
+from .helpers.helper_images import AVATAR_VARIANTS
+from .helpers.helper_listing import product_cards_query
 from sqlalchemy import or_
 
 routers_user = Blueprint('routers_user', __name__, template_folder='templates')
@@ -19,7 +21,7 @@ def allowed_file(filename):
 @login_required
 @hr.wanner_role_permission.require(http_exception=403)
 def users():
-    role_name = getattr(current_user.role, "name", "").lower()
+    role_name = (current_user.role_name or "").lower()
 
     query = db.session.query(User, Role).join(Role).order_by(Role.id.asc())
     if role_name == "wanner":
@@ -93,7 +95,7 @@ def user_detail(hashid):
         flash("Usuario no encontrado", "danger")
         return redirect(url_for("routers_user.users"))
 
-    products = Product.query.filter_by(seller_id=usuario.id).all()
+    products = product_cards_query().filter(Product.seller_id == usuario.id).order_by(Product.id.asc()).all()
     return render_template("user_info.html", usuario=usuario, products=products, total_aceptadas=total_aceptadas, total_ofertas=total_ofertas)
 
 
@@ -112,7 +114,7 @@ def delete_user(hashid):
         flash("Usuario no encontrado", 'danger')
         return redirect(url_for('routers_user.users'))
 
-    if usuario.role.name == "admin":
+    if usuario.role_name == "admin":
         flash("No puedes eliminar a otro administrador.", "danger")
         return redirect(url_for('routers_user.users'))
 
@@ -154,16 +156,16 @@ def delete_user(hashid):
 @hr.admin_role_permission.require(http_exception=403)
 def create():
     form = UserForm()
-    roles = db.session.query(Role).all()
+    roles = reference_cache.roles()
     form.role_id.choices = [(r.id, r.name) for r in roles]
 
     if request.method == 'POST' and form.validate_on_submit():
    
         filename = "avatar.png"
         if form.avatar.data:
-            filename = save_image(form.avatar.data, upload_folder=current_app.config.get('UPLOAD_FOLDER'))
+            filename = save_image(form.avatar.data, upload_folder=current_app.config.get('UPLOAD_FOLDER'), variants=AVATAR_VARIANTS)
 
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = password_hasher.generate(form.password.data)
 
         user = User(
             name=form.name.data,
@@ -198,13 +200,13 @@ def update_user(hashid):
         flash("Usuario no encontrado", 'danger')
         return redirect(url_for('routers_user.users'))
 
-    roles = db.session.query(Role).order_by(Role.id.asc()).all()
+    roles = reference_cache.roles()
     form = UpdateUserForm(obj=usuario)
     form.role_id.choices = [(r.id, r.name) for r in roles]
 
     if request.method == "POST" and form.validate_on_submit():
         if form.avatar.data:
-            filename = save_image(form.avatar.data, upload_folder=current_app.config.get('UPLOAD_FOLDER'))
+            filename = save_image(form.avatar.data, upload_folder=current_app.config.get('UPLOAD_FOLDER'), variants=AVATAR_VARIANTS)
             usuario.avatar = filename
 
         usuario.name = form.name.data
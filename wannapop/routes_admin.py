@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required
 from .helpers.helper_role import HelperRole as hr
-from .models import User, blocked_users, Product, BlockedProduct, db
+from .models import User, blocked_users, Product, BlockedProduct, ProductStatus, db
 from .hashid_utils import encode_id, decode_id
+from . import fragment_cache, facet_counts, listing_totals, suggest_index, image_workers, mail_outbox, identity_cache, password_hasher, rate_limiter
 
 routes_admin = Blueprint("routes_admin", __name__, template_folder="templates")
 
@@ -11,7 +12,7 @@ routes_admin = Blueprint("routes_admin", __name__, template_folder="templates")
 @hr.moderator_role_permission.require(http_exception=403)
 def admin():
     usuarios = User.query.all()
-    productos = Product.query.all()
+    productos = Product.query.filter(Product.status == ProductStatus.blocked.value).all()
 
     hay_bloqueado = False
     hay_producto_bloqueado = False
@@ -20,9 +21,8 @@ def admin():
         if usuario.blocked_as_user:
             hay_bloqueado  = True
     
-    for producto in productos:
-        if producto.blocked:
-            hay_producto_bloqueado  = True
+    if productos:
+        hay_producto_bloqueado = True
 
     if request.method == "POST":
         seleccionados_usuarios = request.form.getlist("usuarios")
@@ -39,7 +39,10 @@ def admin():
             product_id = decode_id(hashid)
             bloqueo = BlockedProduct.query.filter_by(product_id=product_id).first()
             if bloqueo:
+                producto = bloqueo.product
                 db.session.delete(bloqueo)
+                db.session.flush()
+                producto.status = producto.derive_status()
 
         try:
             db.session.commit()
@@ -59,3 +62,21 @@ def admin():
         hay_bloqueado=hay_bloqueado,
         encode_id=encode_id
     )
+
+
+# == Metricas internas (por worker) ==
+@routes_admin.route('/admin/metrics')
+@login_required
+@hr.admin_role_permission.require(http_exception=403)
+def metrics():
+    return jsonify(
+        fragment_cache=fragment_cache.stats(),
+        facet_counts=facet_counts.stats(),
+        listing_totals=listing_totals.stats(),
+        suggest_index=suggest_index.stats(),
+        image_workers=image_workers.stats(),
+        mail_outbox=mail_outbox.stats(),
+        identity_cache=identity_cache.stats(),
+        passwords=password_hasher.stats(),
+        rate_limiter=rate_limiter.stats()
+    )
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
-from .models import db, Product, BlockedProduct
+from .models import db, Product, BlockedProduct, ProductStatus
 from .hashid_utils import decode_id, encode_id
 from .forms import BlockProductForm
 from flask_login import login_required, current_user
@@ -16,15 +16,15 @@ def block_product(hashid):
     product_id = decode_id(hashid)
     product = Product.query.get_or_404(product_id)
 
-    if current_user.role.name == 'wanner':
+    if current_user.role_name == 'wanner':
         flash("No tienes permisos para bloquear este producto", "danger")
         return redirect(url_for('routes_products.get_products'))
 
-    if product.blocked:
+    if product.is_blocked:
         flash("Este producto ya está bloqueado", "warning")
         return redirect(url_for('routes_products.get_product', hashid=encode_id(product.id)))
 
-    if any(offer.accepted_offer for offer in product.offers):
+    if product.is_sold:
         flash("Productos con oferta aceptada no se pueden bloquear", "warning")
         return redirect(url_for('routes_products.get_product', hashid=encode_id(product.id)))
 
@@ -38,6 +38,7 @@ def block_product(hashid):
         )
 
         db.session.add(block_product)
+        product.status = ProductStatus.blocked.value
         db.session.commit()
 
         flash("Producto bloqueado correctamente", "success")
@@ -52,7 +53,7 @@ def block_product(hashid):
 def unblock_product(hashid):
     product_id = decode_id(hashid)
 
-    if current_user.role.name == 'wanner':
+    if current_user.role_name == 'wanner':
         flash("No tienes permisos para desbloquear este producto", "danger")
         return redirect(url_for('routes_products.get_products'))
 
@@ -62,7 +63,10 @@ def unblock_product(hashid):
         flash("Este producto no está bloqueado", "warning")
         return redirect(url_for('routes_products.get_products'))
 
+    product = blocked.product
     db.session.delete(blocked)
+    db.session.flush()
+    product.status = product.derive_status()
     db.session.commit()
 
     flash("Producto desbloqueado correctamente", "success")
@@ -1,8 +1,7 @@
 from flask import Blueprint, render_template, redirect, flash, url_for
 from flask_login import login_required, current_user
 from .forms import ContactForm
-from wannapop import mail_manager
-import os
+from wannapop import mail_manager, db
 
 main_page = Blueprint(
     'main_page', __name__,
@@ -19,19 +18,16 @@ def contact():
 
     if form.validate_on_submit():
         try:
-            uploaded_files = []
-            for f in form.attachments.data:
-                if f:
-                    file_path = os.path.join(mail_manager.upload_folder, f.filename)
-                    f.save(file_path)
-                    uploaded_files.append(file_path)
+            # Los adjuntos ya estan en un temporal (helper_uploads.LimitedSpool), no se guardan en uploads
+            attachments = [f for f in form.attachments.data if f and f.filename]
 
             mail_manager.send_contact_msg(
                 user=current_user,
                 message_text=form.message.data,
-                attachments=uploaded_files,
+                attachments=attachments,
                 include_avatar=True
             )
+            db.session.commit()
 
             flash("Tu mensaje ha sido enviado con éxito.", "success")
             return redirect(url_for('main_page.home'))
@@ -1,15 +1,27 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, Response
-from .models import db, Product, Category, User
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, Response, make_response, abort, jsonify
+from .models import db, Product, Category, User, ExportJob, ExportJobStatus, catalog_state
+from . import reference_cache, facet_counts, listing_totals, suggest_index, export_jobs
 from .hashid_utils import encode_id, decode_id
 from .forms import ProductForm, ProductCreateForm, ProductDeleteForm, OfferForm
-import openpyxl
-from io import BytesIO
 from flask import send_file
 from flask_login import login_required, current_user
 from .helpers.helper_role import HelperRole as hr
 from .helpers.helper_files import save_image
-from sqlalchemy import or_
+from .helpers.helper_pagination import CursorPagination
+from .helpers.helper_listing import listing_query, SORTS
+from .helpers.helper_http import make_etag, is_not_modified, not_modified, with_validators
+from .helpers.helper_facets import normalize_search
+from .helpers.helper_export import (
+    export_filters, export_query, iter_rows, csv_chunks, gzip_chunks, write_xlsx,
+    delta_queries, ndjson_chunks, DELTA_HEADER, DELTA_MAX_LAG
+)
+from .helpers.helper_jobs import EXPORT_FORMATS
 
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'wannapop/static/uploads')
 if not os.path.isabs(UPLOAD_FOLDER):
@@ -26,40 +38,66 @@ routes_products = Blueprint(
 @login_required
 @hr.wanner_role_permission.require(http_exception=403)
 def get_products():
-
-    categories = Category.query.all()
-    form = ProductForm()
-    form.category.choices = [(c.name, c.name) for c in categories]
-
     filter_category = request.args.get('category', None)
     search_query = request.args.get('search', '').strip()
-    page = request.args.get('page', 1, type=int)
+    min_price = price_arg('min_price')
+    max_price = price_arg('max_price')
+    sort = request.args.get('sort', None)
+    page = request.args.get('page', None, type=int)
+    cursor = request.args.get('cursor', None)
     per_page = 12
 
-    if filter_category == '':
-        return redirect(url_for('routes_products.get_products'))
+    # Campos vacios del formulario de filtros -> URL limpia
+    if any(value == '' for value in request.args.values()):
+        return redirect(url_for(
+            'routes_products.get_products',
+            **{key: value for key, value in request.args.items() if value != ''}
+        ))
 
-    products_query = Product.query
+    if sort not in SORTS:
+        sort = None
 
-    # == Filtrar por categorias ==
-    if filter_category:
-        products_query = products_query.join(Category).filter(
-            Category.name == filter_category
-        )
+    # == Peticion condicional: 304 antes de consultar productos y renderizar ==
+    version, last_modified = catalog_state()
+    etag = make_etag('products', version, sorted(request.args.items(multi=True)))
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
 
-    # == Buscar ==
-    if search_query:
-        products_query = products_query.filter(
-            or_(
-                Product.title.ilike(f"%{search_query}%"),
-                Product.description.ilike(f"%{search_query}%")
-            )
-        )
+    categories = reference_cache.categories()
+    form = ProductForm()
+    form.category.choices = [(c.name, c.name) for c in categories]
 
-    products_paginated = products_query.paginate(page=page, per_page=per_page, error_out=False)
+    products_query, key_columns = listing_query(
+        # Bloqueados y vendidos solo para moderator / admin
+        staff=current_user.role_name in ['moderator', 'admin'],
+        category=filter_category,
+        search=search_query,
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort
+    )
+
+    if page:
+        # == Enlaces antiguos ?page=N (OFFSET + COUNT) ==
+        products_paginated = products_query.paginate(page=page, per_page=per_page, error_out=False)
+    else:
+        # == Cursor: sin OFFSET; el total es un COUNT cacheado por version del catalogo ==
+        products_paginated = CursorPagination(
+            products_query,
+            per_page=per_page,
+            cursor=cursor,
+            key_columns=key_columns,
+            secret_key=current_app.config['SECRET_KEY'],
+            total=listing_total(
+                products_query,
+                (current_user.role_name in ['moderator', 'admin'], filter_category, search_query, min_price, max_price),
+                version
+            ),
+            approximate_total=listing_totals.approximate,
+        )
     products = products_paginated.items
 
-    return render_template(
+    return with_validators(make_response(render_template(
         'products.html',
         products=products,
         categories=categories,
@@ -67,8 +105,101 @@ def get_products():
         encode_id=encode_id,
         filter_category=filter_category,
         search_query=search_query,
-        pagination=products_paginated
-    )
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort,
+        sorts=SORT_LABELS,
+        filter_args={
+            key: value for key, value in (
+                ('category', filter_category), ('search', search_query or None),
+                ('min_price', min_price), ('max_price', max_price), ('sort', sort)
+            ) if value is not None
+        },
+        pagination=products_paginated,
+        cursor_mode=not page,
+        category_counts=facet_counts.counts(search_query, version)
+    )), etag, last_modified)
+
+
+@routes_products.route('/products/facets')
+@login_required
+@hr.wanner_role_permission.require(http_exception=403)
+def get_product_facets():
+    """Productos disponibles por categoria para ?search=, para refrescar el filtro sin recargar."""
+    search_query = normalize_search(request.args.get('search', ''))
+
+    version, last_modified = catalog_state()
+    etag = make_etag('facets', version, search_query)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    counts = facet_counts.counts(search_query, version)
+    categories = [
+        {'name': c.name, 'count': counts.get(c.id, 0)}
+        for c in reference_cache.categories()
+    ]
+
+    return with_validators(jsonify(
+        search=search_query,
+        total=sum(counts.values()),
+        categories=categories
+    ), etag, last_modified)
+
+
+@routes_products.route('/products/suggest')
+@login_required
+@hr.wanner_role_permission.require(http_exception=403)
+def suggest_products():
+    """Sugerencias mientras se escribe: indice en memoria + titulos por PK."""
+    q = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+
+    # Se piden de mas por si hay titulos repetidos
+    ids = suggest_index.suggest(q, limit * 2)
+    titles = dict(db.session.query(Product.id, Product.title).filter(Product.id.in_(ids)).all()) if ids else {}
+
+    suggestions = []
+    seen = set()
+    for product_id in ids:
+        title = titles.get(product_id)
+        if title is None or title.lower() in seen:
+            continue
+        seen.add(title.lower())
+        suggestions.append({'title': title, 'url': url_for('routes_products.get_product', hashid=encode_id(product_id))})
+        if len(suggestions) == limit:
+            break
+
+    response = jsonify(q=q, suggestions=suggestions)
+    response.cache_control.private = True
+    # Con el indice aun construyendose la lista vacia no se guarda
+    if suggest_index.ready:
+        response.cache_control.max_age = 30
+    else:
+        response.cache_control.no_store = True
+    return response
+
+
+SORT_LABELS = {
+    'newest': 'Mas nuevos',
+    'price_asc': 'Precio: de menor a mayor',
+    'price_desc': 'Precio: de mayor a menor',
+}
+
+
+def price_arg(name):
+    """?min_price= / ?max_price= como Decimal. Vacio, negativo o no numerico -> None."""
+    try:
+        value = Decimal(request.args.get(name, ''))
+    except InvalidOperation:
+        return None
+    return value if value.is_finite() and value >= 0 else None
+
+
+def listing_total(products_query, filters, version):
+    """Total del listado con esos filtros segun PRODUCTS_TOTAL_MODE (None = sin total). Ver ListingTotals."""
+    if listing_totals.mode == 'exact' and not current_app.config.get('PRODUCTS_TOTAL_CACHE', True):
+        return products_query.order_by(None).count()
+    return listing_totals.total(products_query, filters, version)
 
 
 @routes_products.route('/products/<hashid>')
@@ -76,13 +207,34 @@ def get_products():
 @hr.wanner_role_permission.require(http_exception=403)
 def get_product(hashid):
     product_id = decode_id(hashid)
+
+    # == Peticion condicional: solo producto + vendedor, sin cargar ofertas ni renderizar ==
+    state = (
+        db.session.query(Product.updated, Product.status, Category.name, User.updated.label('seller_updated'))
+        .join(Category, Product.category_id == Category.id)
+        .join(User, Product.seller_id == User.id)
+        .filter(Product.id == product_id)
+        .first()
+    )
+    if state is None:
+        abort(404)
+
+    # El token CSRF del formulario de oferta caduca en 1h: la copia en cache no debe pasar de 30 min
+    csrf_window = int(time.time() // 1800)
+    etag = make_etag('product', product_id, *state, csrf_window)
+    last_modified = max(state.updated, state.seller_updated)
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
     product = Product.query.get_or_404(product_id)
     seller = User.query.get(product.seller_id)
 
     offer_form = OfferForm()
     offer_form.price.data = product.price
 
-    return render_template('product.html', product=product, seller=seller, encode_id=encode_id, offer_form=offer_form)
+    return with_validators(make_response(render_template(
+        'product.html', product=product, seller=seller, encode_id=encode_id, offer_form=offer_form
+    )), etag, last_modified)
 
 
 @routes_products.route('/products/create', methods=['GET', 'POST'])
@@ -91,15 +243,15 @@ def get_product(hashid):
 def create_product():
     form = ProductCreateForm()
 
-    if current_user.role.name != 'wanner':
+    if current_user.role_name != 'wanner':
         flash("Solo los usuarios con rol \"wanner\" pueden crear productos", "warning")
         return redirect(url_for('routes_products.get_products'))
 
-    if current_user.blocked_as_user:
+    if current_user.is_blocked:
         flash("No tienes acceso por estar bloqueado! Contacta con soporte.", "warning")
         return redirect(url_for('routes_products.get_products'))
     
-    categories = Category.query.all()
+    categories = reference_cache.categories()
     form.category.choices = [(c.id, c.name) for c in categories]
 
     if form.validate_on_submit():
@@ -132,13 +284,13 @@ def update_product(hashid):
         flash("No tienes permisos para editar este producto", "danger")
         return redirect(url_for('routes_products.get_products'))
 
-    if any(offer.accepted_offer for offer in product.offers):
+    if product.is_sold:
         flash("El producto tiene una oferta aceptada y no se puede editar", "danger")
         return redirect(request.referrer or url_for('routes_products.get_products'))
 
     form = ProductForm(obj=product)
 
-    categories = Category.query.all()
+    categories = reference_cache.categories()
     form.category.choices = [(c.id, c.name) for c in categories]
 
     if request.method == "GET":
@@ -174,7 +326,7 @@ def delete_product(hashid):
         flash("No tienes permisos para eliminar este producto", "danger")
         return redirect(url_for('routes_products.get_products'))
 
-    if any(offer.accepted_offer for offer in product.offers):
+    if product.is_sold:
         flash("El producto tiene una oferta aceptada y no se puede eliminar", "danger")
         return redirect(request.referrer or url_for('routes_products.get_products'))
 
@@ -194,41 +346,46 @@ def delete_product(hashid):
     return render_template('products/delete.html', product=product, form=form)
 
 
-@routes_products.route('/exportar/csv')
+@routes_products.route('/exportar/csv', methods=['GET', 'POST'])
 @login_required
 def export_csv():
-    products = Product.query.all()
+    # Filtros opcionales: ?category=&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    filters = export_filters(request.args)
+    # POST (con CSRF) -> trabajo en segundo plano; GET -> descarga directa
+    if request.method == 'POST':
+        return enqueue_export('csv', filters)
 
-    def generate():
+    query = export_query(**filters)
 
-        yield "id,title,description,price\n"
+    # Memoria constante: bloques de filas -> CSV -> (gzip) -> cliente, sin cargar la tabla
+    body = csv_chunks(iter_rows(db.engine, query))
+    headers = {"Content-Disposition": "attachment;filename=products.csv"}
 
-        for p in products:
-            yield f"{p.id},{p.title},{p.description},{p.price}\n"
+    if request.accept_encodings['gzip']:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
 
-    return Response(
-        generate(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment;filename=products.csv"}
-    )
+    response = Response(body, mimetype="text/csv", headers=headers)
+    response.vary.add("Accept-Encoding")
+    return response
 
 
-@routes_products.route('/exportar/excel')
+@routes_products.route('/exportar/excel', methods=['GET', 'POST'])
 @login_required
 def export_excel():
-    products = Product.query.all()
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Productos"
-
-    ws.append(["ID", "Título", "Descripción", "Precio"])
-
-    for p in products:
-        ws.append([p.id, p.title, p.description, p.price])
-
-    output = BytesIO()
-    wb.save(output)
+    filters = export_filters(request.args)
+    if request.method == 'POST':
+        return enqueue_export('xlsx', filters)
+
+    query = export_query(**filters)
+
+    # En un fichero temporal (no en BytesIO): send_file lo lee por trozos y al cerrarse se borra
+    output = tempfile.TemporaryFile(suffix=".xlsx")
+    try:
+        write_xlsx(iter_rows(db.engine, query), output)
+    except Exception:
+        output.close()
+        raise
     output.seek(0)
 
     return send_file(
@@ -237,3 +394,126 @@ def export_excel():
         download_name="products.xlsx",
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
+
+
+@routes_products.route('/exportar/delta')
+@login_required
+def export_delta():
+    """
+    Cambios desde ?since= (ISO 8601, la marca de la llamada anterior) en CSV o ?format=ndjson.
+    La nueva marca va en la cabecera X-Watermark (y en la ultima linea del NDJSON).
+    La marca es la hora del servidor menos ?lag= segundos (por defecto EXPORT_DELTA_LAG) y se compara
+    con las fechas que pone la aplicacion al escribir: puede repetir filas cerca de la marca y solo se
+    salta una si su transaccion tardo mas de lag segundos entre escribirla y hacer commit.
+    Quien necesite mas margen (p.ej. importaciones largas) pide un lag mayor.
+    """
+    since = watermark_arg('since')
+    if since is False:
+        return jsonify(error="since no es una fecha ISO 8601 valida"), 400
+
+    lag = request.args.get('lag', '').strip() or current_app.config.get('EXPORT_DELTA_LAG', 5)
+    if not str(lag).isdecimal() or int(lag) > DELTA_MAX_LAG:
+        return jsonify(error=f"lag debe ser un numero de segundos entre 0 y {DELTA_MAX_LAG}"), 400
+
+    retention = timedelta(days=current_app.config.get('EXPORT_CHANGELOG_DAYS', 30))
+    if since is None:
+        since = datetime(1970, 1, 1)
+    elif since < datetime.utcnow() - retention:
+        # El registro de borrados ya no llega tan atras: hace falta una exportacion completa
+        return jsonify(error="since es anterior a la retencion del registro de cambios"), 410
+
+    # Margen para transacciones que empezaron antes y aun no habian hecho commit
+    watermark = datetime.utcnow() - timedelta(seconds=int(lag))
+    # Lista, no generador: db.engine se resuelve aqui, dentro del contexto de la peticion
+    row_chunks = chain.from_iterable([iter_rows(db.engine, query) for query in delta_queries(since)])
+
+    if request.args.get('format') == 'ndjson':
+        body = ndjson_chunks(row_chunks, DELTA_HEADER, trailer={'watermark': watermark})
+        mimetype, filename = "application/x-ndjson", "products-delta.ndjson"
+    else:
+        body = csv_chunks(row_chunks, header=DELTA_HEADER)
+        mimetype, filename = "text/csv", "products-delta.csv"
+
+    headers = {
+        "Content-Disposition": f"attachment;filename={filename}",
+        "X-Watermark": watermark.isoformat() + "Z",
+    }
+    if request.accept_encodings['gzip']:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+
+    response = Response(body, mimetype=mimetype, headers=headers)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def watermark_arg(name):
+    """ISO 8601 (con o sin Z) -> datetime UTC sin zona. Sin valor -> None, mal escrito -> False."""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# == Exportaciones en segundo plano ==
+
+def enqueue_export(fmt, filters):
+    """Encola (o reutiliza) el trabajo. JSON -> 202 con las URLs; navegador -> pagina de progreso."""
+    job = export_jobs.submit(current_user.id, fmt, filters)
+
+    if request.accept_mimetypes.best == 'application/json':
+        response = jsonify(export_job_status_payload(job))
+        response.status_code = 202
+        response.headers['Location'] = url_for('routes_products.export_job_status', job_id=job.id)
+        return response
+
+    return redirect(url_for('routes_products.export_job', job_id=job.id))
+
+
+def export_job_status_payload(job):
+    payload = export_jobs.describe(job)
+    payload['status_url'] = url_for('routes_products.export_job_status', job_id=job.id)
+    payload['download_url'] = (
+        url_for('routes_products.download_export', job_id=job.id)
+        if job.status == ExportJobStatus.done.value else None
+    )
+    return payload
+
+
+def own_export_job(job_id):
+    """El trabajo si es del usuario actual; si no (o no existe), 404."""
+    return ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+
+
+@routes_products.route('/exportar/jobs/<job_id>')
+@login_required
+def export_job(job_id):
+    job = own_export_job(job_id)
+    return render_template('products/export_job.html', job=export_job_status_payload(job))
+
+
+@routes_products.route('/exportar/jobs/<job_id>/status')
+@login_required
+def export_job_status(job_id):
+    job = own_export_job(job_id)
+    response = jsonify(export_job_status_payload(job))
+    response.cache_control.no_store = True
+    return response
+
+
+@routes_products.route('/exportar/jobs/<job_id>/download')
+@login_required
+def download_export(job_id):
+    job = own_export_job(job_id)
+    if job.status != ExportJobStatus.done.value or job.expires < datetime.utcnow() or not os.path.exists(job.path):
+        flash("La exportacion ya no esta disponible, vuelve a generarla", "warning")
+        return redirect(url_for('routes_products.get_products'))
+
+    download_name, mimetype = EXPORT_FORMATS[job.format]
+    return send_file(job.path, as_attachment=True, download_name=download_name, mimetype=mimetype)
@@ -1,15 +1,13 @@
-import smtplib
-import ssl
 from flask import Blueprint, current_app, render_template, redirect, request, flash, url_for
 from flask_login import login_required, current_user
 from .forms import ProfileUpdateForm
 from .hashid_utils import encode_id
 from .helpers.helper_files import save_image
+from .helpers.helper_images import AVATAR_VARIANTS
 from .models import db, AcceptedOffer, Offer, Product
+from .helpers.helper_listing import product_cards_query
 import os
-from config import MAIL_SENDER_ADDR, MAIL_SENDER_PASSWORD, MAIL_SMTP_PORT, MAIL_SMTP_SERVER
-from email.message import EmailMessage
-from email.utils import formataddr
+from . import mail_manager, mail_outbox
 import secrets
 
 
@@ -41,7 +39,9 @@ def profile():
                 Balance -= oferta.offer.offer
 
 
-    return render_template('profile.html', current_user=current_user, products=current_user.products, encode_id=encode_id, Balance=Balance)
+    products = product_cards_query().filter(Product.seller_id == current_user.id).order_by(Product.id.asc()).all()
+
+    return render_template('profile.html', current_user=current_user, products=products, encode_id=encode_id, Balance=Balance)
 
 @routes_profile.route("/profile/update", methods=["GET", "POST"])
 @login_required
@@ -53,7 +53,7 @@ def update_profile():
         email_cambiado = form.email.data != current_user.email
 
         if form.avatar.data:
-            filename = save_image(form.avatar.data)
+            filename = save_image(form.avatar.data, variants=AVATAR_VARIANTS)
             if filename:
                 current_user.avatar = filename
         
@@ -66,30 +66,14 @@ def update_profile():
                 flash("Ese correo ya esta registrado. Prueba con otro.", "warning")
                 return redirect(url_for("routes_profile.profile"))
 
-            sender_addr = MAIL_SENDER_ADDR
-            sender_pass = MAIL_SENDER_PASSWORD
-            sender_server = MAIL_SMTP_SERVER
-            sender_port = MAIL_SMTP_PORT
-            contact_addr = nuevo_email 
-
-            
-            
-            objeto = 'Enlace de verificacion'
-            enlace = url_for('auth_page.verify_email', user_id=current_user.id, email_token=tokenEmail, _external=True)
-            contenido = f"Buenas {current_user.name}! Aquí tienes tu nuevo enlace de verificación:\n\n{enlace}"
-
-            msg = EmailMessage()
-            msg['From'] = formataddr(("Soporte Wannapop", sender_addr))
-            msg['To'] = formataddr(("New User", contact_addr))
-            msg['Subject'] = objeto
-            msg.set_content(contenido)
-
-            contexto = ssl.create_default_context()
-                    
-            with smtplib.SMTP(sender_server, sender_port) as server:
-                        server.starttls(context=contexto)
-                        server.login(sender_addr, sender_pass)
-                        server.send_message(msg, from_addr=sender_addr, to_addrs=contact_addr) 
+            enlace = url_for('auth_page.verify_email', hashid=encode_id(current_user.id), email_token=tokenEmail, _external=True)
+            msg = mail_manager.message(
+                (current_user.name, nuevo_email), 'Enlace de verificacion', 'verify',
+                name=current_user.name, link=enlace, email_change=True,
+            )
+
+            # Se envia tras el commit de abajo (helper_outbox)
+            mail_outbox.enqueue(msg)
 
             current_user.email = nuevo_email
             current_user.email_token = tokenEmail
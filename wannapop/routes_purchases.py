@@ -16,11 +16,11 @@ routes_purchases = Blueprint(
 def create_offer(hashid):
     product_id = decode_id(hashid)
 
-    if current_user.role.name != 'wanner':
+    if current_user.role_name != 'wanner':
         flash("Solo los Wanners pueden hacer ofertas", "danger")
         return redirect(url_for('routes_products.get_product', hashid=hashid))
 
-    if current_user.blocked_as_user:
+    if current_user.is_blocked:
         flash("No tienes permiso de compra por estar bloqueado! Contacta con soporte.", "warning")
         return redirect(url_for('routes_products.get_products'))
 
@@ -30,7 +30,7 @@ def create_offer(hashid):
         flash("No puedes hacer ofertas a tu propio producto", "danger")
         return redirect(url_for('routes_products.get_product', hashid=hashid))
 
-    if product.blocked:
+    if product.is_blocked:
         flash("No puedes hacer oferta a un producto bloqueado", "danger")
         return redirect(url_for('routes_products.get_product', hashid=hashid))
 
@@ -58,7 +58,7 @@ def create_offer(hashid):
             flash("Ya has hecho una oferta para este producto", "warning")
             return redirect(url_for('routes_products.get_product', hashid=hashid))
 
-        if any(offer.accepted_offer for offer in product.offers):
+        if product.is_sold:
             flash("Este producto ya esta vendido", "danger")
             return redirect(url_for('routes_products.get_product', hashid=hashid))
 
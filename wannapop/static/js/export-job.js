@@ -0,0 +1,34 @@
+document.addEventListener("DOMContentLoaded", () => {
+  // Pregunta por el estado de la exportacion hasta que termina o falla
+  const card = document.querySelector("[data-export-job]");
+  if (!card) return;
+
+  const bar = card.querySelector("[data-export-bar]");
+  const text = card.querySelector("[data-export-text]");
+  const download = card.querySelector("[data-export-download]");
+
+  const poll = async () => {
+    const response = await fetch(card.dataset.exportJob, { headers: { Accept: "application/json" } });
+    if (!response.ok) return;
+
+    const job = await response.json();
+    bar.style.width = `${Math.round((job.progress || 0) * 100)}%`;
+
+    if (job.status === "done") {
+      text.textContent = "Lista para descargar";
+      download.href = job.download_url;
+      download.classList.remove("d-none");
+      return;
+    }
+    if (job.status === "failed") {
+      text.textContent = `Ha fallado: ${job.error}`;
+      return;
+    }
+
+    const total = job.rows_total === null ? "" : ` / ${job.rows_total}`;
+    text.textContent = `Preparando... ${job.rows_done}${total} filas`;
+    setTimeout(poll, 1000);
+  };
+
+  poll();
+});
@@ -0,0 +1,32 @@
+document.addEventListener("DOMContentLoaded", () => {
+  // Actualiza los contadores del filtro de categorias mientras se escribe en el buscador
+  const select = document.querySelector("[data-facets-url]");
+  const search = document.querySelector('input[type="search"][name="search"]');
+
+  if (!select || !search) return;
+
+  let timer = null;
+
+  const refresh = async () => {
+    const url = `${select.dataset.facetsUrl}?search=${encodeURIComponent(search.value)}`;
+    const response = await fetch(url, { headers: { Accept: "application/json" } });
+    if (!response.ok) return;
+
+    const data = await response.json();
+    const counts = new Map(data.categories.map((c) => [c.name, c.count]));
+
+    select.querySelectorAll("option").forEach((option) => {
+      const name = option.dataset.facet;
+      if (name === undefined) {
+        option.textContent = `Todas las categorias (${data.total})`;
+      } else {
+        option.textContent = `${name} (${counts.get(name) ?? 0})`;
+      }
+    });
+  };
+
+  search.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(refresh, 300);
+  });
+});
@@ -0,0 +1,41 @@
+document.addEventListener("DOMContentLoaded", () => {
+  // Sugerencias del buscador: /products/suggest rellena el <datalist> del input
+  const input = document.querySelector("[data-suggest-url]");
+  if (!input) return;
+
+  const list = document.getElementById(input.getAttribute("list"));
+  let timer = null;
+  let controller = null;
+
+  const refresh = async () => {
+    const q = input.value.trim();
+    if (q.length < 2) {
+      list.replaceChildren();
+      return;
+    }
+
+    // Solo cuenta la ultima peticion
+    if (controller) controller.abort();
+    controller = new AbortController();
+
+    try {
+      const url = `${input.dataset.suggestUrl}?q=${encodeURIComponent(q)}`;
+      const response = await fetch(url, { signal: controller.signal, headers: { Accept: "application/json" } });
+      if (!response.ok) return;
+
+      const data = await response.json();
+      list.replaceChildren(...data.suggestions.map((s) => {
+        const option = document.createElement("option");
+        option.value = s.title;
+        return option;
+      }));
+    } catch (error) {
+      if (error.name !== "AbortError") throw error;
+    }
+  };
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(refresh, 150);
+  });
+});